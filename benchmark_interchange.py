@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+from pathlib import Path
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import shapely
+
+from dggrid4py import DGGRIDv7
+from dggrid4py.interchange import geo_interchange_formats, geo_interchange_format, read_geo_file, read_id_file, has_pyogrio, has_pyarrow
+
+
+def timed(func, *args, repeat=3, **kwargs):
+    # best of repeat runs
+    timings = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def benchmark_grid_gen(dggrid_instance, dggs_type, resolution, clip_geom=None):
+
+    """
+    end to end: grid_cell_polygons_for_extent with every temporary interchange format that can be written here
+    """
+    rows = []
+    for geo_format in geo_interchange_formats.keys():
+        try:
+            geo_interchange_format(geo_format)
+            seconds, gdf = timed(dggrid_instance.grid_cell_polygons_for_extent, dggs_type, resolution, clip_geom=clip_geom, geo_format=geo_format)
+            rows.append({ 'format': geo_format, 'cells': len(gdf), 'seconds': seconds })
+        except ValueError as ex:
+            print(f"{geo_format}: {ex}")
+
+    return pd.DataFrame(rows)
+
+
+def benchmark_geo_read(dggrid_instance, dggs_type, resolution, clip_geom=None):
+
+    """
+    reading only: the same cells written once per format, then read back the way the highlevel functions do
+    """
+    gdf = dggrid_instance.grid_cell_polygons_for_extent(dggs_type, resolution, clip_geom=clip_geom)
+
+    rows = []
+    for geo_format in geo_interchange_formats.keys():
+        geo_out = geo_interchange_format(geo_format)
+        out_file = Path(dggrid_instance.working_dir) / f"benchmark_{dggs_type}_{resolution}.{geo_out['ext']}"
+        gdf.to_file(out_file, driver=geo_out['driver'])
+
+        seconds, gdf_read = timed(read_geo_file, out_file, geo_out['driver'])
+        rows.append({ 'format': geo_format, 'cells': len(gdf_read), 'MB': out_file.stat().st_size / 1e6, 'seconds': seconds })
+        out_file.unlink()
+
+    return pd.DataFrame(rows)
+
+
+def benchmark_id_read(working_dir, n_ids=5000000):
+
+    """
+    reading a dggrid point output (seqnum,lon,lat lines and an END line): pandas default parsing vs read_id_file
+    """
+    out_file = Path(working_dir) / 'benchmark_points.txt'
+    points = np.column_stack([ np.arange(1, n_ids + 1), np.random.uniform(-180, 180, n_ids), np.random.uniform(-90, 90, n_ids) ])
+    np.savetxt(out_file, points, fmt=['%d', '%.7f', '%.7f'], delimiter=',', footer='END', comments='')
+
+    def read_csv_ids(path):
+        # the END line turns the id column into strings
+        return pd.read_csv(path, header=None).dropna()[0].values.astype(np.int64)
+
+    seconds_csv, ids_csv = timed(read_csv_ids, out_file)
+    seconds_ids, ids = timed(read_id_file, out_file)
+    out_file.unlink()
+
+    return pd.DataFrame([
+        { 'reader': 'pd.read_csv', 'ids': len(ids_csv), 'seconds': seconds_csv },
+        { 'reader': 'read_id_file', 'ids': len(ids), 'seconds': seconds_ids }
+        ])
+
+
+if __name__ == '__main__':
+
+    executable = sys.argv[1] if len(sys.argv) > 1 else '../src/apps/dggrid/dggrid'
+    dggrid = DGGRIDv7(executable=executable, working_dir='/tmp/grids', capture_logs=True, silent=True)
+
+    print(f"pyogrio: {has_pyogrio}, pyarrow: {has_pyarrow}")
+
+    clip_bound = shapely.geometry.box(20.2,57.00, 28.4,60.0 )
+
+    print(benchmark_grid_gen(dggrid, 'ISEA7H', 11, clip_geom=clip_bound))
+
+    print(benchmark_geo_read(dggrid, 'ISEA7H', 11, clip_geom=clip_bound))
+
+    print(benchmark_id_read(dggrid.working_dir))
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+from pathlib import Path
+import stat
+import sys
+import tempfile
+
+import numpy as np
+
+import geopandas as gpd
+
+from dggrid4py.async_runner import AsyncDGGRIDv7
+
+
+def counting_executable(executable, out_dir, seconds=0.2):
+
+    """
+    writes a wrapper around the dggrid executable that logs the start and the end of every process, and keeps every
+    process alive for a moment longer so that the runs that are allowed to overlap do overlap
+    """
+    log_file = Path(out_dir) / 'processes.log'
+    wrapper = Path(out_dir) / 'dggrid_counting'
+    wrapper.write_text('\n'.join([
+        '#!/bin/sh',
+        f'echo "start $(date +%s.%N)" >> "{log_file}"',
+        f'"{Path(executable).resolve()}" "$@"',
+        'rc=$?',
+        f'sleep {seconds}',
+        f'echo "end $(date +%s.%N)" >> "{log_file}"',
+        'exit $rc',
+        ''
+        ]))
+    wrapper.chmod(wrapper.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return wrapper, log_file
+
+
+def peak_processes(log_file):
+
+    """
+    the number of processes and the largest number of them that ran at the same time
+    """
+    events = []
+    for line in Path(log_file).read_text().splitlines():
+        kind, when = line.split()
+        # at the same time an end is counted before a start
+        events.append((float(when), 0 if kind == 'end' else 1))
+
+    running, peak = 0, 0
+    for when, start in sorted(events):
+        running += 1 if start else -1
+        peak = max(peak, running)
+    return sum(start for when, start in events), peak
+
+
+def points(n=2000, seed=42):
+
+    rng = np.random.default_rng(seed)
+    gdf = gpd.GeoDataFrame({ 'value': rng.uniform(0, 1, n), 'class': rng.choice(['a', 'b', 'c'], n) },
+                           geometry=gpd.points_from_xy(rng.uniform(-180, 180, n), rng.uniform(-80, 80, n)), crs=4326)
+    return gdf
+
+
+def concurrent_calls(dggrid_instance):
+
+    """
+    the calls that run dggrid from the event loop and the ones that run the synchronous instance in a worker thread,
+    several of each
+    """
+    calls = []
+    for k in range(2):
+        calls.append(dggrid_instance.grid_cell_polygons_for_extent('ISEA4H', 2))
+        calls.append(dggrid_instance.bin_point_values(points(seed=k), 'value', 'ISEA4H', 5, shard_size=250, engine='transform'))
+        calls.append(dggrid_instance.bin_point_presence(points(seed=k), 'class', 'ISEA4H', 5, shard_size=250, engine='transform'))
+
+    return calls
+
+
+def check_process_limit(executable, max_concurrent=2):
+
+    """
+    runs the concurrent_calls with asyncio.gather and returns the number of dggrid processes and the peak of the
+    processes running at the same time, which must not exceed max_concurrent
+    """
+    with tempfile.TemporaryDirectory() as out_dir:
+        wrapper, log_file = counting_executable(executable, out_dir)
+        dggrid_instance = AsyncDGGRIDv7(executable=wrapper, silent=True, max_concurrent=max_concurrent)
+
+        async def run_all():
+            return await asyncio.gather(*concurrent_calls(dggrid_instance))
+
+        asyncio.run(run_all())
+        dggrid_instance.close()
+
+        return peak_processes(log_file)
+
+
+if __name__ == '__main__':
+
+    # python check_async_limits.py <dggrid>     checks that all dggrid processes of an AsyncDGGRIDv7 share max_concurrent
+    max_concurrent = 2
+    processes, peak = check_process_limit(sys.argv[1], max_concurrent)
+    print(f"{processes} dggrid processes, at most {peak} at the same time (max_concurrent {max_concurrent})")
+    if peak > max_concurrent:
+        sys.exit(1)
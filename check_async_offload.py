@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import logging
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from shapely.geometry import Polygon
+
+from dggrid4py import DGGRIDv7
+from dggrid4py.async_runner import AsyncDGGRIDv7
+
+
+"""
+the longest the event loop may be held by a call that hands its work to threads
+"""
+max_loop_lag = 0.05
+
+
+class SlowCallbacks(logging.Handler):
+
+    """
+    collects the durations of the callbacks that asyncio's debug mode reports as slow
+    """
+    def __init__(self):
+        super().__init__()
+        self.durations = []
+
+    def emit(self, record):
+        match = re.search(r"took (\d+\.\d+) seconds", record.getMessage())
+        if not match is None:
+            self.durations.append(float(match.group(1)))
+
+
+def loop_lag(work):
+
+    """
+    runs the coroutine function work in debug mode, returns its result and how long a callback held the event loop at
+    most in seconds (0 if none held it for more than max_loop_lag)
+    """
+    async def debugged():
+        asyncio.get_running_loop().slow_callback_duration = max_loop_lag
+        return await work()
+
+    slow = SlowCallbacks()
+    logger = logging.getLogger('asyncio')
+    logger.addHandler(slow)
+    try:
+        result = asyncio.run(debugged(), debug=True)
+    finally:
+        logger.removeHandler(slow)
+
+    return result, max(slow.durations, default=0)
+
+
+def check_rollup_keeps_loop_free(dggs_type='ISEA4H', from_res=11, to_res=6):
+
+    """
+    a rollup of millions of cells with the native engine: the parents are looked up in the memo and aggregated in worker
+    threads, the event loop keeps running
+    """
+    dggrid_instance = AsyncDGGRIDv7(silent=True)
+    rng = np.random.default_rng(42)
+    seqnums = np.unique(rng.integers(1, 10 * 4**from_res, 4000000))
+    values_by_seqnum = pd.Series(rng.random(len(seqnums)), index=seqnums)
+
+    async def rollup():
+        return await dggrid_instance.rollup(values_by_seqnum, dggs_type, from_res, to_res, engine='native')
+
+    # the first rollup memoizes the parents, the second one only looks them up
+    cold, _ = loop_lag(rollup)
+    warm, lag = loop_lag(rollup)
+    dggrid_instance.close()
+
+    for resolution in cold.keys():
+        pd.testing.assert_series_equal(cold[resolution], warm[resolution])
+    assert lag < max_loop_lag, f"the event loop was held for {lag:.3f} s"
+
+    return len(seqnums), lag
+
+
+def check_async_generation(executable, dggs_type='ISEA4H', resolution=5, batch_size=3000, geo_format=None):
+
+    """
+    grid_cell_polygons_for_extent_tiled and iter_grid_cell_polygons of the async runner return the cells of the
+    synchronous runner, an async generator closed after its first batch kills dggrid and leaves no temporary files
+    """
+    clip_geom = Polygon([(-5, -5), (25, 0), (20, 30), (0, 20)])
+    dggrid_instance = DGGRIDv7(executable=executable, silent=True, geo_format=geo_format)
+    async_instance = AsyncDGGRIDv7(executable=executable, silent=True, max_concurrent=3, geo_format=geo_format)
+
+    tiled = dggrid_instance.grid_cell_polygons_for_extent_tiled(dggs_type, resolution + 2, clip_geom=clip_geom, max_cells_per_tile=1000)
+    batches = list(dggrid_instance.iter_grid_cell_polygons(dggs_type, resolution, batch_size=batch_size))
+
+    async def tiled_async():
+        return await async_instance.grid_cell_polygons_for_extent_tiled(dggs_type, resolution + 2, clip_geom=clip_geom, max_cells_per_tile=1000)
+
+    async def batches_async():
+        return [ gdf async for gdf in async_instance.iter_grid_cell_polygons(dggs_type, resolution, batch_size=batch_size) ]
+
+    async def first_batch():
+        cells = async_instance.iter_grid_cell_polygons(dggs_type, resolution + 4, batch_size=batch_size)
+        async for gdf in cells:
+            break
+        await cells.aclose()
+        return gdf, async_instance.last_call_stats
+
+    (got_tiled, tiled_lag), (got_batches, batches_lag) = [ loop_lag(work) for work in [tiled_async, batches_async] ]
+    assert got_tiled.equals(tiled)
+    assert len(got_batches) == len(batches) and all(got.equals(want) for got, want in zip(got_batches, batches))
+    assert tiled_lag < max_loop_lag and batches_lag < max_loop_lag, (tiled_lag, batches_lag)
+
+    start = time.perf_counter()
+    gdf, stats = asyncio.run(first_batch())
+    assert len(gdf) == batch_size and stats['files_alive'] == 0, stats
+    assert time.perf_counter() - start < 10, "dggrid generated the whole grid"
+    assert dggrid_instance.temp_files.stats()['files_alive'] == 0 and async_instance.temp_files.stats()['files_alive'] == 0
+    async_instance.close()
+
+    return len(got_tiled), sum(len(gdf) for gdf in got_batches)
+
+
+if __name__ == '__main__':
+
+    # python check_async_offload.py              checks that an async rollup keeps the event loop free, no dggrid needed
+    # python check_async_offload.py <dggrid>     also compares the async tiled and streamed generation with the synchronous one
+    cells, lag = check_rollup_keeps_loop_free()
+    print(f"rollup of {cells} cells, the event loop was held for {lag:.3f} s at most")
+    if len(sys.argv) > 1:
+        tiled, streamed = check_async_generation(sys.argv[1])
+        print(f"{tiled} tiled and {streamed} streamed cells match the synchronous runner")
+    sys.exit(0)
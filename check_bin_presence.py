@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+import sys
+
+import numpy as np
+import pandas as pd
+
+import geopandas as gpd
+
+from dggrid4py import DGGRIDv7, isea
+
+
+def points(classes, seed=42):
+
+    rng = np.random.default_rng(seed)
+    n = len(classes)
+    return gpd.GeoDataFrame({ 'class': classes }, geometry=gpd.points_from_xy(rng.uniform(-180, 180, n), rng.uniform(-80, 80, n)), crs=4326)
+
+
+def expected_presence(gdf, dggs_type, resolution):
+
+    """
+    the presence of the classes per cell with pandas, the missing values as one class
+    """
+    seqnums = isea.geo_to_seqnum(gdf.geometry.x.values, gdf.geometry.y.values, dggs_type, resolution)
+    classes = pd.Series(gdf['class'].values, dtype=object).map(lambda value: 'missing' if pd.isna(value) else value)
+    pairs = pd.DataFrame({ 'seqnum': seqnums, 'class': classes }).drop_duplicates()
+    return { (seqnum, value) for seqnum, value in zip(pairs['seqnum'], pairs['class']) }
+
+
+def presence_pairs_of(df):
+
+    pairs = set()
+    for col in df.columns.drop('count'):
+        for seqnum in df.index[df[col].values]:
+            pairs.add((seqnum, 'missing' if pd.isna(col) else col))
+    return pairs
+
+
+def check_mixed_classes(dggs_type='ISEA4H', resolution=3):
+
+    """
+    classes of mixed types with NaN and None are binned as one class each, also when they show up in different chunks
+    """
+    dggrid_instance = DGGRIDv7(silent=True)
+    values = np.array(['a', 1, 2.5, np.nan, 'b', None, 1] * 300, dtype=object)
+    gdf = points(values)
+
+    for shard_size in [len(gdf), 7, 500]:
+        df = dggrid_instance.bin_point_presence(gdf, 'class', dggs_type, resolution, shard_size=shard_size, engine='native')
+        assert len(df.columns) == 5 + 1, list(df.columns)
+        assert presence_pairs_of(df) == expected_presence(gdf, dggs_type, resolution), shard_size
+        assert (df['count'].values == df.drop(columns='count').sum(axis=1).values).all()
+
+    # a class that shows up only in later chunks
+    gdf = points(np.array(['a'] * 1000 + [np.nan] * 10 + ['c'] * 10, dtype=object))
+    df = dggrid_instance.bin_point_presence(gdf, 'class', dggs_type, resolution, shard_size=100, engine='native')
+    assert presence_pairs_of(df) == expected_presence(gdf, dggs_type, resolution)
+
+
+def check_reserved_classes(dggs_type='ISEA4H', resolution=3):
+
+    """
+    classes named like the count column or the seqnum index are refused instead of replacing them
+    """
+    dggrid_instance = DGGRIDv7(silent=True)
+    for name in ['count', 'seqnum']:
+        gdf = points(np.array(['a', name, 'b'] * 10, dtype=object))
+        try:
+            dggrid_instance.bin_point_presence(gdf, 'class', dggs_type, resolution, engine='native')
+        except ValueError as e:
+            assert name in str(e), str(e)
+        else:
+            raise AssertionError(f"a class named {name} is binned")
+
+
+if __name__ == '__main__':
+
+    # python check_bin_presence.py     checks the classes of bin_point_presence with the native engine, no dggrid needed
+    check_mixed_classes()
+    check_reserved_classes()
+    print('presence classes match')
+    sys.exit(0)
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+from pathlib import Path
+import sys
+import tempfile
+
+import numpy as np
+
+import geopandas as gpd
+from geopandas.testing import assert_geodataframe_equal
+
+from dggrid4py import DGGRIDv7
+
+
+def write_dggrid_output(dggrid_instance, job, dggs_type, resolution):
+
+    """
+    writes the output file of a grid generation job like dggrid does: the requested cells once each, ordered by seqnum,
+    with the seqnum as text in the name field. The polygons come from the native engine
+    """
+    seqnums = np.unique(job['seq_df']['seqs'].values.astype(np.int64))
+    cells = dggrid_instance.grid_cell_polygons_from_cellids(seqnums, dggs_type, resolution, engine='native')
+    cells['name'] = cells['name'].astype(str)
+    cells.to_file(job['out_file'], driver=job['geo_out']['driver'])
+
+
+def uncached_cells(dggrid_instance, cell_id_list, dggs_type, resolution):
+
+    """
+    the uncached path of grid_cell_polygons_from_cellids with the dggrid run replaced by write_dggrid_output
+    """
+    job = dggrid_instance._prepare_grid_gen(dggs_type, resolution, cell_id_list=cell_id_list)
+    with dggrid_instance._cleanup(job):
+        write_dggrid_output(dggrid_instance, job, dggs_type, resolution)
+        return dggrid_instance._collect_cell_polygons(job)
+
+
+def cached_cells(dggrid_instance, cell_id_list, dggs_type, resolution):
+
+    """
+    the cached path of grid_cell_polygons_from_cellids with the dggrid run replaced by write_dggrid_output
+    """
+    cached, missing = dggrid_instance._cached_cell_lookup(cell_id_list, dggs_type, resolution)
+
+    fresh = None
+    if len(missing) > 0:
+        fresh = uncached_cells(dggrid_instance, missing, dggs_type, resolution)
+
+    return dggrid_instance._merge_cached_cells(cell_id_list, cached, fresh, dggs_type, resolution)
+
+
+def check_cached_matches_uncached(out_dir, dggs_type='ISEA4H', resolution=5):
+
+    """
+    unsorted and repeated cell ids, some cached and some not, give the same frame with and without the cell_cache
+    """
+    dggrid_instance = DGGRIDv7(working_dir=out_dir, silent=True, cell_cache=True)
+    rng = np.random.default_rng(42)
+
+    warm = rng.choice(10000, 300, replace=False) + 1
+    cached_cells(dggrid_instance, warm, dggs_type, resolution)
+
+    for cell_id_list in [ rng.permutation(warm), np.concatenate([ warm[:50], rng.integers(1, 10000, 200), warm[:10] ]), rng.integers(1, 10000, 100) ]:
+        cell_id_list = list(cell_id_list)
+        uncached = uncached_cells(dggrid_instance, cell_id_list, dggs_type, resolution)
+        cached = cached_cells(dggrid_instance, cell_id_list, dggs_type, resolution)
+
+        assert list(uncached.columns) == list(cached.columns), (list(uncached.columns), list(cached.columns))
+        assert (uncached.dtypes == cached.dtypes).all() and uncached.crs == cached.crs
+        assert uncached['name'].tolist() == [ int(seqnum) for seqnum in cell_id_list ]
+        assert_geodataframe_equal(uncached, cached)
+
+    assert dggrid_instance.temp_files.stats()['files_alive'] == 0
+
+
+if __name__ == '__main__':
+
+    # python check_cell_cache.py     checks that the cell_cache returns the cells of the uncached path, no dggrid needed
+    with tempfile.TemporaryDirectory() as out_dir:
+        check_cached_matches_uncached(out_dir)
+    print('cached cells match')
+    sys.exit(0)
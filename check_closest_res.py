@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+import sys
+
+import numpy as np
+
+from dggrid4py.dggrid_runner import Dggs, predefined_res_table
+from dggrid4py.grid_stats import closest_res
+
+
+def check_table_values():
+
+    """
+    a value between two table entries gets the resolution of the resround mode, a value equal to an entry gets that
+    entry's resolution in every mode
+    """
+    areas = [1000, 100, 10, 1]
+    expected = {
+        'nearest': { 100: 1, 1000: 0, 1: 3, 60: 1, 40: 2, 5000: 0, 0.5: 3 },
+        'up': { 100: 1, 1000: 0, 1: 3, 60: 1, 40: 1, 5000: 0, 0.5: 3 },
+        'down': { 100: 1, 1000: 0, 1: 3, 60: 2, 40: 2, 5000: 0, 0.5: 3 },
+        }
+    for resround, cases in expected.items():
+        values = np.array(list(cases.keys()), dtype=np.float64)
+        res = closest_res(areas, values, resround)
+        assert res.tolist() == list(cases.values()), (resround, res.tolist())
+        for value, want in cases.items():
+            assert int(closest_res(areas, value, resround)) == want, (resround, value)
+
+
+def check_dggs_lookups():
+
+    """
+    dg_closest_res_to_area, _to_spacing and _to_cls return the resolution of a value taken from the table itself (the
+    finest resolutions are left out, their values are rounded to 0 and tie)
+    """
+    table = predefined_res_table('ISEA4H')
+    dggs = Dggs(dggs_type='ISEA4H')
+    lookups = [('Area (km^2)', dggs.dg_closest_res_to_area), ('Spacing (km)', dggs.dg_closest_res_to_spacing), ('CLS (km)', dggs.dg_closest_res_to_cls)]
+    for col, lookup in lookups:
+        for res in [0, 5, 10, 15]:
+            for resround in ['nearest', 'up', 'down']:
+                got = lookup(table[col].iloc[res], resround, True, show_info=False)
+                assert got == res, (col, res, resround, got)
+
+
+if __name__ == '__main__':
+
+    # python check_closest_res.py     checks the resolution lookups of dg_closest_res_to_area/spacing/cls, no dggrid needed
+    check_table_values()
+    check_dggs_lookups()
+    print('closest resolutions match')
+    sys.exit(0)
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+import sys
+
+import numpy as np
+import pandas as pd
+
+from dggrid4py import DGGRIDv7
+from dggrid4py.dggrid_runner import dgselect
+from dggrid4py.grid_stats import predefined_res_table
+
+
+"""
+the predefined dggs_types with the resolutions compared, mixed_aperture_level for the mixed aperture grids
+"""
+checked_grids = {
+    'ISEA3H': [0, 9, 20],
+    'ISEA4H': [0, 9, 17],
+    'ISEA4T': [0, 9, 17],
+    'ISEA4D': [0, 9, 17],
+    'ISEA43H': [0, 9, 20],
+    'ISEA7H': [0, 9, 16],
+    'FULLER3H': [0, 9, 20],
+    'FULLER4H': [0, 9, 17],
+    'FULLER4T': [0, 9, 17],
+    'FULLER4D': [0, 9, 17],
+    'FULLER43H': [0, 9, 20],
+    'FULLER7H': [0, 9, 16],
+    'SUPERFUND': [0, 4, 9],
+    'PLANETRISK': [0, 9, 20],
+    }
+
+mixed_aperture_levels = { 'ISEA43H': 5, 'FULLER43H': 3 }
+
+
+def dggrid_stats(dggrid_instance, dggs_type, resolution, mixed_aperture_level=None):
+
+    """
+    the statistics table as dggrid prints it, with the intercell spacing if dggrid prints it (dggrid 6)
+    """
+    dggs = dgselect(dggs_type=dggs_type, res=resolution, mixed_aperture_level=mixed_aperture_level)
+    table = np.atleast_2d(dggrid_instance.dgapi_grid_stats(dggs)['output_conf']['stats_output'])
+
+    columns = ['Resolution', 'Cells', 'Area (km^2)', 'CLS (km)']
+    if table.shape[1] == 5:
+        columns.insert(3, 'Spacing (km)')
+    return pd.DataFrame(table, columns=columns)
+
+
+def check_predefined_stats(executable):
+
+    """
+    the precomputed statistics of every predefined dggs_type match dggrid's OUTPUT_STATS at a few resolutions: the cell
+    counts exactly, the areas, spacings and CLS up to the 7 decimals dggrid prints. Returns the dggs_types compared and
+    those dggrid doesn't generate (e.g. the aperture 7 grids before dggrid 7)
+    """
+    dggrid_instance = DGGRIDv7(executable=executable, silent=True)
+
+    compared, unsupported = [], []
+    for dggs_type, resolutions in checked_grids.items():
+        mixed_aperture_level = mixed_aperture_levels.get(dggs_type)
+        try:
+            tables = [ dggrid_stats(dggrid_instance, dggs_type, resolution, mixed_aperture_level) for resolution in resolutions ]
+        except ValueError:
+            unsupported.append(dggs_type)
+            continue
+
+        for resolution, table in zip(resolutions, tables):
+            predefined = predefined_res_table(dggs_type, resolution, mixed_aperture_level)
+            assert not predefined is None, (dggs_type, resolution)
+            assert predefined['Resolution'].tolist() == table['Resolution'].astype(int).tolist(), (dggs_type, resolution)
+            assert (predefined['Cells'].values == table['Cells'].values.astype(np.int64)).all(), (dggs_type, resolution)
+            for col in table.columns[2:]:
+                assert np.allclose(predefined[col].values, table[col].values, rtol=1e-12, atol=1e-6), (dggs_type, resolution, col)
+
+        compared.append(dggs_type)
+
+    return compared, unsupported
+
+
+if __name__ == '__main__':
+
+    # python check_grid_stats.py <dggrid>     compares the precomputed statistics with dggrid's OUTPUT_STATS
+    compared, unsupported = check_predefined_stats(sys.argv[1])
+    print(f"{', '.join(compared)} match dggrid")
+    if len(unsupported) > 0:
+        print(f"not compared, this dggrid doesn't generate {', '.join(unsupported)}")
+    sys.exit(0)
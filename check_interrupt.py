@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+from pathlib import Path
+import sys
+
+import numpy as np
+import pandas as pd
+
+import geopandas as gpd
+import shapely
+
+from dggrid4py import DGGRIDv7, isea
+from dggrid4py.interrupt import crosses_interruption, interrupt_cells, intersectEast, intersectWest
+
+
+reference_file = Path(__file__).parent / 'interrupt_reference.geojson'
+
+reference_grids = {
+    'ISEA3H': 5,
+    'ISEA4H': 4,
+    'ISEA4T': 4,
+    'ISEA4D': 4,
+    }
+
+
+def loop_crosses(geometry):
+
+    """
+    the test of the former per-cell loop: a vertex more than 180º of longitude away from the first vertex
+    """
+    lon = np.asarray(geometry.exterior.coords)[:, 0]
+    return bool((np.abs(lon[0] - lon[1:]) > 180).any())
+
+
+def loop_interrupt(geometry):
+
+    """
+    the split of the former per-cell loop: the negative longitudes moved east by 360º, the parts east and west of 180º
+    """
+    coords = np.asarray(geometry.exterior.coords).copy()
+    coords[coords[:, 0] < 0, 0] += 360
+    poly = shapely.Polygon(coords)
+
+    return [ intersectEast.intersection(poly), shapely.affinity.translate(intersectWest.intersection(poly), xoff=-360) ]
+
+
+def make_reference(executable, out_file=reference_file):
+
+    """
+    generates the reference_grids with dggrid and keeps the cells close to the 180º meridian and to the poles
+    """
+    dggrid_instance = DGGRIDv7(executable=executable, silent=True)
+
+    tables = []
+    for dggs_type, resolution in reference_grids.items():
+        cells = dggrid_instance.grid_cell_polygons_for_extent(dggs_type, resolution)
+        coords, index = shapely.get_coordinates(cells.geometry.values, return_index=True)
+        near = (np.abs(coords[:, 0]) > 175) | (np.abs(coords[:, 1]) > 80)
+        cells = cells.loc[np.bincount(index[near], minlength=len(cells)) > 0, ['name', 'geometry']]
+        cells.insert(0, 'resolution', resolution)
+        cells.insert(0, 'dggs_type', dggs_type)
+        tables.append(cells)
+
+    table = pd.concat(tables, ignore_index=True)
+    table.to_file(out_file, driver='GeoJSON', COORDINATE_PRECISION=7)
+    return table
+
+
+def check_loop(in_file=reference_file):
+
+    """
+    crosses_interruption and interrupt_cells select and split the same dggrid cells as the former per-cell loop
+    """
+    table = gpd.read_file(in_file)
+
+    crosses = crosses_interruption(table.geometry.values)
+    loop = np.array([ loop_crosses(geometry) for geometry in table.geometry.values ])
+    assert (crosses == loop).all(), table.loc[crosses != loop, ['dggs_type', 'resolution', 'name']].to_string()
+
+    parts = interrupt_cells(table)
+    for k in np.flatnonzero(loop):
+        cell = table.iloc[k]
+        got = parts.loc[(parts['dggs_type'] == cell['dggs_type']) & (parts['name'] == cell['name'])].geometry.values
+        want = [ part for part in loop_interrupt(cell.geometry) if part.area > 0 ]
+        assert len(got) == len(want), (cell['dggs_type'], cell['name'])
+        for got_part, want_part in zip(got, want):
+            assert got_part.symmetric_difference(want_part).area < 1e-9, (cell['dggs_type'], cell['name'])
+
+    return len(table), int(loop.sum())
+
+
+def check_native_pole_cells(in_file=reference_file):
+
+    """
+    with engine='native' the cells around the poles come cut at the 180º meridian already, they are neither split nor
+    shifted. The other cells running along a pole are contiguous wedges once shifted, the cells away from the poles are
+    flagged like the dggrid cells by the per-cell loop
+    """
+    table = gpd.read_file(in_file)
+    dggrid_instance = DGGRIDv7(silent=True)
+
+    for (dggs_type, resolution), rows in table.groupby(['dggs_type', 'resolution']):
+        seqnums = rows['name'].values.astype(np.int64)
+        cells = dggrid_instance.grid_cell_polygons_from_cellids(seqnums, dggs_type, resolution, engine='native', densify=0)
+        along_pole, _ = isea.pole_cells(cells.geometry.values)
+        bounds = shapely.bounds(cells.geometry.values)
+        caps = along_pole & ((bounds[:, 2] - bounds[:, 0]) > 360 - isea.pole_tolerance)
+
+        flagged = dggrid_instance.grid_cell_polygons_from_cellids(seqnums, dggs_type, resolution, engine='native', densify=0, antimeridian='flag')
+        assert not flagged['crosses_antimeridian'].values[caps].any(), dggs_type
+        loop = np.array([ loop_crosses(geometry) for geometry in rows.geometry.values ])
+        assert (flagged['crosses_antimeridian'].values[~along_pole] == loop[~along_pole]).all(), dggs_type
+
+        shifted = dggrid_instance.grid_cell_polygons_from_cellids(seqnums, dggs_type, resolution, engine='native', densify=0, antimeridian='shift')
+        bounds = shapely.bounds(shifted.geometry.values)
+        assert ((bounds[:, 2] - bounds[:, 0])[along_pole & ~caps] <= 180 + isea.pole_tolerance).all(), dggs_type
+
+        split = dggrid_instance.grid_cell_polygons_from_cellids(seqnums, dggs_type, resolution, engine='native', densify=0, antimeridian='split')
+        for antimeridian, fixed in [('shift', shifted), ('split', split)]:
+            for seqnum, cap in zip(seqnums[caps], cells.geometry.values[caps]):
+                got = fixed.loc[fixed['name'] == seqnum].geometry.values
+                assert len(got) == 1 and got[0].equals(cap), (dggs_type, seqnum, antimeridian)
+
+
+if __name__ == '__main__':
+
+    # python check_interrupt.py                  compares the antimeridian splitting with the former per-cell loop on interrupt_reference.geojson
+    # python check_interrupt.py make <dggrid>     rebuilds interrupt_reference.geojson with the dggrid executable
+    if len(sys.argv) > 2 and sys.argv[1] == 'make':
+        make_reference(sys.argv[2])
+
+    cells, crossing = check_loop()
+    check_native_pole_cells()
+    print(f"{crossing} of {cells} dggrid cells cross the 180º meridian, split like the per-cell loop")
+    sys.exit(0)
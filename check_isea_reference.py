@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+
+from pathlib import Path
+import re
+import sys
+
+import numpy as np
+import pandas as pd
+
+import geopandas as gpd
+
+from dggrid4py import DGGRIDv7, isea
+
+
+reference_file = Path(__file__).parent / 'isea_reference.csv'
+
+reference_grids = {
+    'ISEA3H': [1, 6, 13, 19],
+    'ISEA4H': [2, 8, 15],
+    'ISEA4T': [3, 9, 16],
+    'ISEA4D': [3, 9, 16],
+    'ISEA7H': [2, 7, 12],
+    }
+
+# the aperture 7 grids came with dggrid 7
+reference_dggrid_version = (7, 0)
+
+
+def great_circle_points(lon1, lat1, lon2, lat2, fractions):
+
+    """
+    points at the fractions of the great circle arc between two points (radians in, degrees out)
+    """
+    a = np.array([ np.cos(lat1) * np.cos(lon1), np.cos(lat1) * np.sin(lon1), np.sin(lat1) ])
+    b = np.array([ np.cos(lat2) * np.cos(lon2), np.cos(lat2) * np.sin(lon2), np.sin(lat2) ])
+    omega = np.arccos(np.clip(np.dot(a, b), -1.0, 1.0))
+
+    points = []
+    for f in fractions:
+        p = (np.sin((1 - f) * omega) * a + np.sin(f * omega) * b) / np.sin(omega)
+        points.append((np.degrees(np.arctan2(p[1], p[0])), np.degrees(np.arcsin(np.clip(p[2], -1.0, 1.0)))))
+    return points
+
+
+def reference_points(seed=42, n_random=200):
+
+    """
+    the test points with the kind of place they are at: random points, the icosahedron vertices and points close to
+    them, points on and next to the face edges, and points on and next to the antimeridian
+    """
+    rows = []
+    rng = np.random.default_rng(seed)
+    for lon, lat in zip(rng.uniform(-180, 180, n_random), np.degrees(np.arcsin(rng.uniform(-1, 1, n_random)))):
+        rows.append(('random', lon, lat))
+
+    verts = np.asarray(isea.icosahedron()['verts'], dtype=np.float64)
+    for lon, lat in np.degrees(verts):
+        rows.append(('vertex', lon, lat))
+        for dlon, dlat in [(1e-6, 0), (-1e-6, 0), (0, 1e-6), (0, -1e-6), (1e-3, 1e-3), (-1e-3, -1e-3)]:
+            rows.append(('near_vertex', lon + dlon, float(np.clip(lat + dlat, -90, 90))))
+
+    edges = set()
+    for tri in isea.ico_tri_verts:
+        for a, b in [(tri[0], tri[1]), (tri[1], tri[2]), (tri[2], tri[0])]:
+            edges.add((min(a, b), max(a, b)))
+    for a, b in sorted(edges):
+        for lon, lat in great_circle_points(verts[a, 0], verts[a, 1], verts[b, 0], verts[b, 1], [0.25, 0.5, 0.8]):
+            rows.append(('edge', lon, lat))
+            for dlon, dlat in [(1e-7, 0), (-1e-7, 0), (0, 1e-7), (0, -1e-7)]:
+                rows.append(('near_edge', lon + dlon, lat + dlat))
+
+    for lat in [-75.0, -40.0, -10.5, 0.0, 12.25, 45.0, 80.0]:
+        for lon in [180.0, -180.0, 179.9999999, -179.9999999, 179.99, -179.99]:
+            rows.append(('antimeridian', lon, lat))
+
+    return pd.DataFrame(rows, columns=['kind', 'lon', 'lat'])
+
+
+def dggrid_version(logs):
+
+    """
+    the dggrid version from the log of a run, e.g. (6, 4) from '** executing DGGRID version 6.4 **'
+    """
+    match = re.search(r'DGGRID version ([0-9]+)\.([0-9]+)', logs)
+    if match is None:
+        raise ValueError('no dggrid version in the logs')
+    return int(match.group(1)), int(match.group(2))
+
+
+def make_reference(executable, out_file=reference_file):
+
+    """
+    transforms the reference points with dggrid's TRANSFORM_POINTS for all reference_grids and writes the table with
+    the dggrid version, points that dggrid can't transform are left out. Needs at least reference_dggrid_version
+    """
+    points = reference_points()
+    dggrid_instance = DGGRIDv7(executable=executable, capture_logs=True, silent=True)
+
+    def transform(rows, dggs_type, resolution):
+        gdf = gpd.GeoDataFrame(geometry=gpd.points_from_xy(rows['lon'].values, rows['lat'].values), crs=4326)
+        return dggrid_instance.cells_for_geo_points(gdf, True, dggs_type, resolution)['seqnums'].values
+
+    transform(points.iloc[:1], 'ISEA4H', 0)
+    version = dggrid_version(dggrid_instance.last_run_logs)
+    if version < reference_dggrid_version:
+        raise ValueError(f"the reference needs dggrid {'.'.join(map(str, reference_dggrid_version))} or newer for the aperture 7 grids, "
+                         f"{executable} is dggrid {'.'.join(map(str, version))}")
+
+    tables = []
+    for dggs_type, resolutions in reference_grids.items():
+        for resolution in resolutions:
+            table = points.copy()
+            try:
+                table['seqnum'] = transform(points, dggs_type, resolution)
+            except ValueError:
+                # dggrid fails on some points exactly on the icosahedron vertices (e.g. for ISEA4T), these have no reference
+                seqnums = []
+                for k in range(len(points)):
+                    try:
+                        seqnums.append(transform(points.iloc[k:k + 1], dggs_type, resolution)[0])
+                    except ValueError:
+                        print(f"{dggs_type} {resolution}: dggrid fails on {points.iloc[k].to_dict()}")
+                        seqnums.append(-1)
+                table['seqnum'] = seqnums
+                table = table.loc[table['seqnum'] >= 0]
+
+            table.insert(0, 'resolution', resolution)
+            table.insert(0, 'dggs_type', dggs_type)
+            tables.append(table)
+
+    table = pd.concat(tables, ignore_index=True)
+    table['dggrid_version'] = '.'.join(map(str, version))
+    table.to_csv(out_file, index=False)
+    return table
+
+
+def check_reference(in_file=reference_file):
+
+    """
+    compares the seqnums of the native engine (isea.geo_to_seqnum) with the dggrid reference table, returns the rows
+    that differ. Reports the dggrid version of the table, the reference_grids the table has no rows for and the grids
+    the native engine doesn't cover yet
+    """
+    # round_trip, the points on the vertices and edges must be read back exactly as dggrid got them
+    table = pd.read_csv(in_file, float_precision='round_trip', dtype={ 'dggrid_version': str })
+
+    versions = sorted(table['dggrid_version'].unique())
+    print(f"reference from dggrid {', '.join(versions)}")
+    if min(tuple(map(int, version.split('.'))) for version in versions) < reference_dggrid_version:
+        print(f"the reference predates dggrid {'.'.join(map(str, reference_dggrid_version))}, rebuild it with: python check_isea_reference.py make <dggrid>")
+
+    for dggs_type, resolutions in reference_grids.items():
+        for resolution in resolutions:
+            if not ((table['dggs_type'] == dggs_type) & (table['resolution'] == resolution)).any():
+                print(f"{dggs_type} {resolution}: no reference rows")
+
+    mismatches = []
+    for (dggs_type, resolution), rows in table.groupby(['dggs_type', 'resolution']):
+        if not dggs_type in isea.native_dggs_types:
+            print(f"{dggs_type} {resolution}: not covered by the native engine, {len(rows)} rows unchecked")
+            continue
+        seqnums = isea.geo_to_seqnum(rows['lon'].values, rows['lat'].values, dggs_type, resolution)
+        differ = rows.loc[seqnums != rows['seqnum'].values].copy()
+        differ['native'] = seqnums[seqnums != rows['seqnum'].values]
+        mismatches.append(differ)
+        print(f"{dggs_type} {resolution}: {len(rows) - len(differ)} of {len(rows)} equal")
+
+    return pd.concat(mismatches, ignore_index=True)
+
+
+def check_unsupported_grids():
+
+    """
+    the native engine raises a ValueError for the grids it doesn't cover instead of running dggrid, even when there is
+    no dggrid executable
+    """
+    dggrid_instance = DGGRIDv7(executable='no_dggrid_here', silent=True)
+    points = gpd.GeoDataFrame(geometry=gpd.points_from_xy([10.0, -70.5], [45.0, 12.25]), crs=4326)
+    calls = [
+        lambda dggs_type: dggrid_instance.grid_cell_polygons_from_cellids([1, 2, 3], dggs_type, 3, engine='native'),
+        lambda dggs_type: dggrid_instance.cells_for_geo_points(points.copy(), True, dggs_type, 3, engine='native'),
+        lambda dggs_type: dggrid_instance.cell_parents([1, 2, 3], dggs_type, 3, engine='native'),
+        ]
+    for dggs_type in ['ISEA7H', 'FULLER7H', 'PLANETRISK', 'FULLER4H']:
+        for call in calls:
+            try:
+                call(dggs_type)
+            except ValueError as e:
+                assert dggs_type in str(e) and "engine='dggrid'" in str(e), str(e)
+            else:
+                raise AssertionError(f"the native engine runs {dggs_type}")
+
+
+if __name__ == '__main__':
+
+    # python check_isea_reference.py                  compares the native engine with isea_reference.csv
+    # python check_isea_reference.py make <dggrid>     rebuilds isea_reference.csv with the dggrid executable
+    if len(sys.argv) > 2 and sys.argv[1] == 'make':
+        make_reference(sys.argv[2])
+
+    check_unsupported_grids()
+
+    mismatches = check_reference()
+    if len(mismatches) > 0:
+        print(mismatches.to_string())
+        sys.exit(1)
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+from pathlib import Path
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import geopandas as gpd
+
+from dggrid4py import DGGRIDv7
+from dggrid4py.dggrid_runner import Dggs, seqnum_runs, dg_seqnum_run_jobs, dg_merge_seqnum_runs
+from dggrid4py.dggrid_runner import seqnum_run_cost_s, seqnum_cell_cost_s, seqnum_run_max_gap
+
+
+def generated_cells(runs):
+
+    """
+    the number of cells the bounded generations of the runs generate
+    """
+    return sum(last - first + 1 for first, last in runs)
+
+
+def check_scattered_runs(max_gap=seqnum_run_max_gap):
+
+    """
+    scattered seqnums in many clusters must not be merged into wide runs: no run has a gap of more than max_gap and the
+    generated cells are bounded by the requested seqnums, not by their span
+    """
+    runs = seqnum_runs(range(0, 10**6, 20000), max_gap=max_gap)
+    assert runs == [ (s, s) for s in range(0, 10**6, 20000) ], runs[:3]
+
+    rng = np.random.default_rng(42)
+    seqnums = np.unique(rng.integers(1, 10**8, 1000))
+    runs = seqnum_runs(seqnums, max_gap=max_gap)
+    span = int(seqnums.max() - seqnums.min() + 1)
+    generated = generated_cells(runs)
+    assert generated <= len(seqnums) * (max_gap + 1), (generated, span)
+
+    # clusters of close seqnums stay in one run each
+    clusters = np.concatenate([ start + np.arange(0, 500, 5) for start in range(0, 10**8, 10**6) ])
+    runs = seqnum_runs(rng.permutation(clusters), max_gap=max_gap)
+    assert len(runs) == 100 and generated_cells(runs) == 100 * 496, (len(runs), generated_cells(runs))
+
+    return generated, span
+
+
+def measure_run_costs(executable, dggs_type='ISEA4H', resolution=9, cells=100000, repeat=3):
+
+    """
+    the costs that seqnum_run_max_gap is derived from: the time of a generation of 1 cell is the cost of a run, the
+    additional time per cell of a generation of cells contiguous seqnums the cost of a cell
+    """
+    dggrid_instance = DGGRIDv7(executable=executable, silent=True)
+
+    def generation_time(n):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            gdf = dggrid_instance.grid_cell_polygons_from_cellids(np.arange(1000, 1000 + n), dggs_type, resolution)
+            times.append(time.perf_counter() - start)
+            assert len(gdf) == n
+        return min(times)
+
+    run_cost = generation_time(1)
+    cell_cost = (generation_time(cells) - run_cost) / (cells - 1)
+
+    return run_cost, cell_cost, int(round(run_cost / cell_cost))
+
+
+def check_empty_merge(out_dir):
+
+    """
+    a SEQNUMS generation of an aperture 7 grid where no run returns cells still writes readable, empty outputs
+    """
+    seqnum_file = Path(out_dir) / 'seqnums.txt'
+    seqnum_file.write_text('\n'.join(str(s) for s in [10, 20, 50000, 90000]) + '\n')
+
+    dggs = Dggs(dggs_type='ISEA7H', resolution=5)
+    subset_conf = { 'clip_subset_type': 'SEQNUMS', 'clip_region_files': str(seqnum_file) }
+
+    for driver, suffix in [('GPKG', '.gpkg'), ('FlatGeobuf', '.fgb'), ('GeoJSON', '.geojson')]:
+        output_conf = {
+            'cell_output_type': 'GDAL',
+            'cell_output_gdal_format': driver,
+            'cell_output_file_name': str(Path(out_dir) / f"cells{suffix}"),
+            'point_output_type': 'TEXT',
+            'point_output_file_name': str(Path(out_dir) / f"points_{driver}"),
+            }
+        run_jobs = dg_seqnum_run_jobs(dggs, subset_conf, output_conf)
+        assert len(run_jobs['jobs']) == 3
+
+        # the first run writes an empty layer and an END only text file, the other runs no files at all
+        _, run_output_conf = run_jobs['jobs'][0]
+        gpd.GeoDataFrame(geometry=gpd.GeoSeries([], crs=4326)).to_file(run_output_conf['cell_output_file_name'], driver=driver)
+        Path(run_output_conf['point_output_file_name'] + '.txt').write_text('END\n')
+
+        dg_merge_seqnum_runs(output_conf, run_jobs)
+
+        cells = gpd.read_file(output_conf['cell_output_file_name'])
+        assert len(cells) == 0, driver
+        assert Path(output_conf['point_output_file_name'] + '.txt').read_text() == 'END\n', driver
+
+
+if __name__ == '__main__':
+
+    # python check_seqnum_runs.py              checks the seqnum runs of the aperture 7 SEQNUMS clipping, no dggrid needed
+    # python check_seqnum_runs.py <dggrid>     also measures the run and cell costs that seqnum_run_max_gap is derived from
+    generated, span = check_scattered_runs()
+    print(f"1000 scattered seqnums generate {generated} of {span} cells ({100 * generated / span:.3g}% of the span)")
+    with tempfile.TemporaryDirectory() as out_dir:
+        check_empty_merge(out_dir)
+    print('empty seqnum runs write empty outputs')
+    if len(sys.argv) > 1:
+        run_cost, cell_cost, max_gap = measure_run_costs(sys.argv[1])
+        print(f"a run costs {1000 * run_cost:.1f} ms and a cell {1e6 * cell_cost:.1f} µs, a gap of {max_gap} cells "
+              f"(seqnum_run_max_gap {seqnum_run_max_gap} from {1000 * seqnum_run_cost_s:.1f} ms and {1e6 * seqnum_cell_cost_s:.1f} µs)")
+    sys.exit(0)
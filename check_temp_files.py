@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import stat
+import sys
+import tempfile
+import threading
+
+from dggrid4py import DGGRIDv7
+from dggrid4py.async_runner import AsyncDGGRIDv7
+from dggrid4py.scratch import TempFileTracker, bind_context
+
+
+def failing_executable(out_dir, seconds=0.2):
+
+    """
+    writes a stand-in for dggrid that waits a moment and fails, the calls still write and remove their temporary files
+    and the calls started together overlap
+    """
+    executable = Path(out_dir) / 'dggrid_failing'
+    executable.write_text(f"#!/bin/sh\nsleep {seconds}\nexit 1\n")
+    executable.chmod(executable.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return executable
+
+
+def check_parallel_measures(out_dir, jobs=4):
+
+    """
+    measure blocks running at the same time in several threads count only their own files, also those of the work they
+    hand to a thread pool, and all of them roll up into the tracker
+    """
+    tracker = TempFileTracker()
+    barrier = threading.Barrier(jobs)
+
+    def write(path, size):
+        Path(path).write_bytes(b'x' * size)
+        tracker.add(path)
+        tracker.written(path)
+
+    def job(k):
+        with tracker.measure() as counts:
+            barrier.wait()
+            paths = [ Path(out_dir) / f"job_{k}_{n}" for n in range(k + 1) ]
+            with ThreadPoolExecutor(2) as pool:
+                list(pool.map(bind_context(write), paths, [ 10 * (k + 1) ] * len(paths)))
+            barrier.wait()
+            tracker.read(paths[0])
+            tracker.remove(*paths[1:])
+        return counts
+
+    with ThreadPoolExecutor(jobs) as pool:
+        results = list(pool.map(job, range(jobs)))
+
+    for k, counts in enumerate(results):
+        assert counts == { 'files_created': k + 1, 'files_removed': k, 'files_alive': 1, 'bytes_written': 10 * (k + 1) ** 2, 'bytes_read': 10 * (k + 1) }, (k, counts)
+
+    total = tracker.stats()
+    assert total['files_created'] == sum(counts['files_created'] for counts in results) and total['files_alive'] == jobs, total
+
+
+def check_call_stats(out_dir):
+
+    """
+    the last_call_stats of calls running at the same time in threads and in asyncio tasks are those of the same calls
+    run one by one
+    """
+    executable = failing_executable(out_dir)
+    cell_id_lists = [ list(range(1, 10)), list(range(1, 1000)), list(range(1, 100000)) ]
+
+    dggrid_instance = DGGRIDv7(executable=executable, silent=True, capture_logs=False)
+
+    def call(cell_id_list):
+        try:
+            dggrid_instance.grid_cell_polygons_from_cellids(cell_id_list, 'ISEA4H', 9)
+        except ValueError:
+            pass
+        return dggrid_instance.last_call_stats
+
+    alone = [ call(cell_id_list) for cell_id_list in cell_id_lists ]
+    assert len(set(stats['bytes_written'] for stats in alone)) == len(alone)
+    for stats in alone:
+        assert stats['files_created'] == stats['files_removed'] and stats['files_alive'] == 0, stats
+
+    with ThreadPoolExecutor(len(cell_id_lists)) as pool:
+        assert list(pool.map(call, cell_id_lists)) == alone
+
+    async_instance = AsyncDGGRIDv7(executable=executable, silent=True, capture_logs=False)
+
+    async def async_call(cell_id_list):
+        try:
+            await async_instance.grid_cell_polygons_from_cellids(cell_id_list, 'ISEA4H', 9)
+        except ValueError:
+            pass
+        return async_instance.last_call_stats
+
+    async def run_all():
+        return await asyncio.gather(*[ async_call(cell_id_list) for cell_id_list in cell_id_lists ])
+
+    assert asyncio.run(run_all()) == alone
+    async_instance.close()
+
+    return alone
+
+
+if __name__ == '__main__':
+
+    # python check_temp_files.py     checks that parallel calls count their temporary files apart, no dggrid needed
+    with tempfile.TemporaryDirectory() as out_dir:
+        check_parallel_measures(out_dir)
+        for stats in check_call_stats(out_dir):
+            print(stats)
+    print('temporary files are counted per call')
+    sys.exit(0)
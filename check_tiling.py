@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+import sys
+
+import numpy as np
+
+from shapely.geometry import Polygon
+
+from dggrid4py import DGGRIDv7
+from dggrid4py.tiling import plan_tiles, dggrid_clip_edges
+
+
+"""
+dggrid rounds the clip polygons to clipper_scale_factor (1e6) units of the quad edge, about 7 m: the cells that reach
+less than grazing degrees into the clip area may be selected by one run and not by another
+"""
+grazing = 1e-4
+
+
+def check_tiles_match_single_run(executable, dggs_type='ISEA4H', resolution=9, tiles=6):
+
+    """
+    a clip polygon with long edges across several tiles and quads: the tiled generation selects the seqnums of a single
+    clipped run, apart from cells that only graze the clip boundary
+    """
+    clip_geom = Polygon([(-5, -5), (25, 0), (20, 30), (0, 20)])
+    dggrid_instance = DGGRIDv7(executable=executable, silent=True)
+
+    single = dggrid_instance.grid_cell_polygons_for_extent(dggs_type, resolution, clip_geom=clip_geom)
+    max_cells_per_tile = len(single) // tiles
+
+    stats = dggrid_instance.grid_stats_table(dggs_type, resolution)
+    total_cells = stats.loc[stats['Resolution'] == resolution, 'Cells'].values[0]
+    assert len(plan_tiles(total_cells, max_cells_per_tile, clip_geom=clip_geom)) >= tiles
+
+    tiled = dggrid_instance.grid_cell_polygons_for_extent_tiled(dggs_type, resolution, clip_geom=clip_geom, max_cells_per_tile=max_cells_per_tile)
+
+    name_col = 'name' if 'name' in single.columns else 'Name'
+    single_seqnums = single[name_col].astype(np.int64).values
+    tiled_seqnums = tiled[name_col].astype(np.int64).values
+    assert (np.diff(tiled_seqnums) > 0).all()
+
+    inside = dggrid_clip_edges(clip_geom, 0.005).buffer(-grazing)
+    missing = single[~np.isin(single_seqnums, tiled_seqnums)]
+    extra = tiled[~np.isin(tiled_seqnums, single_seqnums)]
+    for label, cells in [('missing', missing), ('extra', extra)]:
+        assert not cells.intersects(inside).any(), (label, cells[name_col].tolist())
+
+    return len(single), len(missing), len(extra)
+
+
+if __name__ == '__main__':
+
+    # python check_tiling.py <dggrid>     checks grid_cell_polygons_for_extent_tiled against a single clipped dggrid run
+    cells, missing, extra = check_tiles_match_single_run(sys.argv[1])
+    print(f"{cells} cells in the single run, {missing} grazing cells missing and {extra} extra in the tiled run")
+    sys.exit(0)
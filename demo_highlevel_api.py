@@ -105,13 +105,3 @@ if __name__ == '__main__':
     highlevel_grid_gen_and_transform(dggrid)
 
     highlevel_grid_stats(dggrid)
-
-    """
-    TODO:
-
-    - get parent_for_cell_id at coarser resolution
-    - get children_for_cell_id at finer resolution
-
-    - sample raster values into s2 dggs cells
-    - sample vector values into s2 dggs cells
-    """
@@ -1,5 +1,8 @@
 # -*- coding: utf-8 -*-
 
 from .dggrid_runner import DGGRIDv7, Dggs, dgselect, dggs_types
+from .async_runner import AsyncDGGRIDv7
+from .cell_cache import CellGeometryCache
+from .scratch import WorkerDirPool
 
 __version__ = "0.2.5"
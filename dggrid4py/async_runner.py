@@ -0,0 +1,825 @@
+# -*- coding: utf-8 -*-
+
+from pathlib import Path
+import uuid
+import os
+import sys
+import asyncio
+import contextvars
+import functools
+import inspect
+import traceback
+from contextlib import asynccontextmanager, nullcontext
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+
+from .dggrid_runner import DGGRIDv7, dgselect, dg_grid_gen_meta, dg_points_meta, dg_grid_stats_meta, dg_parse_stats_logs, dg_run_error_message
+from .dggrid_runner import dg_seqnum_run_jobs, dg_merge_seqnum_runs, dg_remove_seqnum_run_files
+from .grid_stats import lookup_stats_table, store_stats_table
+from .interchange import read_bin_vals_file, read_bin_presence_file
+from .binning import presence_classes
+from .scratch import drain_fifo
+from .tiling import plan_tiles
+from .hierarchy import csr_sort_rows, csr_invert
+from .hierarchy import lookup_rollup_parents, store_rollup_parents, rollup_state, rollup_step, rollup_values
+from . import isea
+
+
+"""
+decorator of the higher level coroutines, like dggrid_runner.measured: counts the temporary files of every call and keeps
+the counters as last_call_stats of the calling asyncio task
+"""
+def measured(method):
+
+    if inspect.isasyncgenfunction(method):
+        @functools.wraps(method)
+        async def measured_generator(self, *args, **kwargs):
+            child = self.temp_files.child()
+            steps = method(self, *args, **kwargs)
+            try:
+                while True:
+                    with child.counting():
+                        try:
+                            item = await steps.__anext__()
+                        except StopAsyncIteration:
+                            return
+                    yield item
+            finally:
+                with child.counting():
+                    await steps.aclose()
+                self._last_call_stats.set(child.stats())
+
+        return measured_generator
+
+    @functools.wraps(method)
+    async def measured_method(self, *args, **kwargs):
+        child = self.temp_files.child()
+        try:
+            with child.counting():
+                return await method(self, *args, **kwargs)
+        finally:
+            self._last_call_stats.set(child.stats())
+
+    return measured_method
+
+
+"""
+asyncio variant of the DGGRIDv7 runner. The dggrid processes are started with asyncio.create_subprocess_exec, so
+many requests can share one event loop, and a semaphore limits how many dggrid processes run at the same time.
+Preparing the input files and reading the (potentially large) outputs is done in worker threads to keep the loop free.
+"""
+class AsyncDGGRIDv7(object):
+
+    def __init__(self, executable = 'dggrid', working_dir = None, capture_logs=True, silent=False, tmp_geo_out_legacy= True, max_concurrent=None,
+                 cell_cache=False, cell_cache_max_cells=1000000, geo_format=None, worker_dirs=None, scratch='disk'):
+        # max_concurrent limits how many dggrid subprocesses run at the same time (default: number of cpus)
+        self.max_concurrent = max_concurrent if not max_concurrent is None else os.cpu_count()
+
+        # the synchronous instance knows how to prepare the dggrid inputs and how to read the outputs,
+        # worker_dirs=True gives every concurrent run a warm worker directory. Its run slots are the process-wide limit:
+        # the methods that run it in a worker thread and the async runs (see _process_slot) all take them
+        self.dggrid = DGGRIDv7(executable=executable, working_dir=working_dir, capture_logs=capture_logs, silent=silent, tmp_geo_out_legacy=tmp_geo_out_legacy,
+                               max_concurrent=self.max_concurrent, cell_cache=cell_cache, cell_cache_max_cells=cell_cache_max_cells, geo_format=geo_format,
+                               worker_dirs=self.max_concurrent if worker_dirs is True else worker_dirs, scratch=scratch)
+        self._run_slots = None
+        self._run_slots_loop = None
+        # the waits for the run slots of the synchronous instance block a thread each, they get their own threads so
+        # that they never take the threads of asyncio.to_thread (at most max_concurrent runs wait, see run)
+        self._slot_waiters = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix='dggrid_slot')
+
+        # run state is kept per asyncio task
+        self._last_run_succesful = contextvars.ContextVar('last_run_succesful', default=False)
+        self._last_run_logs = contextvars.ContextVar('last_run_logs', default='')
+        self._last_call_stats = contextvars.ContextVar('last_call_stats', default={})
+
+
+    @property
+    def executable(self):
+        return self.dggrid.executable
+
+    @property
+    def working_dir(self):
+        return self.dggrid.working_dir
+
+    @property
+    def capture_logs(self):
+        return self.dggrid.capture_logs
+
+    @property
+    def silent(self):
+        return self.dggrid.silent
+
+    @property
+    def cell_cache(self):
+        return self.dggrid.cell_cache
+
+    @property
+    def temp_files(self):
+        return self.dggrid.temp_files
+
+    @property
+    def last_run_succesful(self):
+        return self._last_run_succesful.get()
+
+    @property
+    def last_run_logs(self):
+        return self._last_run_logs.get()
+
+    @property
+    def last_call_stats(self):
+        """
+        the temporary file counters of the last higher level call of the calling task, see DGGRIDv7.last_call_stats
+        """
+        return self._last_call_stats.get()
+
+
+    def is_runnable(self):
+        return self.dggrid.is_runnable()
+
+
+    def close(self):
+        """
+        removes the worker directories and the memory scratch of the instance, see DGGRIDv7.close
+        """
+        self._slot_waiters.shutdown(wait=False, cancel_futures=True)
+        self.dggrid.close()
+
+
+    def _get_run_slots(self):
+        # an asyncio.Semaphore belongs to the event loop it is used in
+        loop = asyncio.get_running_loop()
+        if not self._run_slots_loop is loop:
+            self._run_slots = asyncio.Semaphore(self.max_concurrent)
+            self._run_slots_loop = loop
+        return self._run_slots
+
+
+    @asynccontextmanager
+    async def _process_slot(self):
+        """
+        holds one of the run slots of the synchronous instance for a dggrid process. The methods that run the
+        synchronous instance in a worker thread take the same slots, so all the dggrid processes of the instance count
+        against max_concurrent together
+        """
+        slots = self.dggrid._run_slots
+        if not slots.acquire(blocking=False):
+            acquiring = asyncio.get_running_loop().run_in_executor(self._slot_waiters, slots.acquire)
+            try:
+                await asyncio.shield(acquiring)
+            except asyncio.CancelledError:
+                # the waiting thread still gets the slot, give it back then
+                acquiring.add_done_callback(lambda future: slots.release() if not future.cancelled() else None)
+                raise
+        try:
+            yield
+        finally:
+            slots.release()
+
+
+    @asynccontextmanager
+    async def _cleanup(self, jobs):
+        """
+        removes the temporary files of a job or a list of jobs after the with block, also when it fails, like
+        DGGRIDv7._cleanup but in a worker thread
+        """
+        try:
+            yield
+        finally:
+            await asyncio.to_thread(self.dggrid._remove_jobs_tmp_files, jobs)
+
+
+    async def _gather_bounded(self, work, items, limit=None):
+        """
+        awaits work(item) for all items and returns the results in their order, with at most limit (default
+        max_concurrent) items in work at the same time. work prepares, runs and collects an item, so the inputs of the
+        items still waiting aren't written yet and the peak of the temporary files is bounded by limit items, not by
+        all of them
+        """
+        # separate from the run slots, which work acquires again for its dggrid run
+        slots = asyncio.Semaphore(self.max_concurrent if limit is None else limit)
+
+        async def bounded(item):
+            async with slots:
+                return await work(item)
+
+        return await asyncio.gather(*[bounded(item) for item in items])
+
+
+    async def run(self, dggs_meta_ops, capture_logs=None):
+        """
+        runs dggrid with the given metafile lines without blocking the event loop and returns the exit code
+        """
+        if capture_logs is None:
+            capture_logs = self.capture_logs
+
+        worker_dirs = self.dggrid.worker_dirs
+        returncode = -1
+        worker_dir = None
+        metafile_name = None
+
+        try:
+            logs = []
+            async with self._get_run_slots(), self._process_slot():
+                # a run holding a slot doesn't wait for a worker directory, it falls back to a metafile in the working_dir
+                with worker_dirs.acquire(block=False) if not worker_dirs is None else nullcontext() as worker_dir:
+                    if worker_dir is None:
+                        run_dir = Path(self.working_dir).resolve()
+                        metafile_name = str(run_dir / f"metafile_{uuid.uuid4()}")
+                    else:
+                        run_dir = worker_dir
+                        metafile_name = str(worker_dirs.metafile(worker_dir))
+
+                    await asyncio.to_thread(self._write_metafile, metafile_name, dggs_meta_ops, worker_dir is None)
+
+                    o = await asyncio.create_subprocess_exec(os.path.join(run_dir, self.executable), metafile_name, cwd=run_dir, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT)
+
+                    try:
+                        async for b_line in o.stdout:
+                            line = b_line.decode().strip()
+                            if not self.silent:
+                                print(line)
+                            if capture_logs:
+                                logs.append(line.strip())
+
+                        returncode = await o.wait()
+                    finally:
+                        # don't leave dggrid running when the awaiting task is cancelled
+                        if o.returncode is None:
+                            o.kill()
+                            await o.wait()
+
+            self._last_run_succesful.set(returncode == 0)
+
+            if capture_logs:
+                self._last_run_logs.set('\n'.join(logs))
+            else:
+                self._last_run_logs.set('')
+
+        except Exception as e:
+            self._last_run_succesful.set(False)
+            print(repr(e))
+            traceback.print_exc(file=sys.stdout)
+            self._last_run_logs.set(repr(e))
+        finally:
+            # the metafile is removed also after failed runs, see DGGRIDv7.run
+            if worker_dir is None and not metafile_name is None:
+                self.temp_files.remove(metafile_name)
+
+        return returncode
+
+
+    def _write_metafile(self, metafile_name, dggs_meta_ops, temporary):
+        with open(metafile_name, 'w', encoding='utf-8') as metafile:
+            for line in dggs_meta_ops:
+                metafile.write(line + '\n')
+        if temporary:
+            self.temp_files.add(metafile_name)
+        self.temp_files.written(metafile_name)
+
+
+    """
+    ##############################################################################################
+    # lower level API
+    ##############################################################################################
+    """
+    async def dgapi_grid_gen(self, dggs, subset_conf, output_conf):
+        """
+        Grid Generation, see DGGRIDv7.dgapi_grid_gen
+        """
+        run_jobs = await asyncio.to_thread(dg_seqnum_run_jobs, dggs, subset_conf, output_conf)
+        if not run_jobs is None:
+            return await self._grid_gen_seqnum_runs(dggs, output_conf, run_jobs)
+
+        # reads the seqnum files of an aperture 7 SEQNUMS clipping
+        metafile = await asyncio.to_thread(dg_grid_gen_meta, dggs, subset_conf, output_conf)
+
+        result = await self.run(metafile)
+
+        if not result == 0:
+            raise ValueError(dg_run_error_message(result, self.capture_logs, self.last_run_logs))
+
+        return { 'metafile': metafile, 'output_conf': output_conf }
+
+
+    async def _grid_gen_seqnum_runs(self, dggs, output_conf, run_jobs):
+        """
+        runs the bounded generations of the seqnum runs concurrently and merges their outputs
+        """
+        try:
+            # the runs are awaited all, so that no run still writes when the run files are removed
+            results = await asyncio.gather(*[ self.dgapi_grid_gen(dggs, run_subset_conf, run_output_conf) for run_subset_conf, run_output_conf in run_jobs['jobs'] ],
+                                           return_exceptions=True)
+
+            errors = [ result for result in results if isinstance(result, BaseException) ]
+            if len(errors) > 0:
+                raise errors[0]
+
+            await asyncio.to_thread(dg_merge_seqnum_runs, output_conf, run_jobs)
+        finally:
+            await asyncio.to_thread(dg_remove_seqnum_run_files, run_jobs)
+
+        return { 'metafile': [ result['metafile'] for result in results ], 'output_conf': output_conf }
+
+
+    async def dgapi_grid_transform(self, dggs, subset_conf, output_conf):
+        """
+        Address Conversion, see DGGRIDv7.dgapi_grid_transform
+        """
+        metafile = dg_points_meta('TRANSFORM_POINTS', dggs, subset_conf, output_conf)
+
+        await self._run_points(metafile, output_conf)
+
+        return { 'metafile': metafile, 'output_conf': output_conf }
+
+
+    async def dgapi_point_value_binning(self, dggs, subset_conf, output_conf):
+        """
+        Point Value Binning, see DGGRIDv7.dgapi_point_value_binning
+        """
+        metafile = dg_points_meta('BIN_POINT_VALS', dggs, subset_conf, output_conf)
+
+        await self._run_points(metafile, output_conf)
+
+        return { 'metafile': metafile, 'output_conf': output_conf }
+
+
+    async def dgapi_pres_binning(self, dggs, subset_conf, output_conf):
+        """
+        Presence/Absence Binning, see DGGRIDv7.dgapi_pres_binning
+        """
+        metafile = dg_points_meta('BIN_POINT_PRESENCE', dggs, subset_conf, output_conf)
+
+        await self._run_points(metafile, output_conf)
+
+        return { 'metafile': metafile, 'output_conf': output_conf }
+
+
+    async def _run_points(self, metafile, output_conf):
+        """
+        runs a point file based operation, see DGGRIDv7._run_points
+        """
+        drain = drain_fifo(output_conf.get('output_file_name'))
+        output = drain.__enter__()
+        try:
+            result = await self.run(metafile)
+        except BaseException:
+            await asyncio.to_thread(drain.__exit__, *sys.exc_info())
+            raise
+        # the exit joins the thread draining the pipe, which blocks until the output is read, so it runs in a worker
+        # thread to keep the loop free
+        await asyncio.to_thread(drain.__exit__, None, None, None)
+
+        if not result == 0:
+            raise ValueError(dg_run_error_message(result, self.capture_logs, self.last_run_logs))
+
+        self.dggrid._store_piped_output(output_conf, output)
+
+
+    async def dgapi_grid_stats(self, dggs):
+        """
+        Output Grid Statistics, see DGGRIDv7.dgapi_grid_stats
+        """
+        metafile = dg_grid_stats_meta(dggs)
+
+        # we need to capture the logs for this one:
+        result = await self.run(metafile, capture_logs=True)
+
+        if not result == 0:
+            raise ValueError(dg_run_error_message(result, True, self.last_run_logs))
+
+        return { 'metafile': metafile, 'output_conf': dg_parse_stats_logs(self.last_run_logs) }
+
+
+    """
+    #################################################################################
+    # Higher level API
+    #################################################################################
+    """
+    @measured
+    async def grid_stats_table(self, dggs_type, resolution, mixed_aperture_level=None):
+        """
+        generates the area and cell statististcs for the given DGGS from resolution 0 to the given resolution of the DGGS,
+        precomputed or memoized tables are returned without running dggrid, see DGGRIDv7.grid_stats_table
+        """
+        df = await asyncio.to_thread(lookup_stats_table, dggs_type, resolution, mixed_aperture_level, cache_dir=self.working_dir)
+        if not df is None:
+            return df
+
+        dggs = dgselect(dggs_type = dggs_type, res= resolution, mixed_aperture_level=mixed_aperture_level)
+
+        dggs_ops = await self.dgapi_grid_stats(dggs)
+
+        df = self.dggrid._stats_table_frame(dggs_ops)
+        await asyncio.to_thread(store_stats_table, df, dggs_type, resolution, mixed_aperture_level, cache_dir=self.working_dir)
+
+        return df
+
+
+    @measured
+    async def grid_cell_polygons_for_extent(self, dggs_type, resolution, mixed_aperture_level=None, clip_geom=None, geo_format=None, antimeridian=None):
+        """
+        generates a DGGS grid and returns all the cells as Geodataframe with geometry type Polygon
+            a) if clip_geom is empty/None: grid cell ids/seqnms for the WHOLE_EARTH
+            b) if clip_geom is a shapely shape geometry, takes this as a clip area
+
+        antimeridian ('split', 'shift' or 'flag') see DGGRIDv7.grid_cell_polygons_for_extent
+        """
+        job = await asyncio.to_thread(self.dggrid._prepare_grid_gen, dggs_type, resolution, mixed_aperture_level, clip_geom=clip_geom, geo_format=geo_format)
+
+        async with self._cleanup(job):
+            dggs_ops = await self.dgapi_grid_gen(job['dggs'], job['subset_conf'], job['output_conf'] )
+
+            gdf = await asyncio.to_thread(self.dggrid._collect_cell_polygons, job)
+
+        return await asyncio.to_thread(self.dggrid._fix_antimeridian, gdf, antimeridian)
+
+
+    @measured
+    async def grid_cell_polygons_for_extent_tiled(self, dggs_type, resolution, mixed_aperture_level=None, clip_geom=None, max_cells_per_tile=1000000, max_workers=None, geo_format=None):
+        """
+        generates the tiles of a large grid as concurrent clipped dggrid runs, see DGGRIDv7.grid_cell_polygons_for_extent_tiled.
+        At most max_workers (default max_concurrent) tiles are prepared, generated and read at the same time
+        """
+        stats = await self.grid_stats_table(dggs_type, resolution, mixed_aperture_level)
+        total_cells = stats.loc[stats['Resolution'] == resolution, 'Cells'].values[0]
+
+        tiles = await asyncio.to_thread(plan_tiles, total_cells, max_cells_per_tile, clip_geom=clip_geom)
+
+        async def generate_tile(tile):
+            job = await asyncio.to_thread(self.dggrid._prepare_grid_gen, dggs_type, resolution, mixed_aperture_level, clip_geom=tile, geo_format=geo_format)
+
+            async with self._cleanup(job):
+                dggs_ops = await self.dgapi_grid_gen(job['dggs'], job['subset_conf'], job['output_conf'] )
+
+                return await asyncio.to_thread(self.dggrid._collect_cell_polygons, job)
+
+        tile_cells = await self._gather_bounded(generate_tile, tiles, limit=max_workers)
+
+        return await asyncio.to_thread(self.dggrid._merge_tile_cells, tile_cells)
+
+
+    @measured
+    async def grid_cell_polygons_from_cellids(self, cell_id_list, dggs_type, resolution, mixed_aperture_level=None, geo_format=None, antimeridian=None, engine='dggrid',
+                                              densify=1.0):
+        """
+        generates a DGGS grid and returns all the cells as Geodataframe with geometry type Polygon
+            a) if cell_id_list is empty/None: grid cells for the WHOLE_EARTH
+            b) if cell_id_list is a list/numpy array, takes this list as seqnums ids for subsetting
+
+        with a cell_cache only the cells that are not cached yet are generated by dggrid,
+        antimeridian ('split', 'shift' or 'flag') see DGGRIDv7.grid_cell_polygons_for_extent,
+        engine='native' computes the cell vertices in-process with the edges densified to densify degrees, see
+        DGGRIDv7.grid_cell_polygons_from_cellids
+        """
+        if engine == 'native':
+            gdf = await asyncio.to_thread(self.dggrid._native_cell_polygons, cell_id_list, dggs_type, resolution, mixed_aperture_level, densify)
+
+            return await asyncio.to_thread(self.dggrid._fix_antimeridian, gdf, antimeridian, True)
+        elif not engine == 'dggrid':
+            raise ValueError(f"unknown engine {engine}, use 'dggrid' or 'native'")
+
+        if self.cell_cache is None or cell_id_list is None or len(cell_id_list) == 0:
+            job = await asyncio.to_thread(self.dggrid._prepare_grid_gen, dggs_type, resolution, mixed_aperture_level, cell_id_list=cell_id_list, geo_format=geo_format)
+
+            async with self._cleanup(job):
+                dggs_ops = await self.dgapi_grid_gen(job['dggs'], job['subset_conf'], job['output_conf'] )
+
+                gdf = await asyncio.to_thread(self.dggrid._collect_cell_polygons, job)
+
+            return await asyncio.to_thread(self.dggrid._fix_antimeridian, gdf, antimeridian)
+
+        cached, missing = await asyncio.to_thread(self.dggrid._cached_cell_lookup, cell_id_list, dggs_type, resolution, mixed_aperture_level)
+
+        fresh = None
+        if len(missing) > 0:
+            job = await asyncio.to_thread(self.dggrid._prepare_grid_gen, dggs_type, resolution, mixed_aperture_level, cell_id_list=missing, geo_format=geo_format)
+
+            async with self._cleanup(job):
+                dggs_ops = await self.dgapi_grid_gen(job['dggs'], job['subset_conf'], job['output_conf'] )
+
+                fresh = await asyncio.to_thread(self.dggrid._collect_cell_polygons, job)
+
+        gdf = await asyncio.to_thread(self.dggrid._merge_cached_cells, cell_id_list, cached, fresh, dggs_type, resolution, mixed_aperture_level)
+
+        return await asyncio.to_thread(self.dggrid._fix_antimeridian, gdf, antimeridian)
+
+
+    @measured
+    async def iter_grid_cell_polygons(self, dggs_type, resolution, mixed_aperture_level=None, clip_geom=None, batch_size=100000, max_cells_per_output_file=None, geo_format=None):
+        """
+        async generator variant of DGGRIDv7.iter_grid_cell_polygons, yields the cells as Geodataframes of at most
+        batch_size cells each. The synchronous generator is stepped in a worker thread of its own, its dggrid run takes one
+        of the run slots of the instance. When the async generator is closed early, dggrid is killed instead of generating
+        the rest of the grid
+        """
+        cells = self.dggrid.iter_grid_cell_polygons(dggs_type, resolution, mixed_aperture_level, clip_geom=clip_geom, batch_size=batch_size,
+                                                    max_cells_per_output_file=max_cells_per_output_file, geo_format=geo_format)
+        # the shard being read keeps a fiona collection open, which belongs to the GDAL environment of its thread: all the
+        # steps run in the same thread
+        stepper = ThreadPoolExecutor(max_workers=1, thread_name_prefix='dggrid_cells')
+        loop = asyncio.get_running_loop()
+
+        def in_stepper(fn, *args):
+            return loop.run_in_executor(stepper, contextvars.copy_context().run, fn, *args)
+
+        step = None
+        try:
+            while True:
+                # a step goes on in its thread when the awaiting task is cancelled, it is awaited before closing below
+                step = in_stepper(next, cells, None)
+                gdf = await asyncio.shield(step)
+                if gdf is None:
+                    break
+                yield gdf
+        finally:
+            if not step is None and not step.done():
+                await asyncio.wait([step])
+            await in_stepper(cells.close)
+            stepper.shutdown(wait=False)
+
+
+    @measured
+    async def grid_cellids_for_extent(self, dggs_type, resolution, mixed_aperture_level=None, clip_geom=None):
+        """
+        generates a DGGS grid and returns all the cellids as a pandas dataframe
+            a) if clip_geom is empty/None: grid cell ids/seqnms for the WHOLE_EARTH
+            b) if clip_geom is a shapely shape geometry, takes this as a clip area
+        """
+        job = await asyncio.to_thread(self.dggrid._prepare_grid_gen, dggs_type, resolution, mixed_aperture_level, clip_geom=clip_geom, point_output=True)
+
+        async with self._cleanup(job):
+            dggs_ops = await self.dgapi_grid_gen(job['dggs'], job['subset_conf'], job['output_conf'] )
+
+            return await asyncio.to_thread(self.dggrid._collect_cellids, job)
+
+
+    @measured
+    async def cells_for_geo_points(self, geodf_points_wgs84, cell_ids_only, dggs_type, resolution, mixed_aperture_level=None, chunk_size=None, n_workers=None, geo_format=None,
+                                   engine='dggrid', stream=False):
+        """
+        takes a geodataframe with point geometry and optional additional value columns and returns:
+            a) if cell_ids_only == True: the same geodataframe with an additional column with the cell ids
+            b) if cell_ids_only == False: a new Geodataframe with geometry type Polygon, with column of cell ids and the additional columns
+
+        chunk_size splits the points into chunks that are transformed as separate dggrid jobs, at most n_workers
+        (default max_concurrent) at the same time, stream=True streams them through named pipes in a worker thread,
+        engine='native' computes the seqnums in-process, see DGGRIDv7.cells_for_geo_points
+        """
+        if n_workers is None:
+            n_workers = self.max_concurrent
+
+        if engine == 'native':
+            cell_id_list = await asyncio.to_thread(self.dggrid._native_seqnums, geodf_points_wgs84, dggs_type, resolution, mixed_aperture_level)
+            cols_ordered = self.dggrid._point_columns(geodf_points_wgs84)
+        elif not engine == 'dggrid':
+            raise ValueError(f"unknown engine {engine}, use 'dggrid' or 'native'")
+        elif stream:
+            cell_id_list = await asyncio.to_thread(self.dggrid._cells_for_geo_points_chunked, geodf_points_wgs84, dggs_type, resolution, mixed_aperture_level,
+                                                   chunk_size, n_workers, stream=True)
+            cols_ordered = self.dggrid._point_columns(geodf_points_wgs84)
+        elif chunk_size is None:
+            job = await asyncio.to_thread(self.dggrid._prepare_transform, geodf_points_wgs84, dggs_type, resolution, mixed_aperture_level)
+
+            async with self._cleanup(job):
+                dggs_ops = await self.dgapi_grid_transform(job['dggs'], job['subset_conf'], job['output_conf'])
+
+                cell_id_list = await asyncio.to_thread(self.dggrid._collect_transform, job)
+            cols_ordered = job['cols_ordered']
+        else:
+            cell_id_list = await self._cells_for_geo_points_chunked(geodf_points_wgs84, dggs_type, resolution, mixed_aperture_level, chunk_size, n_workers)
+            cols_ordered = self.dggrid._point_columns(geodf_points_wgs84)
+
+        if cell_ids_only == True:
+            geodf_points_wgs84['seqnums'] = cell_id_list
+            return geodf_points_wgs84
+        else:
+            # grid_gen from seqnums
+            gdf = await self.grid_cell_polygons_from_cellids(cell_id_list=cell_id_list,
+                                                    dggs_type=dggs_type,
+                                                    resolution=resolution,
+                                                    mixed_aperture_level=mixed_aperture_level,
+                                                    geo_format=geo_format,
+                                                    engine=engine)
+            return await asyncio.to_thread(self.dggrid._add_point_columns, gdf, geodf_points_wgs84, cols_ordered)
+
+
+    @measured
+    async def bin_point_values(self, geodf_points_wgs84, value_col, dggs_type, resolution, mixed_aperture_level=None, shard_size=1000000,
+                               engine='dggrid', agg='mean', weight_col=None, lon_col='lon', lat_col='lat'):
+        """
+        bins the values of value_col of the points into the cells of the DGGS, large inputs are binned in shards of
+        shard_size points, see DGGRIDv7.bin_point_values. The engines 'native' and 'transform' run in a worker thread
+        """
+        if engine in ['native', 'transform']:
+            return await asyncio.to_thread(self.dggrid.bin_point_values, geodf_points_wgs84, value_col, dggs_type, resolution, mixed_aperture_level,
+                                           shard_size=shard_size, max_workers=self.max_concurrent, engine=engine, agg=agg, weight_col=weight_col,
+                                           lon_col=lon_col, lat_col=lat_col)
+        elif not engine == 'dggrid':
+            raise ValueError(f"unknown engine {engine}, use 'dggrid', 'native' or 'transform'")
+
+        if not agg == 'mean' or not weight_col is None:
+            raise ValueError("BIN_POINT_VALS only computes the mean, use engine='native' or 'transform' for other aggs")
+
+        geodf_points_wgs84 = geodf_points_wgs84.loc[geodf_points_wgs84[value_col].notna()]
+        lon = geodf_points_wgs84['geometry'].x.values
+        lat = geodf_points_wgs84['geometry'].y.values
+        values = geodf_points_wgs84[value_col].values
+
+        async def bin_shard(start):
+            end = start + shard_size
+            job = await asyncio.to_thread(self.dggrid._bin_job, 'BIN_POINT_VALS', [ (lon[start:end], lat[start:end], values[start:end]) ], dggs_type, resolution, mixed_aperture_level)
+
+            async with self._cleanup(job):
+                dggs_ops = await self.dgapi_point_value_binning(job['dggs'], job['subset_conf'], job['output_conf'])
+
+                return await asyncio.to_thread(self.dggrid._collect_bin, job, read_bin_vals_file)
+
+        # at most max_concurrent shards are written, binned and read at the same time
+        shards = await self._gather_bounded(bin_shard, range(0, len(lon), shard_size))
+
+        return await asyncio.to_thread(self.dggrid._merge_bin_values, shards)
+
+
+    @measured
+    async def bin_point_presence(self, geodf_points_wgs84, class_col, dggs_type, resolution, mixed_aperture_level=None, shard_size=1000000,
+                                 engine='dggrid', lon_col='lon', lat_col='lat'):
+        """
+        bins the presence of the classes of class_col into the cells of the DGGS, large inputs are binned in shards of
+        shard_size points, see DGGRIDv7.bin_point_presence. The engines 'native' and 'transform' run in a worker thread
+        """
+        if engine in ['native', 'transform']:
+            return await asyncio.to_thread(self.dggrid.bin_point_presence, geodf_points_wgs84, class_col, dggs_type, resolution, mixed_aperture_level,
+                                           shard_size=shard_size, max_workers=self.max_concurrent, engine=engine, lon_col=lon_col, lat_col=lat_col)
+        elif not engine == 'dggrid':
+            raise ValueError(f"unknown engine {engine}, use 'dggrid', 'native' or 'transform'")
+
+        classes, codes = presence_classes(geodf_points_wgs84[class_col].values)
+        lon = geodf_points_wgs84['geometry'].x.values
+        lat = geodf_points_wgs84['geometry'].y.values
+
+        async def bin_shard(start):
+            end = start + shard_size
+            inputs = [ (lon[start:end][codes[start:end] == k], lat[start:end][codes[start:end] == k], None) for k in range(len(classes)) ]
+            job = await asyncio.to_thread(self.dggrid._bin_job, 'BIN_POINT_PRESENCE', inputs, dggs_type, resolution, mixed_aperture_level)
+
+            async with self._cleanup(job):
+                dggs_ops = await self.dgapi_pres_binning(job['dggs'], job['subset_conf'], job['output_conf'])
+
+                return await asyncio.to_thread(self.dggrid._collect_bin, job, lambda out_file: read_bin_presence_file(out_file, len(classes)))
+
+        shards = await self._gather_bounded(bin_shard, range(0, len(lon), shard_size))
+
+        return await asyncio.to_thread(self.dggrid._merge_bin_presence, shards, classes)
+
+
+    @measured
+    async def raster_to_cells(self, raster_path, dggs_type, resolution, mixed_aperture_level=None, agg='mean', band=1, block_size=1024, engine='transform'):
+        """
+        samples the values of a raster band into the cells of the DGGS in a worker thread, see DGGRIDv7.raster_to_cells
+        """
+        return await asyncio.to_thread(self.dggrid.raster_to_cells, raster_path, dggs_type, resolution, mixed_aperture_level, agg=agg, band=band,
+                                       block_size=block_size, max_workers=self.max_concurrent, engine=engine)
+
+
+    @measured
+    async def polygons_to_cells(self, geodf_polygons_wgs84, dggs_type, resolution, mixed_aperture_level=None, mode='centroid', batch_size=1000, geo_format=None):
+        """
+        assigns the polygons to the cells of the DGGS in a worker thread, see DGGRIDv7.polygons_to_cells
+        """
+        return await asyncio.to_thread(self.dggrid.polygons_to_cells, geodf_polygons_wgs84, dggs_type, resolution, mixed_aperture_level, mode=mode,
+                                       batch_size=batch_size, max_workers=self.max_concurrent, geo_format=geo_format)
+
+
+    @measured
+    async def cell_children(self, cell_id_list, dggs_type, resolution, mixed_aperture_level=None, engine='dggrid'):
+        """
+        the children of the cells at resolution + 1 as compressed rows (offsets, values), see DGGRIDv7.cell_children
+        """
+        cell_id_list = await asyncio.to_thread(self.dggrid._relation_cellids, cell_id_list, dggs_type, resolution, mixed_aperture_level)
+
+        if engine == 'native':
+            return await asyncio.to_thread(self.dggrid._native_relation, isea.seqnum_children, cell_id_list, dggs_type, resolution, mixed_aperture_level)
+        elif not engine == 'dggrid':
+            raise ValueError(f"unknown engine {engine}, use 'dggrid' or 'native'")
+
+        return await self._dggrid_relation('children', cell_id_list, dggs_type, resolution, mixed_aperture_level)
+
+
+    @measured
+    async def cell_parents(self, cell_id_list, dggs_type, resolution, mixed_aperture_level=None, engine='dggrid'):
+        """
+        the parents of the cells at resolution - 1 as compressed rows (offsets, values), see DGGRIDv7.cell_parents
+        """
+        if resolution < 1:
+            raise ValueError("the cells of resolution 0 have no parents")
+
+        cell_id_list = await asyncio.to_thread(self.dggrid._relation_cellids, cell_id_list, dggs_type, resolution, mixed_aperture_level)
+
+        if engine == 'native':
+            return await asyncio.to_thread(self.dggrid._native_relation, isea.seqnum_parents, cell_id_list, dggs_type, resolution, mixed_aperture_level)
+        elif not engine == 'dggrid':
+            raise ValueError(f"unknown engine {engine}, use 'dggrid' or 'native'")
+
+        # cell centers and the cells containing them at the coarser resolution
+        job = await asyncio.to_thread(self.dggrid._prepare_grid_gen, dggs_type, resolution, mixed_aperture_level, cell_id_list=cell_id_list, point_output=True)
+        async with self._cleanup(job):
+            dggs_ops = await self.dgapi_grid_gen(job['dggs'], job['subset_conf'], job['output_conf'])
+            centers = await asyncio.to_thread(self.dggrid._collect_cellids, job)
+
+        job = await asyncio.to_thread(self.dggrid._transform_job, centers[[1, 2]], dggs_type, resolution - 1, mixed_aperture_level)
+        async with self._cleanup(job):
+            dggs_ops = await self.dgapi_grid_transform(job['dggs'], job['subset_conf'], job['output_conf'])
+            primary = np.unique(await asyncio.to_thread(self.dggrid._collect_transform, job))
+
+        _, neighbours = await self._dggrid_relation('neighbor', primary, dggs_type, resolution - 1, mixed_aperture_level)
+        candidates = np.union1d(primary, neighbours)
+
+        offsets, children = await self._dggrid_relation('children', candidates, dggs_type, resolution - 1, mixed_aperture_level)
+
+        return await asyncio.to_thread(csr_invert, offsets, children, candidates, cell_id_list)
+
+
+    @measured
+    async def cell_neighbours(self, cell_id_list, dggs_type, resolution, mixed_aperture_level=None, engine='dggrid'):
+        """
+        the neighbours of the cells as compressed rows (offsets, values), see DGGRIDv7.cell_neighbours
+        """
+        cell_id_list = await asyncio.to_thread(self.dggrid._relation_cellids, cell_id_list, dggs_type, resolution, mixed_aperture_level)
+
+        if engine == 'native':
+            return await asyncio.to_thread(self.dggrid._native_relation, isea.seqnum_neighbours, cell_id_list, dggs_type, resolution, mixed_aperture_level)
+        elif not engine == 'dggrid':
+            raise ValueError(f"unknown engine {engine}, use 'dggrid' or 'native'")
+
+        return await asyncio.to_thread(csr_sort_rows, *await self._dggrid_relation('neighbor', cell_id_list, dggs_type, resolution, mixed_aperture_level))
+
+
+    @measured
+    async def rollup(self, values_by_seqnum, dggs_type, from_res, to_res, agg='mean', mixed_aperture_level=None, engine='dggrid'):
+        """
+        aggregates the cell values at from_res to every coarser resolution down to to_res, see DGGRIDv7.rollup
+        """
+        if to_res > from_res or to_res < 0:
+            raise ValueError(f"to_res must be between 0 and from_res {from_res}, not {to_res}")
+
+        values = pd.Series(values_by_seqnum).dropna()
+        seqnums = values.index.values.astype(np.int64)
+        state = await asyncio.to_thread(rollup_state, values.values, agg)
+
+        levels = {}
+        for resolution in range(from_res, to_res, -1):
+            parents = await self._rollup_parents(seqnums, dggs_type, resolution, mixed_aperture_level, engine)
+            seqnums, state = await asyncio.to_thread(rollup_step, parents, state)
+            level_values = await asyncio.to_thread(rollup_values, state, agg)
+            levels[resolution - 1] = pd.Series(level_values, index=pd.Index(seqnums, name='seqnum'))
+
+        return levels
+
+
+    async def _rollup_parents(self, seqnums, dggs_type, resolution, mixed_aperture_level=None, engine='dggrid'):
+        # the seqnums of the coarser resolutions are the unique and sorted parents of rollup_step already
+        if (np.diff(seqnums) > 0).all():
+            unique_seqnums, inverse = seqnums, None
+        else:
+            unique_seqnums, inverse = await asyncio.to_thread(np.unique, seqnums, return_inverse=True)
+        parents = await asyncio.to_thread(lookup_rollup_parents, unique_seqnums, dggs_type, resolution, mixed_aperture_level)
+
+        missing = unique_seqnums[parents == 0]
+        if len(missing) > 0:
+            offsets, values = await self.cell_parents(missing, dggs_type, resolution, mixed_aperture_level, engine=engine)
+            if (np.diff(offsets) == 0).any():
+                raise ValueError(f"seqnums without parents, check that they are {dggs_type} resolution {resolution} seqnums")
+
+            await asyncio.to_thread(store_rollup_parents, missing, values[offsets[:-1]], dggs_type, resolution, mixed_aperture_level)
+            parents[parents == 0] = values[offsets[:-1]]
+
+        return parents if inverse is None else parents[inverse]
+
+
+    async def _dggrid_relation(self, kind, cell_id_list, dggs_type, resolution, mixed_aperture_level=None):
+        job = await asyncio.to_thread(self.dggrid._prepare_relation, kind, cell_id_list, dggs_type, resolution, mixed_aperture_level)
+
+        async with self._cleanup(job):
+            dggs_ops = await self.dgapi_grid_gen(job['dggs'], job['subset_conf'], job['output_conf'])
+
+            return await asyncio.to_thread(self.dggrid._collect_relation, job)
+
+
+    async def _cells_for_geo_points_chunked(self, geodf_points_wgs84, dggs_type, resolution, mixed_aperture_level, chunk_size, n_workers=None):
+        lon = geodf_points_wgs84['geometry'].x.values
+        lat = geodf_points_wgs84['geometry'].y.values
+        cell_id_list = np.zeros(len(geodf_points_wgs84), dtype=np.int64)
+
+        async def transform_chunk(start):
+            points_df = pd.DataFrame({ 'lon': lon[start:start + chunk_size], 'lat': lat[start:start + chunk_size] })
+            job = await asyncio.to_thread(self.dggrid._transform_job, points_df, dggs_type, resolution, mixed_aperture_level)
+
+            async with self._cleanup(job):
+                dggs_ops = await self.dgapi_grid_transform(job['dggs'], job['subset_conf'], job['output_conf'])
+
+                cell_id_list[start:start + chunk_size] = await asyncio.to_thread(self.dggrid._collect_transform, job)
+
+        await self._gather_bounded(transform_chunk, range(0, len(geodf_points_wgs84), chunk_size), limit=n_workers)
+
+        return cell_id_list
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pandas as pd
+
+from .hierarchy import rollup_step
+
+
+"""
+point binning with NumPy: the points are indexed into cells (by dggrid's TRANSFORM_POINTS or dggrid4py.isea) and the
+values are grouped by seqnum with a sort and reduced with np.ufunc.reduceat. The decomposable reducers keep a partial
+state per cell that the chunks of points are merged into, the others need the values of all the points of a cell
+"""
+
+
+decomposable_aggs = ('count', 'sum', 'mean', 'min', 'max', 'weighted_mean')
+
+
+"""
+the list of (column name, reducer) of agg, a reducer or a list of reducers: the names of decomposable_aggs, 'median',
+('quantile', q) or a function of the values of a cell that returns a number
+"""
+def bin_aggs(agg):
+
+    aggs = []
+    for reducer in (agg if isinstance(agg, list) else [agg]):
+        if callable(reducer):
+            aggs.append((getattr(reducer, '__name__', 'agg'), reducer))
+        elif isinstance(reducer, tuple) and len(reducer) == 2 and reducer[0] == 'quantile':
+            aggs.append((f"q{reducer[1]}", ('quantile', float(reducer[1]))))
+        elif reducer == 'median':
+            aggs.append(('median', ('quantile', 0.5)))
+        elif reducer in decomposable_aggs:
+            aggs.append((reducer, reducer))
+        else:
+            raise ValueError(f"unknown agg {reducer}, use one of {decomposable_aggs}, 'median', ('quantile', q) or a function")
+
+    return aggs
+
+
+def is_decomposable(aggs):
+
+    return all(isinstance(reducer, str) for _, reducer in aggs)
+
+
+"""
+the partial state of the bins of the points: their seqnums (ascending) and per cell the count, sum, min and max of the
+values and the sums of the weighted values and of the weights
+"""
+def bin_state(seqnums, values, weights=None):
+
+    values = np.asarray(values, dtype=np.float64)
+    state = { 'count': np.ones(len(values), dtype=np.int64), 'sum': values, 'min': values, 'max': values }
+    if not weights is None:
+        weights = np.asarray(weights, dtype=np.float64)
+        state.update({ 'wsum': weights * values, 'wcount': weights })
+
+    return rollup_step(np.asarray(seqnums, dtype=np.int64), state)
+
+
+"""
+merges two partial states of bin_state (None for no state yet)
+"""
+def merge_bin_states(bins, other):
+
+    if bins is None:
+        return other
+
+    seqnums = np.concatenate([bins[0], other[0]])
+    state = { key: np.concatenate([bins[1][key], other[1][key]]) for key in bins[1].keys() }
+
+    return rollup_step(seqnums, state)
+
+
+"""
+the binned values as DataFrame indexed by seqnum with a column per agg, named 'value' for a single agg, and the count of
+the points. The reducers that aren't decomposable need the seqnums, values and weights of all the points as points
+"""
+def bin_values_frame(bins, aggs, single=False, points=None):
+
+    if not points is None:
+        seqnums, values, weights = points
+        order = np.lexsort((values, seqnums))
+        values = np.asarray(values, dtype=np.float64)[order]
+        bins = bin_state(seqnums[order], values, None if weights is None else np.asarray(weights)[order])
+
+    seqnums, state = bins
+    counts = state['count']
+    starts = np.cumsum(counts) - counts
+
+    df = pd.DataFrame(index=pd.Index(seqnums, name='seqnum'))
+    for name, reducer in aggs:
+        if reducer in ['count', 'sum', 'min', 'max']:
+            column = state[reducer]
+        elif reducer == 'mean':
+            column = state['sum'] / counts
+        elif reducer == 'weighted_mean':
+            if not 'wsum' in state.keys():
+                raise ValueError("the weighted_mean needs a weight_col")
+            column = state['wsum'] / state['wcount']
+        elif isinstance(reducer, tuple):
+            # linear interpolation between the closest ranks like np.quantile, the values are sorted within the cells
+            position = starts + reducer[1] * (counts - 1)
+            lower = np.floor(position).astype(np.int64)
+            upper = np.ceil(position).astype(np.int64)
+            column = values[lower] + (values[upper] - values[lower]) * (position - lower)
+        else:
+            column = np.array([ reducer(cell_values) for cell_values in np.split(values, starts[1:]) ])
+
+        df['value' if single else name] = column
+
+    if not 'count' in df.columns:
+        df['count'] = counts
+
+    return df
+
+
+"""
+the classes of the class values and the class code of every value, like np.unique(values, return_inverse=True) but
+also for mixed types (sorted as far as they can be compared) and with the missing values (NaN, None) as one class. The
+classes become the columns of the presence next to the count column and the seqnum index, so 'count' and 'seqnum'
+can't be classes
+"""
+def presence_classes(values):
+
+    codes, classes = pd.factorize(np.asarray(values), sort=True, use_na_sentinel=False)
+
+    reserved = [ name for name in ['seqnum', 'count'] if name in list(classes) ]
+    if len(reserved) > 0:
+        raise ValueError(f"the classes {reserved} are the names of the seqnum index and count column of the presence, rename them")
+
+    return classes, codes.astype(np.int64)
+
+
+"""
+the presence of the classes of the points as unique (seqnum, class code) pairs, merged with the pairs of the points so
+far (None for no points yet)
+"""
+def presence_pairs(seqnums, codes, pairs=None):
+
+    seqnums = np.asarray(seqnums, dtype=np.int64)
+    codes = np.asarray(codes, dtype=np.int64)
+    if not pairs is None:
+        seqnums = np.concatenate([pairs[0], seqnums])
+        codes = np.concatenate([pairs[1], codes])
+
+    order = np.lexsort((codes, seqnums))
+    seqnums = seqnums[order]
+    codes = codes[order]
+    first = np.concatenate([[True], (seqnums[1:] != seqnums[:-1]) | (codes[1:] != codes[:-1])])[:len(seqnums)]
+
+    return seqnums[first], codes[first]
+
+
+"""
+the seqnums (ascending) and the (cells, classes) boolean presence array of the pairs of presence_pairs
+"""
+def presence_from_pairs(pairs, num_classes):
+
+    seqnums, rows = np.unique(pairs[0], return_inverse=True)
+    presence = np.zeros((len(seqnums), num_classes), dtype=bool)
+    presence[rows, pairs[1]] = True
+
+    return seqnums, presence
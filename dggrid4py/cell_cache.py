@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+from pathlib import Path
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+import numpy as np
+
+import shapely
+
+
+"""
+persistent cache of generated cell polygons in a SQLite file, keyed by (dggs_type, resolution, mixed_aperture_level, seqnum).
+The geometries are stored as WKB. When more than max_cells cells are stored, the least recently used ones are evicted.
+"""
+class CellGeometryCache(object):
+
+    def __init__(self, path, max_cells=1000000):
+        self.path = str(Path(path).resolve())
+        self.max_cells = max_cells
+        self._lock = threading.Lock()
+
+        with self._connect() as con:
+            con.execute("""CREATE TABLE IF NOT EXISTS cells (
+                dggs_type TEXT NOT NULL,
+                resolution INTEGER NOT NULL,
+                mixed_aperture_level INTEGER NOT NULL,
+                seqnum INTEGER NOT NULL,
+                geometry BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (dggs_type, resolution, mixed_aperture_level, seqnum))""")
+            con.execute("CREATE INDEX IF NOT EXISTS cells_last_used ON cells (last_used)")
+
+
+    @contextmanager
+    def _connect(self):
+        # one connection per operation, so that the cache can be used from several threads and processes
+        con = sqlite3.connect(self.path, timeout=60)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+
+    def _key(self, dggs_type, resolution, mixed_aperture_level):
+        # None can't be part of a primary key lookup, -1 is not a valid aperture level
+        return (dggs_type, int(resolution), -1 if mixed_aperture_level is None else int(mixed_aperture_level))
+
+
+    def get(self, cell_id_list, dggs_type, resolution, mixed_aperture_level=None):
+        """
+        returns the cached cells of cell_id_list as a dict of seqnum -> shapely geometry and marks them as recently used
+        """
+        key = self._key(dggs_type, resolution, mixed_aperture_level)
+        seqnums = np.unique(np.asarray(cell_id_list, dtype=np.int64))
+
+        with self._lock, self._connect() as con:
+            con.execute("CREATE TEMP TABLE wanted (seqnum INTEGER PRIMARY KEY)")
+            con.executemany("INSERT INTO wanted VALUES (?)", ((int(seqnum),) for seqnum in seqnums))
+            rows = con.execute("""SELECT c.seqnum, c.geometry FROM cells c JOIN wanted w ON c.seqnum = w.seqnum
+                WHERE c.dggs_type = ? AND c.resolution = ? AND c.mixed_aperture_level = ?""", key).fetchall()
+            con.execute("""UPDATE cells SET last_used = ? WHERE dggs_type = ? AND resolution = ? AND mixed_aperture_level = ?
+                AND seqnum IN (SELECT seqnum FROM wanted)""", (time.time(),) + key)
+            con.execute("DROP TABLE wanted")
+
+        if len(rows) == 0:
+            return {}
+
+        geometries = shapely.from_wkb([ row[1] for row in rows ])
+        return dict(zip([ row[0] for row in rows ], geometries))
+
+
+    def put(self, seqnums, geometries, dggs_type, resolution, mixed_aperture_level=None):
+        """
+        stores the cell geometries and evicts the least recently used cells if the cache grows over max_cells
+        """
+        key = self._key(dggs_type, resolution, mixed_aperture_level)
+        now = time.time()
+        wkbs = shapely.to_wkb(np.asarray(geometries))
+
+        with self._lock, self._connect() as con:
+            con.executemany("INSERT OR REPLACE INTO cells VALUES (?, ?, ?, ?, ?, ?)",
+                            (key + (int(seqnum), wkb, now) for seqnum, wkb in zip(seqnums, wkbs)))
+
+            if not self.max_cells is None:
+                n_cells = con.execute("SELECT COUNT(*) FROM cells").fetchone()[0]
+                if n_cells > self.max_cells:
+                    con.execute("DELETE FROM cells WHERE rowid IN (SELECT rowid FROM cells ORDER BY last_used LIMIT ?)",
+                                (n_cells - self.max_cells,))
+
+
+    def invalidate(self, dggs_type=None, resolution=None, mixed_aperture_level=None):
+        """
+        removes the cached cells of the given dggs_type/resolution/mixed_aperture_level, or all cells if nothing is given
+        """
+        conditions = []
+        params = []
+        if not dggs_type is None:
+            conditions.append("dggs_type = ?")
+            params.append(dggs_type)
+        if not resolution is None:
+            conditions.append("resolution = ?")
+            params.append(int(resolution))
+        if not mixed_aperture_level is None:
+            conditions.append("mixed_aperture_level = ?")
+            params.append(int(mixed_aperture_level))
+
+        where = "" if len(conditions) == 0 else " WHERE " + " AND ".join(conditions)
+        with self._lock, self._connect() as con:
+            con.execute("DELETE FROM cells" + where, params)
+
+
+    def __len__(self):
+        with self._connect() as con:
+            return con.execute("SELECT COUNT(*) FROM cells").fetchone()[0]
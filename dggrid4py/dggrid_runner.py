@@ -1,13 +1,20 @@
 # -*- coding: utf-8 -*-
 
 from pathlib import Path
+import functools
+import inspect
 import uuid
 import shutil
 import os
 import sys
 import subprocess
+import threading
 import traceback
 import tempfile
+import time
+import weakref
+from contextlib import nullcontext, contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 import numpy as np
 import pandas as pd
 
@@ -19,16 +26,29 @@ import geopandas as gpd
 import shapely
 from shapely.geometry import Polygon, box, shape
 
+from .tiling import plan_tiles
+from .cell_cache import CellGeometryCache
+from .scratch import WorkerDirPool, TempFileTracker, default_scratch_root, drain_fifo, feed_fifo, bind_context
+from .grid_stats import lookup_stats_table, store_stats_table, predefined_res_table, closest_res
+from .interchange import geo_interchange_format, read_geo_file, read_id_file, read_seqnum_file
+from .interchange import write_bin_input_file, read_bin_vals_file, read_bin_presence_file, iter_table_chunks
+from .raster import raster_windows, read_raster_window
+from .binning import bin_aggs, is_decomposable, bin_state, merge_bin_states, bin_values_frame, presence_classes, presence_pairs, presence_from_pairs
+from .interrupt import crosses_interruption, interrupt_cells, shift_cells
+from .hierarchy import csr_take, csr_sort_rows, csr_invert, read_relation_file, find_output_file
+from .hierarchy import lookup_rollup_parents, store_rollup_parents, rollup_state, rollup_step, rollup_values
+from . import isea
+
 fiona_drivers = fiona.supported_drivers
 
+KM_TO_MILES = 0.621371
+
 def get_geo_out(legacy=True):
     if legacy is True:
-        return { "driver": "GeoJSON", "ext": "geojson"}
+        return geo_interchange_format('GeoJSON')
 
-    if "FlatGeobuf" in fiona_drivers.keys() and "w" in fiona_drivers["FlatGeobuf"]:
-        return { "driver": "FlatGeobuf", "ext": "fgb"}
-
-    return { "driver": "GPKG", "ext": "gpgk"}
+    # FlatGeobuf if available, GPKG otherwise
+    return geo_interchange_format('auto')
 
 
 # specify a ISEA3H
@@ -263,6 +283,343 @@ def dg_grid_meta(dggs):
     return metafile
 
 
+"""
+helper function to generate the metafile of a GENERATE_GRID operation
+"""
+def dg_grid_gen_meta(dggs, subset_conf, output_conf):
+
+    dggrid_operation = 'GENERATE_GRID'
+    metafile = []
+    metafile.append("dggrid_operation " + dggrid_operation)
+
+    dggs_config_meta = dg_grid_meta(dggs)
+
+    for cmd in dggs_config_meta:
+        metafile.append(cmd)
+
+    # clip_subset_types
+    if subset_conf['clip_subset_type'] == 'WHOLE_EARTH':
+        metafile.append("clip_subset_type " + subset_conf['clip_subset_type'])
+        # a WHOLE_EARTH generation can be bounded to a range of seqnums
+        for elem in ['output_first_seqnum', 'output_last_seqnum']:
+            if elem in subset_conf.keys() and not subset_conf[elem] is None:
+                metafile.append(f"{elem} " + str(subset_conf[elem]))
+    elif subset_conf['clip_subset_type'] in [ 'SHAPEFILE' , 'AIGEN', 'GDAL'] and not subset_conf['clip_region_files'] is None:
+        metafile.append("clip_subset_type " + subset_conf['clip_subset_type'])
+        metafile.append("clip_region_files " + subset_conf['clip_region_files'])
+    elif subset_conf['clip_subset_type'] in [ 'SEQNUMS'] and not subset_conf['clip_region_files'] is None:
+        if not dggs.dggs_type in ['ISEA7H', 'FULLER7H', 'PLANETRISK']:
+            metafile.append("clip_subset_type " + subset_conf['clip_subset_type'])
+            metafile.append("clip_region_files " + subset_conf['clip_region_files'])
+        else:
+            # if dggs_aperture_type would be SEQUENCE
+            # have to reset to WHOLE_EARTH and clip based on
+            # output_first_seqnum and output_last_seqnum
+            # dgapi_grid_gen splits the seqnums into several such runs when it can merge the outputs (dg_seqnum_run_jobs)
+            subset_conf['clip_subset_type'] = 'WHOLE_EARTH'
+            metafile.append("clip_subset_type " + subset_conf['clip_subset_type'])
+            # loading seqnums
+            seqnums = read_seqnum_files(subset_conf['clip_region_files'])
+
+            first_seqnum = seqnums.min()
+            last_seqnum = seqnums.max()
+            subset_conf['output_first_seqnum'] = first_seqnum
+            metafile.append("output_first_seqnum " + str(subset_conf['output_first_seqnum']))
+            subset_conf['output_last_seqnum'] = last_seqnum
+            metafile.append("output_last_seqnum " + str(subset_conf['output_last_seqnum']))
+    else:
+        raise ValueError('something is not correct in subset_conf')
+
+    # join grid gen params add to metafile
+
+    # cell_output_types
+    if 'cell_output_type' in output_conf.keys():
+        if output_conf['cell_output_type'] in [ 'SHAPEFILE' , 'AIGEN', 'GEOJSON', 'TEXT'] and not output_conf['cell_output_file_name'] is None:
+            for elem in filter(lambda x: x.startswith('cell_output_') , output_conf.keys()):
+                metafile.append(f"{elem} " + output_conf[elem])
+        elif output_conf['cell_output_type'] in [ 'GDAL'] and not output_conf['cell_output_gdal_format'] is None and not output_conf['cell_output_file_name'] is None:
+            for elem in filter(lambda x: x.startswith('cell_output_') , output_conf.keys()):
+                metafile.append(f"{elem} " + output_conf[elem])
+        elif output_conf['cell_output_type'] in [ 'NONE']:
+            metafile.append("cell_output_type NONE")
+
+        # check join cell grid params add to metafile
+
+    # point_output_types
+    if 'point_output_type' in output_conf.keys():
+        if output_conf['point_output_type'] in [ 'SHAPEFILE' , 'AIGEN', 'GEOJSON', 'TEXT'] and not output_conf['point_output_file_name'] is None:
+            for elem in filter(lambda x: x.startswith('point_output_') , output_conf.keys()):
+                metafile.append(f"{elem} " + output_conf[elem])
+        elif output_conf['point_output_type'] in [ 'GDAL'] and not output_conf['point_output_gdal_format'] is None and not output_conf['point_output_file_name'] is None:
+            for elem in filter(lambda x: x.startswith('point_output_') , output_conf.keys()):
+                metafile.append(f"{elem} " + output_conf[elem])
+        elif output_conf['point_output_type'] in [ 'NONE']:
+            metafile.append("point_output_type NONE")
+
+        # check join point grid params add to metafile
+
+    # children and neighbours of the cells, dggrid appends .chd and .nbr to the file names of the TEXT outputs
+    for kind in ['children', 'neighbor']:
+        if output_conf.get(f"{kind}_output_type", 'NONE') == 'TEXT' and not output_conf.get(f"{kind}_output_file_name") is None:
+            for elem in filter(lambda x: x.startswith(f"{kind}_output_") , output_conf.keys()):
+                metafile.append(f"{elem} " + output_conf[elem])
+
+    # split the output into several files of at most that many cells each, named <output_file_name>_1, _2, ...
+    if 'max_cells_per_output_file' in output_conf.keys() and not output_conf['max_cells_per_output_file'] is None:
+        metafile.append(f"max_cells_per_output_file {output_conf['max_cells_per_output_file']}")
+
+    return metafile
+
+
+"""
+the seqnums of the space separated list of SEQNUMS clip files as one int64 numpy array
+"""
+def read_seqnum_files(clip_region_files):
+
+    return np.concatenate([ read_seqnum_file(file) for file in clip_region_files.split(' ') ])
+
+
+# the costs of the bounded generations of seqnum_runs, measured with dggrid 6.4 on contiguous aperture 4 SEQNUMS
+# generations (python check_seqnum_runs.py <dggrid> measures them again): a run costs about 6 ms for starting dggrid and
+# writing, reading and removing its files, a generated cell about 40 µs for generating, writing and reading it back
+seqnum_run_cost_s = 0.006
+seqnum_cell_cost_s = 0.00004
+
+# the run cost in generated cells, the gap from which on a new run is cheaper than generating the gap
+seqnum_run_max_gap = int(round(seqnum_run_cost_s / seqnum_cell_cost_s))
+
+
+"""
+splits the requested seqnums into runs of close seqnums and returns the (first, last) seqnum of every run. Every gap of
+more than max_gap unrequested seqnums starts a new run, max_gap (default seqnum_run_max_gap) is what a run costs in
+generated cells. Each requested seqnum brings at most max_gap unrequested cells into its run, that is at most the cost
+of one more run: the generated cells are bounded by len(seqnums) * (max_gap + 1) and grow with the number of requested
+seqnums, not with their span. Every gap costs the cheaper of generating it and starting a new run, so with these costs
+no other split of the seqnums into runs is cheaper
+"""
+def seqnum_runs(seqnums, max_gap=None):
+
+    if max_gap is None:
+        max_gap = seqnum_run_max_gap
+
+    seqnums = np.unique(np.asarray(seqnums, dtype=np.int64))
+    if len(seqnums) == 0:
+        return []
+
+    splits = np.flatnonzero(np.diff(seqnums) > max_gap)
+
+    firsts = seqnums[np.concatenate([[0], splits + 1])]
+    lasts = seqnums[np.concatenate([splits, [len(seqnums) - 1]])]
+
+    return list(zip(firsts.tolist(), lasts.tolist()))
+
+
+def seqnum_run_file_name(file_name, output_type, run):
+
+    # dggrid appends the extension to the names of the non GDAL outputs
+    if output_type == 'GDAL':
+        path = Path(file_name)
+        return str(path.with_name(f"{path.stem}_run{run}{path.suffix}"))
+
+    return f"{file_name}_run{run}"
+
+
+def seqnum_run_files(output_conf):
+
+    files = []
+    for kind in ['cell', 'point']:
+        output_type = output_conf.get(f"{kind}_output_type", 'NONE')
+        if output_type == 'GDAL':
+            files.append((kind, output_type, output_conf[f"{kind}_output_file_name"]))
+        elif output_type == 'TEXT':
+            files.append((kind, output_type, output_conf[f"{kind}_output_file_name"] + '.txt'))
+    return files
+
+
+"""
+dggrid can clip the aperture 7 grids (ISEA7H, FULLER7H, PLANETRISK) by SEQNUMS only as a WHOLE_EARTH generation bounded
+by output_first_seqnum and output_last_seqnum. Instead of one run from the lowest to the highest requested seqnum, the
+seqnums are split into runs of close seqnums (seqnum_runs, at most max_gap unrequested cells per requested seqnum) with
+one bounded generation each, writing its own output files. Returns the requested seqnums, the runs and a (subset_conf, output_conf) job per run, or None for every other grid
+generation and for outputs that can't be merged afterwards (only GDAL and TEXT outputs in single files are merged)
+"""
+def dg_seqnum_run_jobs(dggs, subset_conf, output_conf, max_gap=None):
+
+    if not subset_conf['clip_subset_type'] == 'SEQNUMS' or subset_conf.get('clip_region_files') is None:
+        return None
+    if not dggs.dggs_type in ['ISEA7H', 'FULLER7H', 'PLANETRISK']:
+        return None
+    if not output_conf.get('cell_output_type', 'NONE') in ['GDAL', 'NONE'] or not output_conf.get('point_output_type', 'NONE') in ['GDAL', 'TEXT', 'NONE']:
+        return None
+    if not output_conf.get('max_cells_per_output_file') is None:
+        return None
+    # the children and neighbours are read for the requested cells from the one bounded run
+    if not output_conf.get('children_output_type', 'NONE') == 'NONE' or not output_conf.get('neighbor_output_type', 'NONE') == 'NONE':
+        return None
+
+    seqnums = np.unique(read_seqnum_files(subset_conf['clip_region_files']))
+    runs = seqnum_runs(seqnums, max_gap=max_gap)
+    if len(runs) == 0:
+        return None
+
+    jobs = []
+    for run, (first_seqnum, last_seqnum) in enumerate(runs):
+        run_subset_conf = { key: val for key, val in subset_conf.items() if not key == 'clip_region_files' }
+        run_subset_conf.update({ 'clip_subset_type': 'WHOLE_EARTH', 'output_first_seqnum': first_seqnum, 'output_last_seqnum': last_seqnum })
+
+        run_output_conf = dict(output_conf)
+        for kind in ['cell', 'point']:
+            if output_conf.get(f"{kind}_output_type", 'NONE') in ['GDAL', 'TEXT']:
+                run_output_conf[f"{kind}_output_file_name"] = seqnum_run_file_name(output_conf[f"{kind}_output_file_name"], output_conf[f"{kind}_output_type"], run)
+
+        jobs.append((run_subset_conf, run_output_conf))
+
+    return { 'seqnums': seqnums, 'runs': runs, 'jobs': jobs }
+
+
+"""
+writes the outputs of the seqnum runs of dg_seqnum_run_jobs into the output files of output_conf, in the order of the
+runs and with only the requested seqnums. The output files are written by dggrid4py, not by dggrid: a GDAL output
+without any cell is an empty layer with dggrid's name field
+"""
+def dg_merge_seqnum_runs(output_conf, run_jobs):
+
+    seqnums = run_jobs['seqnums']
+
+    for i, (kind, output_type, out_file) in enumerate(seqnum_run_files(output_conf)):
+        run_files = [ seqnum_run_files(run_output_conf)[i][2] for _, run_output_conf in run_jobs['jobs'] ]
+
+        if output_type == 'GDAL':
+            driver = output_conf[f"{kind}_output_gdal_format"]
+            # a run without cells may leave no file or a layer without fields
+            parts = [ read_geo_file(run_file, driver) for run_file in run_files if os.path.exists(run_file) ]
+            parts = [ part for part in parts if len(part) > 0 ]
+            if len(parts) == 0:
+                gdf = gpd.GeoDataFrame({ 'name': pd.Series([], dtype=str) }, geometry=gpd.GeoSeries([], crs=4326))
+            else:
+                gdf = pd.concat(parts, ignore_index=True)
+                name_col = 'name' if 'name' in gdf.columns else 'Name'
+                gdf = gdf.loc[np.isin(gdf[name_col].astype(np.int64).values, seqnums)]
+            gdf.to_file(out_file, driver=driver)
+        else:
+            # the lines of dggrid's TEXT output start with the seqnum, the last line is END
+            with open(out_file, 'w', encoding='utf-8') as dst:
+                for run_file in filter(os.path.exists, run_files):
+                    with open(run_file, 'r', encoding='utf-8') as src:
+                        lines = np.array([ line for line in src.read().splitlines() if not line == 'END' ], dtype=object)
+                    if len(lines) == 0:
+                        continue
+                    for line in lines[np.isin(read_id_file(run_file), seqnums)]:
+                        dst.write(line + '\n')
+                dst.write('END\n')
+
+
+def dg_remove_seqnum_run_files(run_jobs):
+
+    for _, run_output_conf in run_jobs['jobs']:
+        for _, _, run_file in seqnum_run_files(run_output_conf):
+            try:
+                os.remove(run_file)
+            except Exception:
+                pass
+
+
+"""
+helper function to generate the metafile of the point file based operations
+TRANSFORM_POINTS, BIN_POINT_VALS and BIN_POINT_PRESENCE
+"""
+def dg_points_meta(dggrid_operation, dggs, subset_conf, output_conf):
+
+    metafile = []
+    metafile.append("dggrid_operation " + dggrid_operation)
+
+    dggs_config_meta = dg_grid_meta(dggs)
+
+    for cmd in dggs_config_meta:
+        metafile.append(cmd)
+
+    # binning input_files, lines of lon lat (value)
+    if dggrid_operation in ['BIN_POINT_VALS', 'BIN_POINT_PRESENCE']:
+        if 'input_files' in subset_conf.keys() and not subset_conf['input_files'] is None:
+            for elem in filter(lambda x: x.startswith('input_') or x.startswith('bin_') , subset_conf.keys()):
+                metafile.append(f"{elem} " + subset_conf[elem])
+        else:
+            raise ValueError('no input files given')
+    # transform input_types
+    elif 'input_file_name' in subset_conf.keys() and 'input_address_type' in subset_conf.keys() and subset_conf['input_address_type'] in input_address_types:
+        for elem in filter(lambda x: x.startswith('input_') , subset_conf.keys()):
+            metafile.append(f"{elem} " + subset_conf[elem])
+    else:
+        raise ValueError('no input filename or type given')
+
+    # join grid gen params add to metafile
+
+    # transform output_types
+    if 'output_file_name' in output_conf.keys() and 'output_address_type' in output_conf.keys() and output_conf['output_address_type'] in output_address_types:
+        for elem in filter(lambda x: x.startswith('output_') or x == 'cell_output_control' , output_conf.keys()):
+            metafile.append(f"{elem} " + output_conf[elem])
+    else:
+        raise ValueError('no output filename or type given')
+
+    return metafile
+
+
+"""
+helper function to generate the metafile of an OUTPUT_STATS operation
+"""
+def dg_grid_stats_meta(dggs):
+
+    dggrid_operation = 'OUTPUT_STATS'
+    metafile = []
+    metafile.append("dggrid_operation " + dggrid_operation)
+
+    dggs_config_meta = dg_grid_meta(dggs)
+
+    for cmd in dggs_config_meta:
+        metafile.append(cmd)
+
+    return metafile
+
+
+"""
+helper function to parse the grid statistics table out of the captured logs of an OUTPUT_STATS run
+"""
+def dg_parse_stats_logs(logs):
+
+    np_table_switch = True
+    try:
+        import numpy as np
+    except ImportError:
+        np_table_switch = False
+
+    table = []
+    earth_line_switch = False
+    earth_radius_info = ''
+    for line in logs.split('\n'):
+        if "Earth Radius" in line:
+            earth_line_switch = True
+            earth_radius_info = line.strip().replace(',','')
+
+        if earth_line_switch == True:
+            table.append(line.strip().replace(',',''))
+
+    if np_table_switch == True:
+        np_table = np.genfromtxt(table, skip_header=3)
+        return { 'stats_output': np_table, 'earth_radius_info': earth_radius_info }
+    else:
+        return { 'stats_output': table, 'earth_radius_info': earth_radius_info }
+
+
+"""
+helper function to create the error message for a failed dggrid run
+"""
+def dg_run_error_message(result, capture_logs, logs):
+    if capture_logs == True:
+        return f"some error happened under the hood of dggrid (exit code {result}): " + logs
+    else:
+        return f"some error happened under the hood of dggrid (exit code {result}), try capture_logs=True for dggrid instance"
+
+
 """
 class representing a DGGS grid system configuration, projection aperture etc
 """
@@ -439,14 +796,80 @@ class Dggs(object):
             return alternative
 
 
+    def dg_closest_res(self, col, values, resround='nearest', metric=True, show_info=True):
+        """
+        resolution(s) whose col ('Area (km^2)', 'Spacing (km)' or 'CLS (km)') is closest to the scalar or array values,
+        looked up in the precomputed statistics. With metric=False the values are in miles (square miles for areas).
+        """
+        dggs_type = self.get_par('dggs_type')
+        if dggs_type == 'CUSTOM':
+            # dgconstruct describes the grid by its projection, aperture and topology
+            dggs_type = f"{self.get_par('projection', 'ISEA')}{self.get_par('aperture', 3)}{self.get_par('topology', 'HEXAGON')[0]}"
+
+        res_table = predefined_res_table(dggs_type, mixed_aperture_level=self.get_par('mixed_aperture_level', None))
+        if res_table is None:
+            raise ValueError(f"no resolution statistics for {dggs_type}")
+
+        res_values = res_table[col].values
+        if metric == False:
+            res_values = res_values * (KM_TO_MILES**2 if col == 'Area (km^2)' else KM_TO_MILES)
+
+        res = closest_res(res_values, values, resround)
+
+        if np.ndim(res) == 0:
+            res = int(res)
+            if show_info == True:
+                print(f"{dggs_type} resolution {res}: {res_table.iloc[res].to_dict()}")
+
+        return res
+
     def dg_closest_res_to_area (self, area, resround,metric,show_info=True):
-        raise ValueError('not yet implemented')
+        return self.dg_closest_res('Area (km^2)', area, resround, metric, show_info)
 
     def dg_closest_res_to_spacing(self, spacing,resround,metric,show_info=True):
-        raise ValueError('not yet implemented')
+        return self.dg_closest_res('Spacing (km)', spacing, resround, metric, show_info)
 
     def dg_closest_res_to_cls (self, cls_val, resround,metric,show_info=True):
-        raise ValueError('not yet implemented')
+        return self.dg_closest_res('CLS (km)', cls_val, resround, metric, show_info)
+
+
+"""
+decorator of the higher level methods: counts the temporary files of every call in a child tracker of temp_files (see
+TempFileTracker.measure) and keeps its counters as last_call_stats of the calling thread. Generators are counted step by
+step, their counters are kept once they are exhausted or closed
+"""
+def measured(method):
+
+    if inspect.isgeneratorfunction(method):
+        @functools.wraps(method)
+        def measured_generator(self, *args, **kwargs):
+            child = self.temp_files.child()
+            steps = method(self, *args, **kwargs)
+            try:
+                while True:
+                    with child.counting():
+                        try:
+                            item = next(steps)
+                        except StopIteration:
+                            return
+                    yield item
+            finally:
+                with child.counting():
+                    steps.close()
+                self.last_call_stats = child.stats()
+
+        return measured_generator
+
+    @functools.wraps(method)
+    def measured_method(self, *args, **kwargs):
+        child = self.temp_files.child()
+        try:
+            with child.counting():
+                return method(self, *args, **kwargs)
+        finally:
+            self.last_call_stats = child.stats()
+
+    return measured_method
 
 
 """
@@ -454,19 +877,99 @@ necessary instance object that needs to be instantiated once to tell where to us
 """
 class DGGRIDv7(object):
 
-    def __init__(self, executable = 'dggrid', working_dir = None, capture_logs=True, silent=False, tmp_geo_out_legacy= True):
+    def __init__(self, executable = 'dggrid', working_dir = None, capture_logs=True, silent=False, tmp_geo_out_legacy= True, max_concurrent=None,
+                 cell_cache=False, cell_cache_max_cells=1000000, geo_format=None, worker_dirs=None, scratch='disk'):
         self.executable = Path(executable).resolve()
         self.capture_logs=capture_logs
         self.silent=silent
-        self.last_run_succesful = False
-        self.last_run_logs = ''
-        self.tmp_geo_out = get_geo_out(legacy=tmp_geo_out_legacy)
-
-        if working_dir is None:
+        # geo_format ('FlatGeobuf', 'GPKG', 'GeoJSON' or 'auto') overrides tmp_geo_out_legacy, also per call
+        if geo_format is None:
+            self.tmp_geo_out = get_geo_out(legacy=tmp_geo_out_legacy)
+        else:
+            self.tmp_geo_out = geo_interchange_format(geo_format)
+
+        # run state is kept per calling thread, so that concurrent jobs don't overwrite each others logs
+        self._local = threading.local()
+
+        # accounting of the temporary files, see TempFileTracker.stats and TempFileTracker.measure
+        self.temp_files = TempFileTracker()
+
+        # max_concurrent limits how many dggrid subprocesses this instance runs at the same time (None: no limit)
+        self.max_concurrent = max_concurrent
+        self._run_slots = None if max_concurrent is None else threading.BoundedSemaphore(max_concurrent)
+
+        # scratch='memory' keeps all temporary files in a working_dir on /dev/shm (where available) that is removed by close()
+        # or when the instance is garbage collected, and the text outputs of the point operations are read through named pipes
+        if not scratch in ['disk', 'memory']:
+            raise ValueError(f"scratch must be 'disk' or 'memory', not {scratch}")
+        self.scratch = scratch
+        self._piped_outputs = {}
+        self._piped_lock = threading.Lock()
+        self._scratch_cleanup = None
+
+        if scratch == 'memory':
+            if not working_dir is None:
+                raise ValueError("scratch='memory' creates its own working_dir, don't pass one")
+            self.working_dir = tempfile.mkdtemp(prefix='dggrid_', dir=default_scratch_root())
+            self._scratch_cleanup = weakref.finalize(self, shutil.rmtree, self.working_dir, True)
+        elif working_dir is None:
             self.working_dir = tempfile.mkdtemp(prefix='dggrid_')
         else:
             self.working_dir = working_dir
 
+        # optional pool of warm worker directories (on /dev/shm where available) that the dggrid runs start in instead of
+        # writing and removing a metafile in the working_dir per run: True for max_concurrent (or number of cpus)
+        # directories, a number of directories, or a WorkerDirPool instance shared between instances
+        if worker_dirs is True:
+            self.worker_dirs = WorkerDirPool(max_concurrent if not max_concurrent is None else os.cpu_count())
+            self._owns_worker_dirs = True
+        elif isinstance(worker_dirs, WorkerDirPool):
+            self.worker_dirs = worker_dirs
+            self._owns_worker_dirs = False
+        elif not worker_dirs is None and not worker_dirs is False:
+            self.worker_dirs = WorkerDirPool(int(worker_dirs))
+            self._owns_worker_dirs = True
+        else:
+            self.worker_dirs = None
+            self._owns_worker_dirs = False
+
+        # optional persistent cache of the cell polygons generated by grid_cell_polygons_from_cellids,
+        # True keeps it in the working_dir, a CellGeometryCache instance can be shared between instances
+        if cell_cache is True:
+            self.cell_cache = CellGeometryCache(Path(self.working_dir) / 'dggrid4py_cell_cache.sqlite', max_cells=cell_cache_max_cells)
+        elif isinstance(cell_cache, CellGeometryCache):
+            self.cell_cache = cell_cache
+        else:
+            self.cell_cache = None
+
+
+    @property
+    def last_run_succesful(self):
+        return getattr(self._local, 'last_run_succesful', False)
+
+    @last_run_succesful.setter
+    def last_run_succesful(self, value):
+        self._local.last_run_succesful = value
+
+    @property
+    def last_run_logs(self):
+        return getattr(self._local, 'last_run_logs', '')
+
+    @last_run_logs.setter
+    def last_run_logs(self, value):
+        self._local.last_run_logs = value
+
+    @property
+    def last_call_stats(self):
+        """
+        the temporary file counters (see TempFileTracker.stats) of the last higher level call of the calling thread
+        """
+        return getattr(self._local, 'last_call_stats', {})
+
+    @last_call_stats.setter
+    def last_call_stats(self, value):
+        self._local.last_call_stats = value
+
 
     def is_runnable(self):
         is_runnable = 0
@@ -494,42 +997,60 @@ class DGGRIDv7(object):
         return is_runnable
 
 
-    def run(self, dggs_meta_ops):
+    def run(self, dggs_meta_ops, capture_logs=None, on_start=None):
+        """
+        runs dggrid with the given metafile lines. The subprocess is started with working_dir as its own cwd and the
+        metafile is referenced by absolute path, so the process working directory is never changed and run() can be
+        called from several threads at once. last_run_succesful and last_run_logs are tracked per calling thread.
 
-        curdir = os.getcwd()
-        tmp_id = uuid.uuid4()
+        with worker_dirs the run checks out a worker directory as cwd and overwrites the metafile there, waiting for a
+        free directory if all are in use. on_start is called with the started subprocess.Popen, e.g. to terminate the
+        run from another thread
+        """
+        if capture_logs is None:
+            capture_logs = self.capture_logs
+
+        returncode = -1
+        worker_dir = None
+        metafile_name = None
 
         # subprocess.call / Popen swat_exec, check if return val is 0 or not
         # yield logs?
         try:
-            os.chdir(self.working_dir)
-
-            with open('metafile_' + str(tmp_id), 'w', encoding='utf-8') as metafile:
-                for line in dggs_meta_ops:
-                    metafile.write(line + '\n')
-
-            logs = []
-            o = subprocess.Popen([os.path.join(self.working_dir, self.executable), 'metafile_' + str(tmp_id)], stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-
-            while o.poll() is None:
-                for b_line in o.stdout:
-                    line = b_line.decode().strip()
-                    # sys.stdout.write(line)
-                    if not self.silent:
-                        print(line)
-                    if self.capture_logs:
-                        logs.append(line.strip())
-
-            if o.returncode == 0:
-                self.last_run_succesful = True
-                try:
-                    os.remove( 'metafile_' + str(tmp_id) )
-                except Exception:
-                    pass
-            else:
-                self.last_run_succesful = False
-
-            if self.capture_logs:
+            with self.worker_dirs.acquire() if not self.worker_dirs is None else nullcontext() as worker_dir:
+                if worker_dir is None:
+                    run_dir = Path(self.working_dir).resolve()
+                    metafile_name = str(run_dir / f"metafile_{uuid.uuid4()}")
+                else:
+                    run_dir = worker_dir
+                    metafile_name = str(self.worker_dirs.metafile(worker_dir))
+
+                with open(metafile_name, 'w', encoding='utf-8') as metafile:
+                    for line in dggs_meta_ops:
+                        metafile.write(line + '\n')
+                if worker_dir is None:
+                    self.temp_files.add(metafile_name)
+                self.temp_files.written(metafile_name)
+
+                logs = []
+                with self._run_slots if not self._run_slots is None else nullcontext():
+                    o = subprocess.Popen([os.path.join(run_dir, self.executable), metafile_name], cwd=run_dir, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+                    if not on_start is None:
+                        on_start(o)
+
+                    for b_line in o.stdout:
+                        line = b_line.decode().strip()
+                        # sys.stdout.write(line)
+                        if not self.silent:
+                            print(line)
+                        if capture_logs:
+                            logs.append(line.strip())
+
+                    returncode = o.wait()
+
+            self.last_run_succesful = returncode == 0
+
+            if capture_logs:
                 self.last_run_logs = '\n'.join(logs)
             else:
                 self.last_run_logs = ''
@@ -540,9 +1061,24 @@ class DGGRIDv7(object):
             traceback.print_exc(file=sys.stdout)
             self.last_run_logs = repr(e)
         finally:
-            os.chdir(curdir)
+            # the metafile is removed also after failed runs, their logs tell what went wrong. The metafile of a worker
+            # directory is overwritten by the next run
+            if worker_dir is None and not metafile_name is None:
+                self.temp_files.remove(metafile_name)
+
+        return returncode
+
+
+    def close(self):
+        """
+        removes the worker directories of the instance, a shared WorkerDirPool is left to its owner, and the working_dir
+        of scratch='memory'
+        """
+        if self._owns_worker_dirs:
+            self.worker_dirs.close()
 
-        return o.returncode
+        if not self._scratch_cleanup is None:
+            self._scratch_cleanup()
 
 
     """
@@ -554,128 +1090,50 @@ class DGGRIDv7(object):
         """
         Grid Generation. Generate the cells of a DGG, either covering the complete surface of the earth or covering only a
         specific set of regions on the earth’s surface.
-        """
-        dggrid_operation = 'GENERATE_GRID'
-        metafile = []
-        metafile.append("dggrid_operation " + dggrid_operation)
 
-        dggs_config_meta = dg_grid_meta(dggs)
-
-        for cmd in dggs_config_meta:
-            metafile.append(cmd)
+        the SEQNUMS clipping of the aperture 7 grids runs one bounded generation per run of close seqnums on parallel
+        workers and merges their outputs (see dg_seqnum_run_jobs), metafile is then the list of the metafiles of the runs.
+        The output files are then written by dggrid4py with only the requested cells (see dg_merge_seqnum_runs)
+        """
+        run_jobs = dg_seqnum_run_jobs(dggs, subset_conf, output_conf)
+        if not run_jobs is None:
+            return self._grid_gen_seqnum_runs(dggs, output_conf, run_jobs)
 
-        # clip_subset_types
-        if subset_conf['clip_subset_type'] == 'WHOLE_EARTH':
-            metafile.append("clip_subset_type " + subset_conf['clip_subset_type'])
-        elif subset_conf['clip_subset_type'] in [ 'SHAPEFILE' , 'AIGEN', 'GDAL'] and not subset_conf['clip_region_files'] is None:
-            metafile.append("clip_subset_type " + subset_conf['clip_subset_type'])
-            metafile.append("clip_region_files " + subset_conf['clip_region_files'])
-        elif subset_conf['clip_subset_type'] in [ 'SEQNUMS'] and not subset_conf['clip_region_files'] is None:
-            if not dggs.dggs_type in ['ISEA7H', 'FULLER7H', 'PLANETRISK']:
-                metafile.append("clip_subset_type " + subset_conf['clip_subset_type'])
-                metafile.append("clip_region_files " + subset_conf['clip_region_files'])
-            else:
-                # if dggs_aperture_type would be SEQUENCE
-                # have to reset to WHOLE_EARTH and clip based on
-                # output_first_seqnum and output_last_seqnum
-                subset_conf['clip_subset_type'] = 'WHOLE_EARTH'
-                metafile.append("clip_subset_type " + subset_conf['clip_subset_type'])
-                # loading seqnums
-                files = subset_conf['clip_region_files'].split(' ')
-                seqnums = []
-                for file in files:
-                    seqs = pd.read_csv( file, header=None)[0].values
-                    seqnums.append(seqs.min())
-                    seqnums.append(seqs.max())
-
-                first_seqnum = np.array(seqnums).min()
-                last_seqnum = np.array(seqnums).max()
-                subset_conf['output_first_seqnum'] = first_seqnum
-                metafile.append("output_first_seqnum " + str(subset_conf['output_first_seqnum']))
-                subset_conf['output_last_seqnum'] = last_seqnum
-                metafile.append("output_last_seqnum " + str(subset_conf['output_last_seqnum']))
-        else:
-            raise ValueError('something is not correct in subset_conf')
-
-        # join grid gen params add to metafile
-
-        # cell_output_types
-        if 'cell_output_type' in output_conf.keys():
-            if output_conf['cell_output_type'] in [ 'SHAPEFILE' , 'AIGEN', 'GEOJSON', 'TEXT'] and not output_conf['cell_output_file_name'] is None:
-                for elem in filter(lambda x: x.startswith('cell_output_') , output_conf.keys()):
-                    metafile.append(f"{elem} " + output_conf[elem])
-            elif output_conf['cell_output_type'] in [ 'GDAL'] and not output_conf['cell_output_gdal_format'] is None and not output_conf['cell_output_file_name'] is None:
-                for elem in filter(lambda x: x.startswith('cell_output_') , output_conf.keys()):
-                    metafile.append(f"{elem} " + output_conf[elem])
-            elif output_conf['cell_output_type'] in [ 'NONE']:
-                metafile.append("cell_output_type NONE")
-
-            # check join cell grid params add to metafile
-
-        # point_output_types
-        if 'point_output_type' in output_conf.keys():
-            if output_conf['point_output_type'] in [ 'SHAPEFILE' , 'AIGEN', 'GEOJSON', 'TEXT'] and not output_conf['point_output_file_name'] is None:
-                for elem in filter(lambda x: x.startswith('point_output_') , output_conf.keys()):
-                    metafile.append(f"{elem} " + output_conf[elem])
-            elif output_conf['point_output_type'] in [ 'GDAL'] and not output_conf['point_output_gdal_format'] is None and not output_conf['point_output_file_name'] is None:
-                for elem in filter(lambda x: x.startswith('point_output_') , output_conf.keys()):
-                    metafile.append(f"{elem} " + output_conf[elem])
-            elif output_conf['point_output_type'] in [ 'NONE']:
-                metafile.append("point_output_type NONE")
-
-            # check join point grid params add to metafile
+        metafile = dg_grid_gen_meta(dggs, subset_conf, output_conf)
 
         result = self.run(metafile)
 
         if not result == 0:
-            if self.capture_logs == True:
-                message = f"some error happened under the hood of dggrid (exit code {result}): " + self.last_run_logs
-                raise ValueError(message)
-            else:
-                message = f"some error happened under the hood of dggrid (exit code {result}), try capture_logs=True for dggrid instance"
-                raise ValueError(message)
+            raise ValueError(dg_run_error_message(result, self.capture_logs, self.last_run_logs))
 
         return { 'metafile': metafile, 'output_conf': output_conf }
 
 
-    def dgapi_grid_transform(self, dggs, subset_conf, output_conf):
+    def _grid_gen_seqnum_runs(self, dggs, output_conf, run_jobs):
         """
-        Address Conversion. Transform a file of locations from one address form (such as longitude/latitude) to another (such as DGG cell indexes).
+        runs the bounded generations of the seqnum runs on parallel workers and merges their outputs
         """
-        dggrid_operation = 'TRANSFORM_POINTS'
-        metafile = []
-        metafile.append("dggrid_operation " + dggrid_operation)
-
-        dggs_config_meta = dg_grid_meta(dggs)
+        try:
+            results = self.run_many([ (dggs, run_subset_conf, run_output_conf) for run_subset_conf, run_output_conf in run_jobs['jobs'] ])
 
-        for cmd in dggs_config_meta:
-            metafile.append(cmd)
+            errors = [ result['error'] for result in results if not result['error'] is None ]
+            if len(errors) > 0:
+                raise errors[0]
 
-        # transform input_types
-        if 'input_file_name' in subset_conf.keys() and 'input_address_type' in subset_conf.keys() and subset_conf['input_address_type'] in input_address_types:
-            for elem in filter(lambda x: x.startswith('input_') , subset_conf.keys()):
-                metafile.append(f"{elem} " + subset_conf[elem])
-        else:
-            raise ValueError('no input filename or type given')
+            dg_merge_seqnum_runs(output_conf, run_jobs)
+        finally:
+            dg_remove_seqnum_run_files(run_jobs)
 
-        # join grid gen params add to metafile
+        return { 'metafile': [ result['result']['metafile'] for result in results ], 'output_conf': output_conf }
 
-        # transform output_types
-        if 'output_file_name' in output_conf.keys() and 'output_address_type' in output_conf.keys() and output_conf['output_address_type'] in output_address_types:
-            for elem in filter(lambda x: x.startswith('output_') , output_conf.keys()):
-                metafile.append(f"{elem} " + output_conf[elem])
-        else:
-            raise ValueError('no output filename or type given')
 
-        result = self.run(metafile)
+    def dgapi_grid_transform(self, dggs, subset_conf, output_conf):
+        """
+        Address Conversion. Transform a file of locations from one address form (such as longitude/latitude) to another (such as DGG cell indexes).
+        """
+        metafile = dg_points_meta('TRANSFORM_POINTS', dggs, subset_conf, output_conf)
 
-        if not result == 0:
-            if self.capture_logs == True:
-                message = f"some error happened under the hood of dggrid (exit code {result}): " + self.last_run_logs
-                raise ValueError(message)
-            else:
-                message = f"some error happened under the hood of dggrid (exit code {result}), try capture_logs=True for dggrid instance"
-                raise ValueError(message)
+        self._run_points(metafile, output_conf)
 
         return { 'metafile': metafile, 'output_conf': output_conf }
 
@@ -708,40 +1166,9 @@ class DGGRIDv7(object):
         cell_output_control OUTPUT_OCCUPIED
 
         """
-        dggrid_operation = 'BIN_POINT_VALS'
-        metafile = []
-        metafile.append("dggrid_operation " + dggrid_operation)
-
-        dggs_config_meta = dg_grid_meta(dggs)
-
-        for cmd in dggs_config_meta:
-            metafile.append(cmd)
-
-        # transform input_types
-        if 'input_file_name' in subset_conf.keys() and 'input_address_type' in subset_conf.keys() and subset_conf['input_address_type'] in input_address_types:
-            for elem in filter(lambda x: x.startswith('input_') , subset_conf.keys()):
-                metafile.append(f"{elem} " + subset_conf[elem])
-        else:
-            raise ValueError('no input filename or type given')
-
-        # join grid gen params add to metafile
-
-        # transform output_types
-        if 'output_file_name' in output_conf.keys() and 'output_address_type' in output_conf.keys() and output_conf['output_address_type'] in output_address_types:
-            for elem in filter(lambda x: x.startswith('output_') , output_conf.keys()):
-                metafile.append(f"{elem} " + output_conf[elem])
-        else:
-            raise ValueError('no output filename or type given')
-
-        result = self.run(metafile)
+        metafile = dg_points_meta('BIN_POINT_VALS', dggs, subset_conf, output_conf)
 
-        if not result == 0:
-            if self.capture_logs == True:
-                message = f"some error happened under the hood of dggrid (exit code {result}): " + self.last_run_logs
-                raise ValueError(message)
-            else:
-                message = f"some error happened under the hood of dggrid (exit code {result}), try capture_logs=True for dggrid instance"
-                raise ValueError(message)
+        self._run_points(metafile, output_conf)
 
         return { 'metafile': metafile, 'output_conf': output_conf }
 
@@ -751,99 +1178,101 @@ class DGGRIDv7(object):
         Presence/Absence Binning. Given a set of input files, each containing point locations associated with a particular class, DGGRID outputs,
         for each cell of a DGG, a vector indicating whether or not each class is present in that cell.
         """
-        dggrid_operation = 'BIN_POINT_PRESENCE'
-        metafile = []
-        metafile.append("dggrid_operation " + dggrid_operation)
+        metafile = dg_points_meta('BIN_POINT_PRESENCE', dggs, subset_conf, output_conf)
 
-        dggs_config_meta = dg_grid_meta(dggs)
+        self._run_points(metafile, output_conf)
 
-        for cmd in dggs_config_meta:
-            metafile.append(cmd)
-
-        # transform input_types
-        if 'input_file_name' in subset_conf.keys() and 'input_address_type' in subset_conf.keys() and subset_conf['input_address_type'] in input_address_types:
-            for elem in filter(lambda x: x.startswith('input_') , subset_conf.keys()):
-                metafile.append(f"{elem} " + subset_conf[elem])
-        else:
-            raise ValueError('no input filename or type given')
+        return { 'metafile': metafile, 'output_conf': output_conf }
 
-        # join grid gen params add to metafile
 
-        # transform output_types
-        if 'output_file_name' in output_conf.keys() and 'output_address_type' in output_conf.keys() and output_conf['output_address_type'] in output_address_types:
-            for elem in filter(lambda x: x.startswith('output_') , output_conf.keys()):
-                metafile.append(f"{elem} " + output_conf[elem])
-        else:
-            raise ValueError('no output filename or type given')
+    def dgapi_grid_stats(self, dggs):
+        """
+        Output Grid Statistics. Output a table of grid characteristics for the specified DGG.
+        """
+        metafile = dg_grid_stats_meta(dggs)
 
-        result = self.run(metafile)
+        # we need to capture the logs for this one:
+        result = self.run(metafile, capture_logs=True)
 
         if not result == 0:
-            if self.capture_logs == True:
-                message = f"some error happened under the hood of dggrid (exit code {result}): " + self.last_run_logs
-                raise ValueError(message)
-            else:
-                message = f"some error happened under the hood of dggrid (exit code {result}), try capture_logs=True for dggrid instance"
-                raise ValueError(message)
+            raise ValueError(dg_run_error_message(result, True, self.last_run_logs))
 
-        return { 'metafile': metafile, 'output_conf': output_conf }
+        return { 'metafile': metafile, 'output_conf': dg_parse_stats_logs(self.last_run_logs) }
 
 
-    def dgapi_grid_stats(self, dggs):
+    def _run_points(self, metafile, output_conf):
         """
-        Output Grid Statistics. Output a table of grid characteristics for the specified DGG.
+        runs a point file based operation, its output is drained while dggrid runs if it is a named pipe (scratch='memory')
+        and kept for _output_source
         """
-        import copy
+        with drain_fifo(output_conf.get('output_file_name')) as output:
+            result = self.run(metafile)
 
-        np_table_switch = True
-        try:
-            import numpy as np
-        except ImportError:
-            np_table_switch = False
+        if not result == 0:
+            raise ValueError(dg_run_error_message(result, self.capture_logs, self.last_run_logs))
 
-        dggrid_operation = 'OUTPUT_STATS'
-        metafile = []
-        metafile.append("dggrid_operation " + dggrid_operation)
+        self._store_piped_output(output_conf, output)
 
-        dggs_config_meta = dg_grid_meta(dggs)
 
-        for cmd in dggs_config_meta:
-            metafile.append(cmd)
+    def _store_piped_output(self, output_conf, output):
+        if not output is None:
+            with self._piped_lock:
+                self._piped_outputs[str(output_conf['output_file_name'])] = output
 
-        # we need to capturethe logs for this one:
-        save_state = copy.copy(self.capture_logs)
-        self.capture_logs = True
 
-        result = self.run(metafile)
+    def _output_source(self, job):
+        """
+        the text output of a finished job for the readers: the output drained from its named pipe, else the output file
+        """
+        with self._piped_lock:
+            output = self._piped_outputs.pop(str(job['out_file']), None)
+
+        return job['out_file'] if output is None else output
 
-        if not result == 0:
-            if self.capture_logs == True:
-                message = f"some error happened under the hood of dggrid (exit code {result}): " + self.last_run_logs
-                raise ValueError(message)
-            else:
-                message = f"some error happened under the hood of dggrid (exit code {result}), try capture_logs=True for dggrid instance"
-                raise ValueError(message)
 
-        table = []
-        earth_line_switch = False
-        earth_radius_info = ''
-        for line in self.last_run_logs.split('\n'):
-            if "Earth Radius" in line:
-                earth_line_switch = True
-                earth_radius_info = line.strip().replace(',','')
+    def run_many(self, jobs, max_workers=None, ordered=True, operation='GENERATE_GRID'):
+        """
+        Batch execution. Runs many independent dggrid jobs across a bounded pool of workers. jobs is a list of
+        (dggs, subset_conf, output_conf) tuples as taken by the dgapi_* method of the given dggrid operation.
+        Returns one dict per job { 'index': position in jobs, 'result': dgapi return value, 'error': exception or None },
+            a) if ordered == True: in input order
+            b) if ordered == False: in the order the jobs completed
+        A failing job does not stop the others, its exception is reported in its 'error' entry.
+        """
+        results = list(self.iter_run_many(jobs, max_workers=max_workers, operation=operation))
 
-            if earth_line_switch == True:
-                table.append(line.strip().replace(',',''))
+        if ordered == True:
+            results.sort(key=lambda job_result: job_result['index'])
 
-        # set capture logs back to original
-        self.capture_logs == save_state
+        return results
 
-        if np_table_switch == True:
-            np_table = np.genfromtxt(table, skip_header=3)
 
-            return { 'metafile': metafile, 'output_conf': {'stats_output': np_table, 'earth_radius_info': earth_radius_info } }
-        else:
-            return { 'metafile': metafile, 'output_conf': {'stats_output': table, 'earth_radius_info': earth_radius_info } }
+    def iter_run_many(self, jobs, max_workers=None, operation='GENERATE_GRID'):
+        """
+        same as run_many, but yields the per job dicts as soon as each job has completed
+        """
+        dgapi_lookup = {
+            'GENERATE_GRID': self.dgapi_grid_gen,
+            'TRANSFORM_POINTS': self.dgapi_grid_transform,
+            'BIN_POINT_VALS': self.dgapi_point_value_binning,
+            'BIN_POINT_PRESENCE': self.dgapi_pres_binning
+        }
+
+        if not operation in dgapi_lookup.keys():
+            raise ValueError(f"operation {operation} can not be batched, use one of {list(dgapi_lookup.keys())}")
+
+        if max_workers is None:
+            max_workers = self.max_concurrent if not self.max_concurrent is None else os.cpu_count()
+
+        # every job is its own dggrid subprocess, the worker threads only wait for them
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = { pool.submit(bind_context(dgapi_lookup[operation]), *job): index for index, job in enumerate(jobs) }
+
+            for future in as_completed(futures):
+                try:
+                    yield { 'index': futures[future], 'result': future.result(), 'error': None }
+                except Exception as e:
+                    yield { 'index': futures[future], 'result': None, 'error': e }
 
 
     """
@@ -851,175 +1280,1290 @@ class DGGRIDv7(object):
     # Higher level API
     #################################################################################
     """
+    @measured
     def grid_stats_table(self, dggs_type, resolution, mixed_aperture_level=None):
         """
         generates the area and cell statististcs for the given DGGS from resolution 0 to the given resolution of the DGGS
+
+        the tables of the predefined dggs_types are precomputed, other tables are generated with dggrid once and then
+        memoized in this process and in the working_dir
         """
+        df = lookup_stats_table(dggs_type, resolution, mixed_aperture_level, cache_dir=self.working_dir)
+        if not df is None:
+            return df
+
         dggs = dgselect(dggs_type = dggs_type, res= resolution, mixed_aperture_level=mixed_aperture_level)
 
         dggs_ops = self.dgapi_grid_stats(dggs)
-        df = pd.DataFrame(dggs_ops['output_conf']['stats_output'])
 
-        df.rename(columns={0: 'Resolution', 1: "Cells", 2:"Area (km^2)", 3: "CLS (km)"}, inplace=True)
-        df['Resolution'] = df['Resolution'].astype(int)
-        df['Cells'] = df['Cells'].astype(np.int64)
+        df = self._stats_table_frame(dggs_ops)
+        store_stats_table(df, dggs_type, resolution, mixed_aperture_level, cache_dir=self.working_dir)
+
         return df
 
 
-    def grid_cell_polygons_for_extent(self, dggs_type, resolution, mixed_aperture_level=None, clip_geom=None):
+    @measured
+    def grid_cell_polygons_for_extent(self, dggs_type, resolution, mixed_aperture_level=None, clip_geom=None, geo_format=None, antimeridian=None):
         """
         generates a DGGS grid and returns all the cells as Geodataframe with geometry type Polygon
             a) if clip_geom is empty/None: grid cell ids/seqnms for the WHOLE_EARTH
             b) if clip_geom is a shapely shape geometry, takes this as a clip area
+
+        geo_format chooses the temporary file format for this call (default: the instance's format)
+
+        antimeridian fixes the cells crossing the 180º meridian (bounding box wider than 180º):
+            'split': replaces them by their eastern and western part (like interrupt.py)
+            'shift': moves their negative longitudes east by 360º
+            'flag': only marks them in an additional crosses_antimeridian column
         """
-        tmp_id = uuid.uuid4()
-        tmp_dir = self.working_dir
-        dggs = dgselect(dggs_type = dggs_type, res= resolution, mixed_aperture_level=mixed_aperture_level)
+        job = self._prepare_grid_gen(dggs_type, resolution, mixed_aperture_level, clip_geom=clip_geom, geo_format=geo_format)
 
-        subset_conf = { 'update_frequency': 100000, 'clip_subset_type': 'WHOLE_EARTH' }
+        with self._cleanup(job):
+            dggs_ops = self.dgapi_grid_gen(job['dggs'], job['subset_conf'], job['output_conf'] )
 
-        if not clip_geom is None and clip_geom.area > 0:
+            return self._fix_antimeridian(self._collect_cell_polygons(job), antimeridian)
 
-            clip_gdf = gpd.GeoDataFrame(pd.DataFrame({'id' : [1], 'geometry': [clip_geom]}), geometry='geometry', crs=from_epsg(4326))
-            clip_gdf.to_file(Path(tmp_dir) / f"temp_clip_{tmp_id}.{self.tmp_geo_out['ext']}", driver=self.tmp_geo_out['driver'] )
 
-            subset_conf.update({
-                'clip_subset_type': 'GDAL',
-                'clip_region_files': str( (Path(tmp_dir) / f"temp_clip_{tmp_id}.{self.tmp_geo_out['ext']}").resolve()),
-                })
+    @measured
+    def grid_cell_polygons_for_extent_tiled(self, dggs_type, resolution, mixed_aperture_level=None, clip_geom=None, max_cells_per_tile=1000000, max_workers=None, geo_format=None):
+        """
+        like grid_cell_polygons_for_extent, for large grids. The clip_geom (or the WHOLE_EARTH if None) is split
+        into tiles of about max_cells_per_tile cells (estimated from grid_stats_table), every tile is generated as its own
+        clipped dggrid run on max_workers parallel workers, and the merged cells are deduplicated and sorted by seqnum.
+        """
+        stats = self.grid_stats_table(dggs_type, resolution, mixed_aperture_level)
+        total_cells = stats.loc[stats['Resolution'] == resolution, 'Cells'].values[0]
 
-        output_conf = {
-            'cell_output_type': 'GDAL',
-            'cell_output_gdal_format' : self.tmp_geo_out['driver'],
-            'cell_output_file_name': str( (Path(tmp_dir) / f"temp_{dggs_type}_{resolution}_out_{tmp_id}.{self.tmp_geo_out['ext']}").resolve())
-            }
+        tiles = plan_tiles(total_cells, max_cells_per_tile, clip_geom=clip_geom)
 
-        dggs_ops = self.dgapi_grid_gen(dggs, subset_conf, output_conf )
+        jobs = []
+        with self._cleanup(jobs):
+            # appended one by one, so that the files of the jobs prepared before a failing one are removed as well
+            for tile in tiles:
+                jobs.append(self._prepare_grid_gen(dggs_type, resolution, mixed_aperture_level, clip_geom=tile, geo_format=geo_format))
+            results = self.run_many([ (job['dggs'], job['subset_conf'], job['output_conf']) for job in jobs ], max_workers=max_workers)
 
-        gdf = gpd.read_file( Path(tmp_dir) / f"temp_{dggs_type}_{resolution}_out_{tmp_id}.{self.tmp_geo_out['ext']}", driver=self.tmp_geo_out['driver'] )
+            errors = [ result['error'] for result in results if not result['error'] is None ]
+            if len(errors) > 0:
+                raise errors[0]
 
-        try:
-            os.remove( str( Path(tmp_dir) / f"temp_{dggs_type}_{resolution}_out_{tmp_id}.{self.tmp_geo_out['ext']}") )
-            os.remove( str( Path(tmp_dir) / f"temp_clip_{tmp_id}.{self.tmp_geo_out['ext']}") )
-        except Exception:
-            pass
+            tile_cells = [ self._collect_cell_polygons(job) for job in jobs ]
+
+        return self._merge_tile_cells(tile_cells)
+
+
+    def _merge_tile_cells(self, tile_cells):
+        # boundary cells are generated by each of the tiles they touch
+        gdf = pd.concat(tile_cells, ignore_index=True)
+        name_col = 'name' if 'name' in gdf.columns else 'Name'
+        gdf = gdf.drop_duplicates(subset=name_col)
+        gdf = gdf.iloc[np.argsort(gdf[name_col].astype(np.int64).values, kind='stable')].reset_index(drop=True)
 
         return gdf
 
 
-    def grid_cell_polygons_from_cellids(self, cell_id_list, dggs_type, resolution, mixed_aperture_level=None):
+    @measured
+    def grid_cell_polygons_from_cellids(self, cell_id_list, dggs_type, resolution, mixed_aperture_level=None, geo_format=None, antimeridian=None, engine='dggrid',
+                                        densify=1.0):
         """
         generates a DGGS grid and returns all the cells as Geodataframe with geometry type Polygon
             a) if cell_id_list is empty/None: grid cells for the WHOLE_EARTH
             b) if cell_id_list is a list/numpy array, takes this list as seqnums ids for subsetting
+
+        with a cell_cache only the cells that are not cached yet are generated by dggrid,
+        antimeridian ('split', 'shift' or 'flag') see grid_cell_polygons_for_extent
+
+        engine='native' computes the cell vertices of the seqnums in-process (dggrid4py.isea) instead of running dggrid,
+        for the predefined ISEA3H, ISEA4H, ISEA4T and ISEA4D grids. The other grids, e.g. the aperture 7 ISEA7H, raise
+        a ValueError and need engine='dggrid'. Its cost only depends on the number of seqnums.
+        The edges of its cells are densified through the inverse projection into segments of at most densify degrees
+        (like dggrid's densification), densify=0 keeps the straight edges between the vertices.
         """
-        tmp_id = uuid.uuid4()
-        tmp_dir = self.working_dir
-        dggs = dgselect(dggs_type = dggs_type, res= resolution, mixed_aperture_level=mixed_aperture_level)
+        if engine == 'native':
+            return self._fix_antimeridian(self._native_cell_polygons(cell_id_list, dggs_type, resolution, mixed_aperture_level, densify), antimeridian, native=True)
+        elif not engine == 'dggrid':
+            raise ValueError(f"unknown engine {engine}, use 'dggrid' or 'native'")
 
-        subset_conf = { 'update_frequency': 100000, 'clip_subset_type': 'WHOLE_EARTH' }
-        seq_df = None
+        if self.cell_cache is None or cell_id_list is None or len(cell_id_list) == 0:
+            job = self._prepare_grid_gen(dggs_type, resolution, mixed_aperture_level, cell_id_list=cell_id_list, geo_format=geo_format)
 
-        if not cell_id_list is None and len(cell_id_list) > 0:
+            with self._cleanup(job):
+                dggs_ops = self.dgapi_grid_gen(job['dggs'], job['subset_conf'], job['output_conf'] )
 
-            seq_df = pd.DataFrame({ 'seqs': cell_id_list})
-            seq_df.to_csv( str( (Path(tmp_dir) / f"temp_clip_{tmp_id}.txt").resolve()) , header=False, index=False, columns=['seqs'], sep=' ')
+                return self._fix_antimeridian(self._collect_cell_polygons(job), antimeridian)
 
-            subset_conf.update({
-                'clip_subset_type': 'SEQNUMS',
-                'clip_region_files': str( (Path(tmp_dir) / f"temp_clip_{tmp_id}.txt").resolve()),
-                })
+        cached, missing = self._cached_cell_lookup(cell_id_list, dggs_type, resolution, mixed_aperture_level)
 
-        output_conf = {
-            'cell_output_type': 'GDAL',
-            'cell_output_gdal_format' : self.tmp_geo_out['driver'],
-            'cell_output_file_name': str( (Path(tmp_dir) / f"temp_{dggs_type}_{resolution}_out_{tmp_id}.{self.tmp_geo_out['ext']}").resolve())
-            }
+        fresh = None
+        if len(missing) > 0:
+            job = self._prepare_grid_gen(dggs_type, resolution, mixed_aperture_level, cell_id_list=missing, geo_format=geo_format)
 
-        dggs_ops = self.dgapi_grid_gen(dggs, subset_conf, output_conf )
+            with self._cleanup(job):
+                dggs_ops = self.dgapi_grid_gen(job['dggs'], job['subset_conf'], job['output_conf'] )
 
-        gdf = gpd.read_file( Path(tmp_dir) / f"temp_{dggs_type}_{resolution}_out_{tmp_id}.{self.tmp_geo_out['ext']}", driver=self.tmp_geo_out['driver'] )
+                fresh = self._collect_cell_polygons(job)
 
-        if not cell_id_list is None and len(cell_id_list) > 0 and not seq_df is None:
-            # we have to adjust the columns formats for the IDs/Seqnums/Name field to ensure they are comparable for the join
-            # as they are all cell IDs they should all be long integers
-            seq_df['cell_exists'] = True
-            seq_df['seqs'] = seq_df['seqs'].astype(np.int64)
-            seq_df.set_index('seqs', inplace=True)
-            name_col = 'name' if 'name' in gdf.columns else 'Name'
-            gdf[name_col] = gdf[name_col].astype(np.int64)
-            gdf = gdf.join( seq_df, how='inner', on=name_col)
-            gdf = gdf.loc[gdf['cell_exists']].drop(columns=['cell_exists'])
+        # the cache keeps the cells as dggrid generated them
+        return self._fix_antimeridian(self._merge_cached_cells(cell_id_list, cached, fresh, dggs_type, resolution, mixed_aperture_level), antimeridian)
+
+
+    @measured
+    def iter_grid_cell_polygons(self, dggs_type, resolution, mixed_aperture_level=None, clip_geom=None, batch_size=100000, max_cells_per_output_file=None, geo_format=None):
+        """
+        generator variant of grid_cell_polygons_for_extent for grids that don't fit into memory,
+        yields the cells as Geodataframes of at most batch_size cells each
+            a) if clip_geom is empty/None: grid cells for the WHOLE_EARTH
+            b) if clip_geom is a shapely shape geometry, takes this as a clip area
+
+        dggrid shards its output into files of max_cells_per_output_file cells (default batch_size). Shards are read
+        while dggrid is still writing the next ones and each shard is removed as soon as all its cells were yielded.
+        When the generator is closed early (e.g. by a break in the loop over it), dggrid is killed instead of generating
+        the rest of the grid.
+        """
+        if max_cells_per_output_file is None:
+            max_cells_per_output_file = batch_size
+
+        job = self._prepare_grid_gen(dggs_type, resolution, mixed_aperture_level, clip_geom=clip_geom, geo_format=geo_format)
+
+        # sharded outputs get a _<n> suffix, so we use the bare output name as base for the shards
+        out_base = Path(job['output_conf']['cell_output_file_name']).with_suffix('')
+        job['output_conf']['cell_output_file_name'] = str(out_base)
+        job['output_conf']['max_cells_per_output_file'] = str(max_cells_per_output_file)
+        # the shards, and any other output dggrid names after the unique base
+        job['tmp_globs'] = [ f"{out_base}*" ]
+
+        # the cells are generated with one run, without the seqnum runs of dgapi_grid_gen, as there's no seqnum clipping
+        metafile = dg_grid_gen_meta(job['dggs'], job['subset_conf'], job['output_conf'])
+        processes = []
+        closed = threading.Event()
+
+        def started(process):
+            processes.append(process)
+            if closed.is_set():
+                process.kill()
+
+        def generate():
+            result = self.run(metafile, on_start=started)
+            if not result == 0 and not closed.is_set():
+                raise ValueError(dg_run_error_message(result, self.capture_logs, self.last_run_logs))
 
         try:
-            os.remove( str( Path(tmp_dir) / f"temp_{dggs_type}_{resolution}_out_{tmp_id}.{self.tmp_geo_out['ext']}") )
-            os.remove( str( Path(tmp_dir) / f"temp_clip_{tmp_id}.txt") )
-        except Exception:
-            pass
+            with ThreadPoolExecutor(max_workers=1) as pool:
+                dggrid_run = pool.submit(bind_context(generate))
 
-        return gdf
+                try:
+                    # dggrid names the shards <out_base>_1, <out_base>_2, ... (plus the extension of the format) and
+                    # closes a shard before it creates the next one (outputCell in dggrid's gridgen.cpp), so a shard is
+                    # complete when the next one exists or dggrid has finished
+                    shard_num = 1
+                    while True:
+                        # look for finished first, the last shard may be written between the two lookups otherwise
+                        finished = dggrid_run.done()
+                        if finished:
+                            dggrid_run.result()
+
+                        shard = self._find_output_shard(out_base, shard_num)
+                        next_shard = self._find_output_shard(out_base, shard_num + 1)
+
+                        if not shard is None and (finished or not next_shard is None):
+                            self.temp_files.add(shard)
+                            for gdf in self._read_in_batches(shard, batch_size, job['geo_out']['driver']):
+                                yield gdf
+                            self.temp_files.read(shard)
+                            self.temp_files.remove(shard)
+                            shard_num += 1
+                        elif finished:
+                            break
+                        else:
+                            time.sleep(0.1)
+                finally:
+                    # closed early or failed: the pool would wait for dggrid to generate the whole grid otherwise
+                    closed.set()
+                    for process in processes:
+                        if process.poll() is None:
+                            process.kill()
+        finally:
+            self._remove_tmp_files(job)
 
 
+    @measured
     def grid_cellids_for_extent(self, dggs_type, resolution, mixed_aperture_level=None, clip_geom=None):
         """
         generates a DGGS grid and returns all the cellids as a pandas dataframe
             a) if clip_geom is empty/None: grid cell ids/seqnms for the WHOLE_EARTH
             b) if clip_geom is a shapely shape geometry, takes this as a clip area
         """
-        tmp_id = uuid.uuid4()
-        tmp_dir = self.working_dir
-        dggs = dgselect(dggs_type = dggs_type, res= resolution, mixed_aperture_level=mixed_aperture_level)
+        job = self._prepare_grid_gen(dggs_type, resolution, mixed_aperture_level, clip_geom=clip_geom, point_output=True)
 
-        subset_conf = { 'update_frequency': 100000, 'clip_subset_type': 'WHOLE_EARTH' }
+        with self._cleanup(job):
+            dggs_ops = self.dgapi_grid_gen(job['dggs'], job['subset_conf'], job['output_conf'] )
+
+            return self._collect_cellids(job)
+
+
+    @measured
+    def cells_for_geo_points(self, geodf_points_wgs84, cell_ids_only, dggs_type, resolution, mixed_aperture_level=None, chunk_size=None, n_workers=None, geo_format=None, engine='dggrid',
+                             stream=False):
+        """
+        takes a geodataframe with point geometry and optional additional value columns and returns:
+            a) if cell_ids_only == True: the same geodataframe with an additional column with the cell ids
+            b) if cell_ids_only == False: a new Geodataframe with geometry type Polygon, with column of cell ids and the additional columns
+
+        for very large point sets, chunk_size splits the points into chunks of that many points, which are transformed
+        as separate dggrid jobs on n_workers parallel workers (default max_concurrent or number of cpus). Only the point
+        coordinates of a chunk are written and read back at a time, the seqnums are returned in the original order.
+
+        stream=True transforms the points through named pipes instead of files: the points are split into n_workers parts,
+        each transformed by one dggrid run that reads the coordinates while they are written in chunks of chunk_size
+        (default 100000) points, and whose seqnums are parsed while it runs. Nothing is written to disk.
+
+        engine='native' computes the seqnums and the cell polygons in-process (dggrid4py.isea) instead of running dggrid,
+        for the predefined ISEA3H, ISEA4H, ISEA4T and ISEA4D grids.
+        """
+        if engine == 'native':
+            cell_id_list = self._native_seqnums(geodf_points_wgs84, dggs_type, resolution, mixed_aperture_level)
+            cols_ordered = self._point_columns(geodf_points_wgs84)
+        elif not engine == 'dggrid':
+            raise ValueError(f"unknown engine {engine}, use 'dggrid' or 'native'")
+        elif stream:
+            cell_id_list = self._cells_for_geo_points_chunked(geodf_points_wgs84, dggs_type, resolution, mixed_aperture_level, chunk_size, n_workers, stream=True)
+            cols_ordered = self._point_columns(geodf_points_wgs84)
+        elif chunk_size is None:
+            job = self._prepare_transform(geodf_points_wgs84, dggs_type, resolution, mixed_aperture_level)
+
+            with self._cleanup(job):
+                dggs_ops = self.dgapi_grid_transform(job['dggs'], job['subset_conf'], job['output_conf'])
+
+                cell_id_list = self._collect_transform(job)
+            cols_ordered = job['cols_ordered']
+        else:
+            cell_id_list = self._cells_for_geo_points_chunked(geodf_points_wgs84, dggs_type, resolution, mixed_aperture_level, chunk_size, n_workers)
+            cols_ordered = self._point_columns(geodf_points_wgs84)
+
+        if cell_ids_only == True:
+            geodf_points_wgs84['seqnums'] = cell_id_list
+            return geodf_points_wgs84
+        else:
+            # grid_gen from seqnums
+            gdf = self.grid_cell_polygons_from_cellids(cell_id_list=cell_id_list,
+                                                    dggs_type=dggs_type,
+                                                    resolution=resolution,
+                                                    mixed_aperture_level=mixed_aperture_level,
+                                                    geo_format=geo_format,
+                                                    engine=engine)
+            return self._add_point_columns(gdf, geodf_points_wgs84, cols_ordered)
+
+
+    @measured
+    def bin_point_values(self, geodf_points_wgs84, value_col, dggs_type, resolution, mixed_aperture_level=None, shard_size=1000000, max_workers=None,
+                         engine='dggrid', agg='mean', weight_col=None, lon_col='lon', lat_col='lat'):
+        """
+        bins the values of value_col of the points into the cells of the DGGS (BIN_POINT_VALS) and returns a pandas
+        DataFrame indexed by seqnum with the mean value and the count of the points of every occupied cell, points
+        without value are left out
+
+        inputs of more than shard_size points are split into shards of shard_size points, which are binned as separate
+        dggrid jobs on max_workers parallel workers (default max_concurrent or number of cpus). The partial means of the
+        shards are merged by their sums and counts
+
+        engine='native' (seqnums from dggrid4py.isea, for ISEA3H, ISEA4H, ISEA4T and ISEA4D) and engine='transform'
+        (seqnums from dggrid's TRANSFORM_POINTS) group the values with NumPy instead. They take any agg (see
+        dggrid4py.binning): 'count', 'sum', 'mean', 'min', 'max', 'weighted_mean' (weights in weight_col), 'median',
+        ('quantile', q), a function of the values of a cell, or a list of these for one column each. geodf_points_wgs84
+        can also be the path of a Parquet or CSV file with lon_col and lat_col columns, which is read and binned in
+        chunks of shard_size rows. Only a partial state per occupied cell is kept for the reducers in
+        binning.decomposable_aggs, the other ones keep the seqnum and value of every point
+        """
+        if engine in ['native', 'transform']:
+            return self._bin_values_numpy(geodf_points_wgs84, value_col, dggs_type, resolution, mixed_aperture_level, shard_size, max_workers,
+                                          engine, agg, weight_col, lon_col, lat_col)
+        elif not engine == 'dggrid':
+            raise ValueError(f"unknown engine {engine}, use 'dggrid', 'native' or 'transform'")
+
+        if not agg == 'mean' or not weight_col is None:
+            raise ValueError("BIN_POINT_VALS only computes the mean, use engine='native' or 'transform' for other aggs")
+        if not isinstance(geodf_points_wgs84, gpd.GeoDataFrame):
+            raise ValueError("engine='dggrid' bins a GeoDataFrame, use engine='native' or 'transform' for files")
+
+        geodf_points_wgs84 = geodf_points_wgs84.loc[geodf_points_wgs84[value_col].notna()]
+        lon = geodf_points_wgs84['geometry'].x.values
+        lat = geodf_points_wgs84['geometry'].y.values
+        values = geodf_points_wgs84[value_col].values
+
+        def bin_shard(start):
+            end = start + shard_size
+            job = self._bin_job('BIN_POINT_VALS', [ (lon[start:end], lat[start:end], values[start:end]) ], dggs_type, resolution, mixed_aperture_level)
+
+            with self._cleanup(job):
+                dggs_ops = self.dgapi_point_value_binning(job['dggs'], job['subset_conf'], job['output_conf'])
+
+                return self._collect_bin(job, read_bin_vals_file)
+
+        return self._merge_bin_values(self._map_shards(bin_shard, range(0, len(lon), shard_size), max_workers))
+
+
+    @measured
+    def bin_point_presence(self, geodf_points_wgs84, class_col, dggs_type, resolution, mixed_aperture_level=None, shard_size=1000000, max_workers=None,
+                           engine='dggrid', lon_col='lon', lat_col='lat'):
+        """
+        bins the presence of the classes of class_col (its unique values) into the cells of the DGGS (BIN_POINT_PRESENCE)
+        and returns a pandas DataFrame indexed by seqnum with a boolean column per class and the count of the classes
+        present in every occupied cell. The missing values are a class of their own, classes named 'seqnum' or 'count'
+        raise a ValueError
+
+        the points of every class are written as their own input file, large inputs are split into shards and binned on
+        parallel workers like in bin_point_values, the presence of the shards is merged with a logical or. engine
+        'native' and 'transform' and the Parquet or CSV files work like in bin_point_values, only the occupied
+        (cell, class) pairs are kept
+        """
+        if engine in ['native', 'transform']:
+            return self._bin_presence_numpy(geodf_points_wgs84, class_col, dggs_type, resolution, mixed_aperture_level, shard_size, max_workers,
+                                            engine, lon_col, lat_col)
+        elif not engine == 'dggrid':
+            raise ValueError(f"unknown engine {engine}, use 'dggrid', 'native' or 'transform'")
+
+        if not isinstance(geodf_points_wgs84, gpd.GeoDataFrame):
+            raise ValueError("engine='dggrid' bins a GeoDataFrame, use engine='native' or 'transform' for files")
+
+        classes, codes = presence_classes(geodf_points_wgs84[class_col].values)
+        lon = geodf_points_wgs84['geometry'].x.values
+        lat = geodf_points_wgs84['geometry'].y.values
+
+        def bin_shard(start):
+            end = start + shard_size
+            inputs = [ (lon[start:end][codes[start:end] == k], lat[start:end][codes[start:end] == k], None) for k in range(len(classes)) ]
+            job = self._bin_job('BIN_POINT_PRESENCE', inputs, dggs_type, resolution, mixed_aperture_level)
+
+            with self._cleanup(job):
+                dggs_ops = self.dgapi_pres_binning(job['dggs'], job['subset_conf'], job['output_conf'])
+
+                return self._collect_bin(job, lambda out_file: read_bin_presence_file(out_file, len(classes)))
+
+        return self._merge_bin_presence(self._map_shards(bin_shard, range(0, len(lon), shard_size), max_workers), classes)
+
+
+    @measured
+    def raster_to_cells(self, raster_path, dggs_type, resolution, mixed_aperture_level=None, agg='mean', band=1, block_size=1024, max_workers=None,
+                        engine='transform'):
+        """
+        samples the values of a raster band into the cells of the DGGS: every pixel centre is assigned to its cell and
+        the pixel values are aggregated per cell. Returns a pandas DataFrame indexed by seqnum with the value (a column
+        per agg for a list of aggs, like bin_point_values) and the count of the pixels, nodata pixels are left out
+
+        the raster is read with rasterio in windows of block_size x block_size pixels, which are processed on max_workers
+        parallel workers (default max_concurrent or number of cpus). engine='transform' gets the seqnums of a window
+        from one dggrid TRANSFORM_POINTS job and works for every grid (e.g. ISEA7H), engine='native' computes them
+        in-process for ISEA3H, ISEA4H, ISEA4T and ISEA4D. The partial aggregates of the windows are merged as they are
+        done, for the aggs in binning.decomposable_aggs only a partial state per cell is kept, the other aggs keep the
+        seqnum and value of every pixel
+        """
+        if not engine in ['native', 'transform']:
+            raise ValueError(f"unknown engine {engine}, use 'transform' or 'native'")
+
+        aggs = bin_aggs(agg)
+        if max_workers is None:
+            max_workers = self.max_concurrent if not self.max_concurrent is None else os.cpu_count()
+
+        def sample_window(window):
+            lon, lat, values = read_raster_window(raster_path, window, band)
+            seqnums = self._point_seqnums(pd.DataFrame({ 'lon': lon, 'lat': lat }), dggs_type, resolution, mixed_aperture_level, engine, max_workers=1)
+
+            if is_decomposable(aggs):
+                return bin_state(seqnums, values)
+            return seqnums, values.astype(np.float64)
+
+        bins = None
+        pixels = []
+        for window_bins in self._iter_bounded(sample_window, raster_windows(raster_path, block_size), max_workers):
+            if is_decomposable(aggs):
+                bins = merge_bin_states(bins, window_bins)
+            else:
+                pixels.append(window_bins)
+
+        if is_decomposable(aggs):
+            if bins is None:
+                bins = bin_state(np.zeros(0, dtype=np.int64), np.zeros(0))
+            return bin_values_frame(bins, aggs, single=not isinstance(agg, list))
+
+        seqnums = np.concatenate([ np.zeros(0, dtype=np.int64) ] + [ part[0] for part in pixels ])
+        values = np.concatenate([ np.zeros(0) ] + [ part[1] for part in pixels ])
+
+        return bin_values_frame(None, aggs, single=not isinstance(agg, list), points=(seqnums, values, None))
+
+
+    @measured
+    def polygons_to_cells(self, geodf_polygons_wgs84, dggs_type, resolution, mixed_aperture_level=None, mode='centroid', batch_size=1000, max_workers=None,
+                          geo_format=None):
+        """
+        assigns the polygons of a GeoDataFrame to the cells of the DGGS and returns a GeoDataFrame with one row per
+        (polygon, cell) pair, in the order of the polygons: the cell polygon, its seqnum and the attributes of the polygon
+            a) mode='centroid': the cells whose centroid lies in the polygon
+            b) mode='intersects': all cells intersecting the polygon
+            c) mode='fraction': all cells intersecting the polygon, with the fraction of the cell area covered by the
+               polygon (computed in lon lat, which is close enough for cells much smaller than the projection distortion)
+
+        the cells are generated by one clipped dggrid run per batch of batch_size polygons (sorted along a Hilbert curve,
+        so that a batch covers a compact area) on max_workers parallel workers, and matched to the polygons with a
+        shapely STRtree and vectorized intersections
+        """
+        if not mode in ['centroid', 'intersects', 'fraction']:
+            raise ValueError(f"mode must be 'centroid', 'intersects' or 'fraction', not {mode}")
+
+        polygons = geodf_polygons_wgs84.geometry.values
+        attributes = pd.DataFrame(geodf_polygons_wgs84.drop(columns=geodf_polygons_wgs84.geometry.name))
+        areas = shapely.area(polygons)
+
+        # batches of polygons close to each other, the polygons without area can't clip the grid
+        order = np.flatnonzero(areas > 0)
+        if len(order) > 1:
+            order = order[np.argsort(geodf_polygons_wgs84.geometry.iloc[order].hilbert_distance().values, kind='stable')]
+        clips = [ shapely.union_all(polygons[order[start:start + batch_size]]) for start in range(0, len(order), batch_size) ]
+
+        jobs = []
+        with self._cleanup(jobs):
+            for clip in clips:
+                jobs.append(self._prepare_grid_gen(dggs_type, resolution, mixed_aperture_level, clip_geom=clip, geo_format=geo_format))
+            results = self.run_many([ (job['dggs'], job['subset_conf'], job['output_conf']) for job in jobs ], max_workers=max_workers)
+
+            errors = [ result['error'] for result in results if not result['error'] is None ]
+            if len(errors) > 0:
+                raise errors[0]
+
+            if len(jobs) == 0:
+                cells = gpd.GeoDataFrame({ 'name': np.array([], dtype=np.int64) }, geometry=[], crs=from_epsg(4326))
+            else:
+                cells = pd.concat([ self._collect_cell_polygons(job) for job in jobs ], ignore_index=True)
+        name_col = 'name' if 'name' in cells.columns else 'Name'
+        cells = cells.drop_duplicates(subset=name_col).reset_index(drop=True)
+        cells[name_col] = cells[name_col].astype(np.int64)
+
+        poly_rows, cell_rows, fractions = self._match_polygons_to_cells(polygons, cells, name_col, mode)
+
+        gdf = attributes.iloc[poly_rows].reset_index(drop=True)
+        gdf.insert(0, name_col, cells[name_col].values[cell_rows])
+        if mode == 'fraction':
+            gdf['fraction'] = fractions
+
+        return gpd.GeoDataFrame(gdf, geometry=cells.geometry.values[cell_rows], crs=from_epsg(4326))
+
+
+    @measured
+    def cell_children(self, cell_id_list, dggs_type, resolution, mixed_aperture_level=None, engine='dggrid'):
+        """
+        the children of the cells at resolution + 1, as compressed rows (offsets, values) of int64 arrays: the children
+        of cell_id_list[k] are values[offsets[k]:offsets[k + 1]], cells out of range have no children
+            a) if cell_id_list is empty/None: the children of all cells of the resolution
+            b) if cell_id_list is a list/numpy array, the children of these seqnums
+
+        dggrid writes the children of all the cells in one grid generation, engine='native' computes them in-process
+        (dggrid4py.isea) for the predefined ISEA3H, ISEA4H, ISEA4T and ISEA4D grids
+        """
+        cell_id_list = self._relation_cellids(cell_id_list, dggs_type, resolution, mixed_aperture_level)
+
+        if engine == 'native':
+            return self._native_relation(isea.seqnum_children, cell_id_list, dggs_type, resolution, mixed_aperture_level)
+        elif not engine == 'dggrid':
+            raise ValueError(f"unknown engine {engine}, use 'dggrid' or 'native'")
+
+        return self._dggrid_relation('children', cell_id_list, dggs_type, resolution, mixed_aperture_level)
+
+
+    @measured
+    def cell_parents(self, cell_id_list, dggs_type, resolution, mixed_aperture_level=None, engine='dggrid'):
+        """
+        the parents of the cells at resolution - 1 in ascending order, as compressed rows (offsets, values) like
+        cell_children. The cells on the boundary of a hexagon cell of the coarser resolution have several parents
+
+        dggrid has no parent output: the parents are the cells of resolution - 1 whose children contain the cell. The
+        candidates, the cells containing the cell centers and their neighbours, are found with four dggrid runs for all
+        the cells. engine='native' computes the parents in-process (dggrid4py.isea)
+        """
+        if resolution < 1:
+            raise ValueError("the cells of resolution 0 have no parents")
+
+        cell_id_list = self._relation_cellids(cell_id_list, dggs_type, resolution, mixed_aperture_level)
+
+        if engine == 'native':
+            return self._native_relation(isea.seqnum_parents, cell_id_list, dggs_type, resolution, mixed_aperture_level)
+        elif not engine == 'dggrid':
+            raise ValueError(f"unknown engine {engine}, use 'dggrid' or 'native'")
+
+        # cell centers and the cells containing them at the coarser resolution
+        job = self._prepare_grid_gen(dggs_type, resolution, mixed_aperture_level, cell_id_list=cell_id_list, point_output=True)
+        with self._cleanup(job):
+            dggs_ops = self.dgapi_grid_gen(job['dggs'], job['subset_conf'], job['output_conf'])
+            centers = self._collect_cellids(job)
+
+        job = self._transform_job(centers[[1, 2]], dggs_type, resolution - 1, mixed_aperture_level)
+        with self._cleanup(job):
+            dggs_ops = self.dgapi_grid_transform(job['dggs'], job['subset_conf'], job['output_conf'])
+            primary = np.unique(self._collect_transform(job))
+
+        _, neighbours = self._dggrid_relation('neighbor', primary, dggs_type, resolution - 1, mixed_aperture_level)
+        candidates = np.union1d(primary, neighbours)
+
+        offsets, children = self._dggrid_relation('children', candidates, dggs_type, resolution - 1, mixed_aperture_level)
+
+        return csr_invert(offsets, children, candidates, cell_id_list)
+
+
+    @measured
+    def cell_neighbours(self, cell_id_list, dggs_type, resolution, mixed_aperture_level=None, engine='dggrid'):
+        """
+        the neighbours of the cells, the cells of the same resolution sharing an edge with them, in ascending order as
+        compressed rows (offsets, values) like cell_children
+
+        dggrid writes the neighbours of all the cells in one grid generation, engine='native' computes them in-process
+        (dggrid4py.isea) for the predefined ISEA3H, ISEA4H, ISEA4T and ISEA4D grids
+        """
+        cell_id_list = self._relation_cellids(cell_id_list, dggs_type, resolution, mixed_aperture_level)
+
+        if engine == 'native':
+            return self._native_relation(isea.seqnum_neighbours, cell_id_list, dggs_type, resolution, mixed_aperture_level)
+        elif not engine == 'dggrid':
+            raise ValueError(f"unknown engine {engine}, use 'dggrid' or 'native'")
+
+        return csr_sort_rows(*self._dggrid_relation('neighbor', cell_id_list, dggs_type, resolution, mixed_aperture_level))
+
+
+    @measured
+    def rollup(self, values_by_seqnum, dggs_type, from_res, to_res, agg='mean', mixed_aperture_level=None, engine='dggrid'):
+        """
+        aggregates the values of cells at from_res up the hierarchy to every coarser resolution down to to_res, for map
+        pyramids. values_by_seqnum is a pandas Series (or a dict) of the cell values indexed by seqnum, NaN values are
+        left out. Returns a dict of resolution -> pandas Series of the aggregated values indexed by seqnum
+
+        agg is 'sum', 'mean', 'count', 'min' or 'max'. Every cell counts for one parent, the lowest seqnum of its
+        cell_parents, so that the boundary cells of the hexagon grids aren't counted twice. The parents are looked up
+        once per resolution with cell_parents (engine 'dggrid' or 'native') and memoized in this process, every
+        resolution is aggregated from the partial aggregates of the next finer one
+        """
+        if to_res > from_res or to_res < 0:
+            raise ValueError(f"to_res must be between 0 and from_res {from_res}, not {to_res}")
+
+        values = pd.Series(values_by_seqnum).dropna()
+        seqnums = values.index.values.astype(np.int64)
+        state = rollup_state(values.values, agg)
+
+        levels = {}
+        for resolution in range(from_res, to_res, -1):
+            parents = self._rollup_parents(seqnums, dggs_type, resolution, mixed_aperture_level, engine)
+            seqnums, state = rollup_step(parents, state)
+            levels[resolution - 1] = pd.Series(rollup_values(state, agg), index=pd.Index(seqnums, name='seqnum'))
+
+        return levels
+
+
+    def _native_seqnums(self, geodf_points_wgs84, dggs_type, resolution, mixed_aperture_level=None):
+        """
+        the seqnums of the points from the in-process ISEA quantization, without a dggrid run
+        """
+        if not mixed_aperture_level is None:
+            raise ValueError("the native engine does not support mixed aperture grids, use engine='dggrid'")
+        isea.check_native_dggs_type(dggs_type)
+
+        geodf_points_wgs84['lon'] = geodf_points_wgs84['geometry'].x
+        geodf_points_wgs84['lat'] = geodf_points_wgs84['geometry'].y
+
+        return isea.geo_to_seqnum(geodf_points_wgs84['lon'].values, geodf_points_wgs84['lat'].values, dggs_type, resolution)
+
+
+    def _native_cell_polygons(self, cell_id_list, dggs_type, resolution, mixed_aperture_level=None, densify=1.0):
+        """
+        the cell polygons of the seqnums from the in-process ISEA inverse, in the order of cell_id_list, with the edges
+        densified into segments of at most densify degrees
+        """
+        if not mixed_aperture_level is None:
+            raise ValueError("the native engine does not support mixed aperture grids, use engine='dggrid'")
+        isea.check_native_dggs_type(dggs_type)
+
+        num_cells = isea.grid_params(dggs_type, resolution)['num_cells']
+        if cell_id_list is None or len(cell_id_list) == 0:
+            seqnums = np.arange(1, num_cells + 1, dtype=np.int64)
+        else:
+            # seqnums out of range are dropped like in the dggrid path
+            seqnums = np.asarray(cell_id_list, dtype=np.int64)
+            seqnums = seqnums[(seqnums >= 1) & (seqnums <= num_cells)]
+
+        densification = isea.edge_densification(dggs_type, resolution, densify)
+        return gpd.GeoDataFrame({ 'name': seqnums, 'geometry': isea.seqnum_to_polygons(seqnums, dggs_type, resolution, densification) },
+                                geometry='geometry', crs=from_epsg(4326))
+
+
+    def _rollup_parents(self, seqnums, dggs_type, resolution, mixed_aperture_level=None, engine='dggrid'):
+        """
+        the roll-up parent of every seqnum, the parents that aren't memoized yet are looked up with one cell_parents call
+        """
+        # the seqnums of the coarser resolutions are the unique and sorted parents of rollup_step already
+        if (np.diff(seqnums) > 0).all():
+            unique_seqnums, inverse = seqnums, None
+        else:
+            unique_seqnums, inverse = np.unique(seqnums, return_inverse=True)
+        parents = lookup_rollup_parents(unique_seqnums, dggs_type, resolution, mixed_aperture_level)
+
+        missing = unique_seqnums[parents == 0]
+        if len(missing) > 0:
+            offsets, values = self.cell_parents(missing, dggs_type, resolution, mixed_aperture_level, engine=engine)
+            if (np.diff(offsets) == 0).any():
+                raise ValueError(f"seqnums without parents, check that they are {dggs_type} resolution {resolution} seqnums")
+
+            store_rollup_parents(missing, values[offsets[:-1]], dggs_type, resolution, mixed_aperture_level)
+            parents[parents == 0] = values[offsets[:-1]]
+
+        return parents if inverse is None else parents[inverse]
+
+
+    def _bin_values_numpy(self, points, value_col, dggs_type, resolution, mixed_aperture_level, chunk_size, max_workers, engine, agg, weight_col, lon_col, lat_col):
+        """
+        bins the values chunk by chunk with NumPy, see bin_point_values
+        """
+        aggs = bin_aggs(agg)
+        columns = [ value_col ] if weight_col is None else [ value_col, weight_col ]
+
+        bins = None
+        points_so_far = []
+        for chunk in self._point_chunks(points, columns, lon_col, lat_col, chunk_size):
+            chunk = chunk.loc[chunk[value_col].notna()]
+            seqnums = self._point_seqnums(chunk, dggs_type, resolution, mixed_aperture_level, engine, max_workers)
+            weights = None if weight_col is None else chunk[weight_col].values
+
+            if is_decomposable(aggs):
+                bins = merge_bin_states(bins, bin_state(seqnums, chunk[value_col].values, weights))
+            else:
+                points_so_far.append((seqnums, chunk[value_col].values.astype(np.float64), weights))
+
+        if is_decomposable(aggs):
+            if bins is None:
+                bins = bin_state(np.zeros(0, dtype=np.int64), np.zeros(0), None if weight_col is None else np.zeros(0))
+            return bin_values_frame(bins, aggs, single=not isinstance(agg, list))
+
+        seqnums = np.concatenate([ np.zeros(0, dtype=np.int64) ] + [ part[0] for part in points_so_far ])
+        values = np.concatenate([ np.zeros(0) ] + [ part[1] for part in points_so_far ])
+        weights = None if weight_col is None else np.concatenate([ np.zeros(0) ] + [ part[2] for part in points_so_far ])
+
+        return bin_values_frame(None, aggs, single=not isinstance(agg, list), points=(seqnums, values, weights))
+
+
+    def _bin_presence_numpy(self, points, class_col, dggs_type, resolution, mixed_aperture_level, chunk_size, max_workers, engine, lon_col, lat_col):
+        """
+        bins the presence of the classes chunk by chunk with NumPy, see bin_point_presence
+        """
+        # an Index matches the classes of the chunks also for NaN
+        known = pd.Index([], dtype=object)
+        pairs = None
+        for chunk in self._point_chunks(points, [ class_col ], lon_col, lat_col, chunk_size):
+            seqnums = self._point_seqnums(chunk, dggs_type, resolution, mixed_aperture_level, engine, max_workers)
+
+            # the classes get their codes in the order they show up, sorted at the end
+            chunk_classes, chunk_codes = presence_classes(chunk[class_col].values)
+            known = known.append(pd.Index(chunk_classes[known.get_indexer(chunk_classes) < 0], dtype=object))
+            codes = known.get_indexer(chunk_classes)[chunk_codes]
+
+            pairs = presence_pairs(seqnums, codes, pairs)
+
+        if pairs is None:
+            pairs = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+
+        classes, positions = presence_classes(known.values)
+        seqnums, presence = presence_from_pairs(pairs, len(classes))
+
+        return self._merge_bin_presence([ (seqnums, presence[:, np.argsort(positions)]) ], classes)
+
+
+    def _point_chunks(self, points, columns, lon_col, lat_col, chunk_size):
+        """
+        yields DataFrames of at most chunk_size points with lon, lat and the columns, from a GeoDataFrame or from the
+        lon_col and lat_col columns of a Parquet or CSV file
+        """
+        if isinstance(points, gpd.GeoDataFrame):
+            for start in range(0, len(points), chunk_size):
+                chunk = points.iloc[start:start + chunk_size]
+                df = pd.DataFrame({ 'lon': chunk['geometry'].x.values, 'lat': chunk['geometry'].y.values })
+                for col in columns:
+                    df[col] = chunk[col].values
+                yield df
+        else:
+            for chunk in iter_table_chunks(points, [ lon_col, lat_col ] + columns, chunk_size):
+                yield chunk.rename(columns={ lon_col: 'lon', lat_col: 'lat' })
+
+
+    def _point_seqnums(self, points_df, dggs_type, resolution, mixed_aperture_level, engine, max_workers=None):
+        """
+        the seqnums of the lon lat points of points_df, in-process (engine='native') or with dggrid's TRANSFORM_POINTS
+        on max_workers parallel workers (engine='transform')
+        """
+        if engine == 'native':
+            if not mixed_aperture_level is None:
+                raise ValueError("the native engine does not support mixed aperture grids, use engine='transform'")
+            return isea.geo_to_seqnum(points_df['lon'].values, points_df['lat'].values, dggs_type, resolution)
+
+        if max_workers is None:
+            max_workers = self.max_concurrent if not self.max_concurrent is None else os.cpu_count()
+
+        if len(points_df) == 0:
+            return np.zeros(0, dtype=np.int64)
+
+        chunk_size = -(-len(points_df) // max_workers)
+        return self._transform_points_chunked(points_df[['lon', 'lat']], dggs_type, resolution, mixed_aperture_level, chunk_size, max_workers)
+
+
+    def _map_shards(self, bin_shard, starts, max_workers=None):
+        """
+        runs bin_shard for every shard start on max_workers parallel workers, returns the results in shard order
+        """
+        if max_workers is None:
+            max_workers = self.max_concurrent if not self.max_concurrent is None else os.cpu_count()
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            # consuming the results re-raises the first failed shard
+            return list(pool.map(bind_context(bin_shard), starts))
+
+
+    def _iter_bounded(self, work, items, max_workers):
+        """
+        runs work for the items on max_workers parallel workers and yields the results as they are done, with at most
+        twice max_workers items in flight, so that the results don't pile up
+        """
+        items = iter(items)
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            running = set()
+            for item in items:
+                running.add(pool.submit(bind_context(work), item))
+                if len(running) >= 2 * max_workers:
+                    done, running = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+
+            for future in as_completed(running):
+                yield future.result()
+
+
+    def _merge_bin_values(self, shards):
+        """
+        merges the (seqnums, counts, means) of the binned shards into the mean value and count of every cell
+        """
+        seqnums = np.concatenate([ np.zeros(0, dtype=np.int64) ] + [ shard[0] for shard in shards ])
+        counts = np.concatenate([ np.zeros(0, dtype=np.int64) ] + [ shard[1] for shard in shards ])
+        means = np.concatenate([ np.zeros(0, dtype=np.float64) ] + [ shard[2] for shard in shards ])
+
+        df = pd.DataFrame({ 'seqnum': seqnums, 'sum': means * counts, 'count': counts }).groupby('seqnum').sum()
+        df['value'] = df['sum'] / df['count']
+
+        return df[['value', 'count']]
+
+
+    def _merge_bin_presence(self, shards, classes):
+        """
+        merges the (seqnums, presence) of the binned shards into the presence of the classes in every cell
+        """
+        seqnums = np.concatenate([ np.zeros(0, dtype=np.int64) ] + [ shard[0] for shard in shards ])
+        presence = np.concatenate([ np.zeros((0, len(classes)), dtype=bool) ] + [ shard[1] for shard in shards ])
+
+        # grouped by an index, so that no class column is replaced by the seqnums
+        df = pd.DataFrame(presence, columns=pd.Index(classes)).groupby(pd.Index(seqnums, name='seqnum')).any()
+        df['count'] = df.sum(axis=1)
+
+        return df
+
+
+    def _match_polygons_to_cells(self, polygons, cells, name_col, mode):
+        """
+        the (polygon, cell) pairs of polygons_to_cells as polygon rows and cell rows of cells, sorted by polygon and seqnum,
+        and for mode 'fraction' the fractions of the cell areas covered by the polygons. The cells crossing the 180º
+        meridian are matched by their eastern and western parts
+        """
+        if mode == 'centroid':
+            # the centroid of the whole cell, the crossing cells are moved east of 180º for it
+            centroids = shapely.centroid(shift_cells(cells).geometry.values)
+            centroids = shapely.transform(centroids, lambda coords: np.where(coords > 180, coords - 360, coords))
+
+            poly_rows, cell_rows = shapely.STRtree(centroids).query(polygons, predicate='intersects')
+            order = np.lexsort((cells[name_col].values[cell_rows], poly_rows))
+
+            return poly_rows[order], cell_rows[order], None
+
+        parts = interrupt_cells(gpd.GeoDataFrame({ 'row': np.arange(len(cells)) }, geometry=cells.geometry.values, crs=cells.crs))
+        part_rows = parts['row'].values
+
+        poly_rows, part_index = shapely.STRtree(parts.geometry.values).query(polygons, predicate='intersects')
+        cell_rows = part_rows[part_index]
+
+        # the pairs of the parts of a cell become one pair, with the summed up covered area
+        pairs, inverse = np.unique(np.column_stack([poly_rows, cells[name_col].values[cell_rows], cell_rows]), axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+
+        fractions = None
+        if mode == 'fraction':
+            covered = np.bincount(inverse, weights=shapely.area(shapely.intersection(parts.geometry.values[part_index], polygons[poly_rows])), minlength=len(pairs))
+            cell_areas = np.bincount(part_rows, weights=shapely.area(parts.geometry.values), minlength=len(cells))
+            fractions = np.minimum(covered / cell_areas[pairs[:, 2]], 1.0)
+
+        return pairs[:, 0], pairs[:, 2], fractions
+
+
+    def _relation_cellids(self, cell_id_list, dggs_type, resolution, mixed_aperture_level=None):
+        """
+        the seqnums of cell_id_list as int64 numpy array, all seqnums of the resolution if it is empty/None
+        """
+        if cell_id_list is None or len(cell_id_list) == 0:
+            stats = self.grid_stats_table(dggs_type, resolution, mixed_aperture_level)
+            num_cells = stats.loc[stats['Resolution'] == resolution, 'Cells'].values[0]
+            return np.arange(1, num_cells + 1, dtype=np.int64)
+
+        return np.asarray(cell_id_list, dtype=np.int64)
+
+
+    def _native_relation(self, relation, cell_id_list, dggs_type, resolution, mixed_aperture_level=None):
+        """
+        the related cells (isea.seqnum_children, seqnum_parents or seqnum_neighbours) of the seqnums, with no related
+        cells for the seqnums out of range like in the dggrid path
+        """
+        if not mixed_aperture_level is None:
+            raise ValueError("the native engine does not support mixed aperture grids, use engine='dggrid'")
+        isea.check_native_dggs_type(dggs_type)
+
+        num_cells = isea.grid_params(dggs_type, resolution)['num_cells']
+        in_range = (cell_id_list >= 1) & (cell_id_list <= num_cells)
+
+        offsets, values = relation(cell_id_list[in_range], dggs_type, resolution)
+
+        # an extra empty row for the seqnums out of range
+        rows = np.full(len(cell_id_list), len(offsets) - 1, dtype=np.int64)
+        rows[in_range] = np.arange(len(offsets) - 1)
+
+        return csr_take(np.append(offsets, offsets[-1]), values, rows)
+
+
+    def _dggrid_relation(self, kind, cell_id_list, dggs_type, resolution, mixed_aperture_level=None):
+        """
+        the children or neighbours of the seqnums from one dggrid grid generation, as compressed rows in the order of
+        cell_id_list
+        """
+        job = self._prepare_relation(kind, cell_id_list, dggs_type, resolution, mixed_aperture_level)
 
-        if not clip_geom is None and clip_geom.area > 0:
+        with self._cleanup(job):
+            dggs_ops = self.dgapi_grid_gen(job['dggs'], job['subset_conf'], job['output_conf'])
 
-            clip_gdf = gpd.GeoDataFrame(pd.DataFrame({'id' : [1], 'geometry': [clip_geom]}), geometry='geometry', crs=from_epsg(4326))
-            clip_gdf.to_file(Path(tmp_dir) / f"temp_clip_{tmp_id}.{self.tmp_geo_out['ext']}", driver=self.tmp_geo_out['driver'] )
+            return self._collect_relation(job)
 
-            subset_conf.update({
-                'clip_subset_type': 'GDAL',
-                'clip_region_files': str( (Path(tmp_dir) / f"temp_clip_{tmp_id}.{self.tmp_geo_out['ext']}").resolve()),
-                })
+
+    def _prepare_relation(self, kind, cell_id_list, dggs_type, resolution, mixed_aperture_level=None):
+        """
+        the job of a grid generation of the seqnums with the children or neighbor TEXT output of dggrid and no cell output
+        """
+        job = self._prepare_grid_gen(dggs_type, resolution, mixed_aperture_level, cell_id_list=cell_id_list)
+
+        out_file = str( (Path(self.working_dir) / f"temp_{dggs_type}_{resolution}_{kind}_{uuid.uuid4()}").resolve())
+        job['output_conf'] = {
+            'cell_output_type': 'NONE',
+            f"{kind}_output_type": 'TEXT',
+            f"{kind}_output_file_name": out_file
+            }
+        job['out_file'] = out_file
+        job['cell_id_list'] = cell_id_list
+        # the output file gets its extension from dggrid
+        job['tmp_globs'] = [ f"{out_file}.*" ]
+
+        return job
+
+
+    def _collect_relation(self, job):
+        """
+        reads the children or neighbours of a finished relation job, dggrid adds the extension to the output file name
+        """
+        try:
+            out_file = find_output_file(job['out_file'])
+            self.temp_files.read(out_file)
+
+            return read_relation_file(out_file, job['cell_id_list'])
+        finally:
+            self._remove_tmp_files(job)
+
+
+    def _cells_for_geo_points_chunked(self, geodf_points_wgs84, dggs_type, resolution, mixed_aperture_level, chunk_size, n_workers=None, stream=False):
+        """
+        transforms the points chunk by chunk on parallel workers, through files or streamed through named pipes, and
+        returns the seqnums in the order of the points
+        """
+        if n_workers is None:
+            n_workers = self.max_concurrent if not self.max_concurrent is None else os.cpu_count()
+
+        geodf_points_wgs84['lon'] = geodf_points_wgs84['geometry'].x
+        geodf_points_wgs84['lat'] = geodf_points_wgs84['geometry'].y
+
+        if stream:
+            return self._transform_points_streamed(geodf_points_wgs84[['lon', 'lat']], dggs_type, resolution, mixed_aperture_level,
+                                                   100000 if chunk_size is None else chunk_size, n_workers)
+
+        return self._transform_points_chunked(geodf_points_wgs84[['lon', 'lat']], dggs_type, resolution, mixed_aperture_level, chunk_size, n_workers)
+
+
+    def _transform_points_chunked(self, points_df, dggs_type, resolution, mixed_aperture_level, chunk_size, n_workers):
+        """
+        the seqnums of the lon lat points of points_df, transformed chunk by chunk on n_workers parallel workers
+        """
+        cell_id_list = np.zeros(len(points_df), dtype=np.int64)
+
+        def transform_chunk(start):
+            job = self._transform_job(points_df.iloc[start:start + chunk_size], dggs_type, resolution, mixed_aperture_level)
+
+            with self._cleanup(job):
+                dggs_ops = self.dgapi_grid_transform(job['dggs'], job['subset_conf'], job['output_conf'])
+
+                cell_id_list[start:start + chunk_size] = self._collect_transform(job)
+
+        with ThreadPoolExecutor(max_workers=n_workers) as pool:
+            # consuming the results re-raises the first failed chunk
+            for _ in pool.map(bind_context(transform_chunk), range(0, len(points_df), chunk_size)):
+                pass
+
+        return cell_id_list
+
+
+    def _transform_points_streamed(self, points_df, dggs_type, resolution, mixed_aperture_level, chunk_size, n_workers):
+        """
+        the seqnums of the lon lat points of points_df, streamed through named pipes: the points are split into n_workers
+        contiguous parts, each transformed by one dggrid run (see _stream_transform)
+        """
+        if not hasattr(os, 'mkfifo'):
+            raise ValueError("streaming the points needs named pipes, which this platform doesn't have")
+
+        cell_id_list = np.zeros(len(points_df), dtype=np.int64)
+        bounds = np.linspace(0, len(points_df), max(min(n_workers, len(points_df)), 1) + 1).astype(np.int64)
+
+        def transform_part(k):
+            self._stream_transform(points_df.iloc[bounds[k]:bounds[k + 1]], cell_id_list[bounds[k]:bounds[k + 1]], dggs_type, resolution,
+                                   mixed_aperture_level, chunk_size)
+
+        with ThreadPoolExecutor(max_workers=len(bounds) - 1) as pool:
+            # consuming the results re-raises the first failed part
+            for _ in pool.map(bind_context(transform_part), range(len(bounds) - 1)):
+                pass
+
+        return cell_id_list
+
+
+    def _stream_transform(self, points_df, out, dggs_type, resolution, mixed_aperture_level, chunk_size):
+        """
+        transforms the lon lat points of points_df with one dggrid run and writes their seqnums into the array out. dggrid
+        reads the coordinates from an input pipe that they are written into chunk by chunk of chunk_size points while it
+        runs, and writes the seqnums into an output pipe that they are parsed from while it runs, so the points are never
+        written to a file and preparing the input, transforming and reading the output overlap
+        """
+        tmp_id = uuid.uuid4()
+        in_pipe = str( (Path(self.working_dir) / f"geo_{tmp_id}.pipe").resolve())
+        out_pipe = str( (Path(self.working_dir) / f"seqnums_{tmp_id}.pipe").resolve())
+        dggs = dgselect(dggs_type = dggs_type, res= resolution, mixed_aperture_level=mixed_aperture_level)
+
+        subset_conf = {
+            'input_file_name': in_pipe,
+            'input_address_type': 'GEO',
+            'input_delimiter': "\" \""
+            }
 
         output_conf = {
-            'point_output_type': 'TEXT',
-            'point_output_file_name': str( (Path(tmp_dir) / f"temp_{dggs_type}_{resolution}_out_{tmp_id}").resolve())
+            'output_file_name': out_pipe,
+            'output_address_type': 'SEQNUM',
+            'output_delimiter': "\",\""
             }
 
-        dggs_ops = self.dgapi_grid_gen(dggs, subset_conf, output_conf )
+        def blocks():
+            for start in range(0, len(points_df), chunk_size):
+                block = points_df.iloc[start:start + chunk_size].to_csv(header=False, index=False, sep=' ').encode('ascii')
+                self.temp_files.written(size=len(block))
+                yield block
+
+        # the seqnums of the complete lines received so far, a line can be split between two blocks
+        parsed = { 'count': 0, 'rest': b'' }
+
+        def consume(block):
+            self.temp_files.read(size=len(block))
+            block = parsed['rest'] + block
+            end = block.rfind(b'\n') + 1
+            parsed['rest'] = block[end:]
 
-        df = pd.read_csv( Path(tmp_dir) / f"temp_{dggs_type}_{resolution}_out_{tmp_id}.txt" , header=None)
-        df = df.dropna()
+            seqnums = np.array(block[:end].split(), dtype=np.int64)
+            if parsed['count'] + len(seqnums) > len(out):
+                raise ValueError(f"dggrid returned more seqnums than the {len(out)} points")
+            out[parsed['count']:parsed['count'] + len(seqnums)] = seqnums
+            parsed['count'] += len(seqnums)
 
         try:
-            os.remove( str( Path(tmp_dir) / f"temp_{dggs_type}_{resolution}_out_{tmp_id}.txt") )
-            os.remove( str( Path(tmp_dir) / f"temp_clip_{tmp_id}.{self.tmp_geo_out['ext']}") )
-        except Exception:
-            pass
+            os.mkfifo(in_pipe)
+            self.temp_files.add(in_pipe)
+            os.mkfifo(out_pipe)
+            self.temp_files.add(out_pipe)
+
+            metafile = dg_points_meta('TRANSFORM_POINTS', dggs, subset_conf, output_conf)
+            with drain_fifo(out_pipe, consume), feed_fifo(in_pipe, blocks()):
+                result = self.run(metafile)
+
+            if not result == 0:
+                raise ValueError(dg_run_error_message(result, self.capture_logs, self.last_run_logs))
+        finally:
+            self.temp_files.remove(in_pipe, out_pipe)
+
+        if len(parsed['rest'].strip()) > 0:
+            consume(b'\n')
+
+        if not parsed['count'] == len(out):
+            raise ValueError(f"dggrid returned {parsed['count']} seqnums for {len(out)} points")
+
+
+    """
+    #################################################################################
+    # Higher level API building blocks: preparing dggrid inputs and collecting outputs
+    #################################################################################
+    """
+    def _stats_table_frame(self, dggs_ops):
+        df = pd.DataFrame(dggs_ops['output_conf']['stats_output'])
+        # dggrid 6 prints the intercell spacing before the CLS
+        if df.shape[1] == 5:
+            df = df[[0, 1, 2, 4]].set_axis([0, 1, 2, 3], axis=1)
 
+        df.rename(columns={0: 'Resolution', 1: "Cells", 2:"Area (km^2)", 3: "CLS (km)"}, inplace=True)
+        df['Resolution'] = df['Resolution'].astype(int)
+        df['Cells'] = df['Cells'].astype(np.int64)
         return df
 
 
-    def cells_for_geo_points(self, geodf_points_wgs84, cell_ids_only, dggs_type, resolution, mixed_aperture_level=None):
+    def _prepare_grid_gen(self, dggs_type, resolution, mixed_aperture_level=None, clip_geom=None, cell_id_list=None, point_output=False, geo_format=None):
         """
-        takes a geodataframe with point geometry and optional additional value columns and returns:
-            a) if cell_ids_only == True: the same geodataframe with an additional column with the cell ids
-            b) if cell_ids_only == False: a new Geodataframe with geometry type Polygon, with column of cell ids and the additional columns
+        writes the clip files of a grid generation into the working_dir and returns the job for dgapi_grid_gen:
+            the dggs, subset_conf and output_conf, the output file to read from and the temporary files to remove afterwards
         """
         tmp_id = uuid.uuid4()
         tmp_dir = self.working_dir
+        geo_out = self.tmp_geo_out if geo_format is None else geo_interchange_format(geo_format)
         dggs = dgselect(dggs_type = dggs_type, res= resolution, mixed_aperture_level=mixed_aperture_level)
 
-        cols = set(geodf_points_wgs84.columns.tolist())
-        cols = cols - set('geometry')
+        subset_conf = { 'update_frequency': 100000, 'clip_subset_type': 'WHOLE_EARTH' }
+        tmp_files = []
+        seq_df = None
+
+        try:
+            if not clip_geom is None and clip_geom.area > 0:
+
+                clip_gdf = gpd.GeoDataFrame(pd.DataFrame({'id' : [1], 'geometry': [clip_geom]}), geometry='geometry', crs=from_epsg(4326))
+                tmp_files.append( Path(tmp_dir) / f"temp_clip_{tmp_id}.{geo_out['ext']}" )
+                clip_gdf.to_file(Path(tmp_dir) / f"temp_clip_{tmp_id}.{geo_out['ext']}", driver=geo_out['driver'] )
+                self.temp_files.add(tmp_files[-1])
+                self.temp_files.written(tmp_files[-1])
+
+                subset_conf.update({
+                    'clip_subset_type': 'GDAL',
+                    'clip_region_files': str( (Path(tmp_dir) / f"temp_clip_{tmp_id}.{geo_out['ext']}").resolve()),
+                    })
+
+            if not cell_id_list is None and len(cell_id_list) > 0:
+
+                seq_df = pd.DataFrame({ 'seqs': cell_id_list})
+                tmp_files.append( Path(tmp_dir) / f"temp_clip_{tmp_id}.txt" )
+                seq_df.to_csv( str( (Path(tmp_dir) / f"temp_clip_{tmp_id}.txt").resolve()) , header=False, index=False, columns=['seqs'], sep=' ')
+                self.temp_files.add(tmp_files[-1])
+                self.temp_files.written(tmp_files[-1])
+
+                subset_conf.update({
+                    'clip_subset_type': 'SEQNUMS',
+                    'clip_region_files': str( (Path(tmp_dir) / f"temp_clip_{tmp_id}.txt").resolve()),
+                    })
+        except Exception:
+            # the files written so far
+            self.temp_files.remove(*tmp_files)
+            raise
+
+        if point_output == True:
+            output_conf = {
+                'point_output_type': 'TEXT',
+                'point_output_file_name': str( (Path(tmp_dir) / f"temp_{dggs_type}_{resolution}_out_{tmp_id}").resolve())
+                }
+            out_file = Path(tmp_dir) / f"temp_{dggs_type}_{resolution}_out_{tmp_id}.txt"
+        else:
+            output_conf = {
+                'cell_output_type': 'GDAL',
+                'cell_output_gdal_format' : geo_out['driver'],
+                'cell_output_file_name': str( (Path(tmp_dir) / f"temp_{dggs_type}_{resolution}_out_{tmp_id}.{geo_out['ext']}").resolve())
+                }
+            out_file = Path(tmp_dir) / f"temp_{dggs_type}_{resolution}_out_{tmp_id}.{geo_out['ext']}"
+
+        # dggrid's output is counted when it is read or removed, iter_grid_cell_polygons e.g. never creates it
+        tmp_files.append(out_file)
+
+        return { 'dggs': dggs, 'subset_conf': subset_conf, 'output_conf': output_conf, 'out_file': out_file, 'tmp_files': tmp_files, 'seq_df': seq_df, 'geo_out': geo_out }
+
+
+    def _collect_cell_polygons(self, job):
+        """
+        reads the cell polygons of a finished grid generation job, subsets them to the requested seqnums if any, in the
+        order they were requested
+        """
+        gdf = read_geo_file( job['out_file'], job['geo_out']['driver'] )
+        self.temp_files.read(job['out_file'])
+        seq_df = job['seq_df']
+
+        if not seq_df is None:
+            # we have to adjust the columns formats for the IDs/Seqnums/Name field to ensure they are comparable
+            # as they are all cell IDs they should all be long integers
+            name_col = 'name' if 'name' in gdf.columns else 'Name'
+            gdf[name_col] = gdf[name_col].astype(np.int64)
+            gdf = self._cells_in_request_order(gdf, name_col, seq_df['seqs'].values)
+
+        self._remove_tmp_files(job)
+
+        return gdf
+
+
+    def _cells_in_request_order(self, gdf, name_col, cell_id_list):
+        """
+        the cells of gdf in the order of cell_id_list, a cell requested several times is repeated and the seqnums
+        without a cell (e.g. out of range) are dropped
+        """
+        gdf = gdf.loc[~gdf[name_col].duplicated().values]
+        rows = pd.Index(gdf[name_col].values).get_indexer(np.asarray(cell_id_list, dtype=np.int64))
+
+        return gdf.take(rows[rows >= 0]).reset_index(drop=True)
+
+
+    def _cached_cell_lookup(self, cell_id_list, dggs_type, resolution, mixed_aperture_level=None):
+        """
+        returns the cached cell geometries (seqnum -> geometry) and the unique seqnums that still have to be generated
+        """
+        cached = self.cell_cache.get(cell_id_list, dggs_type, resolution, mixed_aperture_level)
+        seqnums = np.unique(np.asarray(cell_id_list, dtype=np.int64))
+        missing = seqnums[~np.isin(seqnums, np.fromiter(cached.keys(), dtype=np.int64, count=len(cached)))]
+
+        return cached, missing
+
+
+    def _merge_cached_cells(self, cell_id_list, cached, fresh, dggs_type, resolution, mixed_aperture_level=None):
+        """
+        stores the freshly generated cells in the cell_cache and returns all cells in the order of cell_id_list, with
+        the columns of the uncached path (see _collect_cell_polygons)
+        """
+        name_col = 'name'
+        seqnums = np.fromiter(cached.keys(), dtype=np.int64, count=len(cached))
+        geometries = list(cached.values())
+
+        if not fresh is None and len(fresh) > 0:
+            name_col = 'name' if 'name' in fresh.columns else 'Name'
+            fresh_seqnums = fresh[name_col].astype(np.int64).values
+            self.cell_cache.put(fresh_seqnums, fresh.geometry.values, dggs_type, resolution, mixed_aperture_level)
+            seqnums = np.concatenate([seqnums, fresh_seqnums])
+            geometries = geometries + list(fresh.geometry.values)
+
+        cells = gpd.GeoDataFrame({ name_col: seqnums, 'geometry': geometries }, geometry='geometry', crs=from_epsg(4326))
+
+        # seqnums that dggrid didn't return (e.g. out of range) are dropped like in the uncached path
+        return self._cells_in_request_order(cells, name_col, cell_id_list)
+
+
+    def _fix_antimeridian(self, gdf, antimeridian=None, native=False):
+        """
+        splits, shifts or flags the cells crossing the 180º meridian, only these cells are touched. The cells of the
+        native engine running along a pole (native=True) are drawn differently from dggrid's, see isea.pole_cells
+        """
+        if antimeridian is None:
+            return gdf
+
+        crosses = crosses_interruption(gdf.geometry.values)
+        if native == True:
+            along_pole, pole_crosses = isea.pole_cells(gdf.geometry.values)
+            crosses = np.where(along_pole, pole_crosses, crosses)
+
+        if antimeridian == 'split':
+            return interrupt_cells(gdf, crosses)
+        elif antimeridian == 'shift':
+            return shift_cells(gdf, crosses)
+        elif antimeridian == 'flag':
+            gdf['crosses_antimeridian'] = crosses
+            return gdf
+        else:
+            raise ValueError(f"antimeridian must be 'split', 'shift', 'flag' or None, not {antimeridian}")
+
+
+    def _find_output_shard(self, out_base, shard_num):
+        shards = list(out_base.parent.glob(f"{out_base.name}_{shard_num}")) + list(out_base.parent.glob(f"{out_base.name}_{shard_num}.*"))
+        if len(shards) > 0:
+            return shards[0]
+        return None
+
+
+    def _read_in_batches(self, out_file, batch_size, driver=None):
+        """
+        reads the cells of an output file feature by feature and returns them in Geodataframes of batch_size cells
+        """
+        if driver is None:
+            driver = self.tmp_geo_out['driver']
+
+        with fiona.open(out_file, driver=driver) as src:
+            crs = src.crs
+            # same column order as gpd.read_file, the attributes first and the geometry last
+            columns = list(src.schema['properties'].keys()) + ['geometry']
+            features = []
+            for feature in src:
+                features.append(feature)
+                if len(features) >= batch_size:
+                    yield gpd.GeoDataFrame.from_features(features, crs=crs, columns=columns)
+                    features = []
+
+            if len(features) > 0:
+                yield gpd.GeoDataFrame.from_features(features, crs=crs, columns=columns)
+
+
+    def _collect_cellids(self, job):
+        """
+        reads the cell ids of a finished grid generation job with point output
+        """
+        df = read_id_file( job['out_file'], ids_only=False )
+        self.temp_files.read(job['out_file'])
+
+        self._remove_tmp_files(job)
+
+        return df
+
+
+    def _prepare_transform(self, geodf_points_wgs84, dggs_type, resolution, mixed_aperture_level=None):
+        """
+        writes the point coordinates into the working_dir and returns the job for dgapi_grid_transform
+        """
+        cols_ordered = self._point_columns(geodf_points_wgs84)
         geodf_points_wgs84['lon'] = geodf_points_wgs84['geometry'].x
         geodf_points_wgs84['lat'] = geodf_points_wgs84['geometry'].y
+
+        job = self._transform_job(geodf_points_wgs84[cols_ordered], dggs_type, resolution, mixed_aperture_level)
+        job['cols_ordered'] = cols_ordered
+
+        return job
+
+
+    def _point_columns(self, geodf_points_wgs84):
+        cols = set(geodf_points_wgs84.columns.tolist())
+        cols = cols - set(['geometry'])
         cols_ordered = ['lon', 'lat']
         for col_name in cols:
-            cols_ordered.append(col_name)
+            if not col_name in cols_ordered:
+                cols_ordered.append(col_name)
+
+        return cols_ordered
+
+
+    def _transform_job(self, points_df, dggs_type, resolution, mixed_aperture_level=None):
+        """
+        writes the points (lon lat and optional value columns) as input file and returns the job for dgapi_grid_transform
+        """
+        tmp_id = uuid.uuid4()
+        tmp_dir = self.working_dir
+        dggs = dgselect(dggs_type = dggs_type, res= resolution, mixed_aperture_level=mixed_aperture_level)
+
+        tmp_files = [ Path(tmp_dir) / f"geo_{tmp_id}.txt", Path(tmp_dir) / f"seqnums_{tmp_id}.txt" ]
 
-        geodf_points_wgs84[cols_ordered].to_csv( str( (Path(tmp_dir) / f"geo_{tmp_id}.txt").resolve()) , header=False, index=False, columns=cols_ordered, sep=' ')
+        try:
+            points_df.to_csv( str( (Path(tmp_dir) / f"geo_{tmp_id}.txt").resolve()) , header=False, index=False, sep=' ')
+            self.temp_files.add(tmp_files[0])
+            self.temp_files.written(tmp_files[0])
+        except Exception:
+            self.temp_files.remove(*tmp_files)
+            raise
 
         subset_conf = {
             'input_file_name':  str( (Path(tmp_dir) / f"geo_{tmp_id}.txt").resolve()),
@@ -1033,33 +2577,132 @@ class DGGRIDv7(object):
             'output_delimiter': "\",\""
             }
 
-        dggs_ops = self.dgapi_grid_transform(dggs, subset_conf, output_conf)
+        try:
+            self._pipe_output(output_conf)
+        except Exception:
+            self.temp_files.remove(*tmp_files)
+            raise
+
+        return { 'dggs': dggs, 'subset_conf': subset_conf, 'output_conf': output_conf, 'out_file': Path(output_conf['output_file_name']), 'tmp_files': tmp_files }
+
+
+    def _collect_transform(self, job):
+        """
+        reads the seqnums of a finished transform job
+        """
+        output = self._output_source(job)
+        cell_id_list = read_id_file( output )
+        self.temp_files.read(output)
+
+        self._remove_tmp_files(job)
+
+        return cell_id_list
 
-        df = pd.read_csv( dggs_ops['output_conf']['output_file_name'] , header=None)
-        df = df.dropna()
-        cell_id_list = df[0].values
 
+    def _bin_job(self, dggrid_operation, inputs, dggs_type, resolution, mixed_aperture_level=None):
+        """
+        writes one input file per (lon, lat, values) of inputs (values None for the presence binning) and returns the job
+        for dgapi_point_value_binning or dgapi_pres_binning with the SEQNUM output of the occupied cells
+        """
+        tmp_id = uuid.uuid4()
+        tmp_dir = self.working_dir
+        dggs = dgselect(dggs_type = dggs_type, res= resolution, mixed_aperture_level=mixed_aperture_level)
+
+        input_files = []
         try:
-            os.remove( str( Path(tmp_dir) / f"geo_{tmp_id}.txt") )
-            os.remove( str( Path(tmp_dir) / f"seqnums_{tmp_id}.txt") )
+            for k, (lon, lat, values) in enumerate(inputs):
+                input_files.append( (Path(tmp_dir) / f"bin_{tmp_id}_{k}.txt").resolve() )
+                write_bin_input_file(input_files[-1], lon, lat, values)
+                self.temp_files.add(input_files[-1])
+                self.temp_files.written(input_files[-1])
         except Exception:
-            pass
+            self.temp_files.remove(*input_files)
+            raise
 
-        if cell_ids_only == True:
-            geodf_points_wgs84['seqnums'] = cell_id_list
-            return geodf_points_wgs84
-        else:
-            # grid_gen from seqnums
-            gdf = self.grid_cell_polygons_from_cellids(cell_id_list=cell_id_list,
-                                                    dggs_type=dggs_type,
-                                                    resolution=resolution,
-                                                    mixed_aperture_level=mixed_aperture_level)
-            try:
-                for col in cols_ordered:
+        subset_conf = {
+            'input_files': ' '.join([ str(input_file) for input_file in input_files ]),
+            'input_delimiter': "\" \"",
+            'bin_coverage': 'PARTIAL'
+            }
+
+        output_conf = {
+            'output_file_name': str( (Path(tmp_dir) / f"bin_{tmp_id}_out.txt").resolve()),
+            'output_address_type': 'SEQNUM',
+            'output_delimiter': "\",\"",
+            'cell_output_control': 'OUTPUT_OCCUPIED'
+            }
+        # the counts of the points are needed to merge the means of the shards, the presence counts are recomputed
+        output_conf['output_count'] = 'TRUE' if dggrid_operation == 'BIN_POINT_VALS' else 'FALSE'
+
+        tmp_files = input_files + [ Path(output_conf['output_file_name']) ]
+        try:
+            self._pipe_output(output_conf)
+        except Exception:
+            self.temp_files.remove(*tmp_files)
+            raise
+
+        return { 'dggs': dggs, 'subset_conf': subset_conf, 'output_conf': output_conf, 'out_file': Path(output_conf['output_file_name']), 'tmp_files': tmp_files }
+
+
+    def _collect_bin(self, job, read_bin_file):
+        """
+        reads the output of a finished binning job with read_bin_file
+        """
+        try:
+            output = self._output_source(job)
+            self.temp_files.read(output)
+            return read_bin_file(output)
+        finally:
+            self._remove_tmp_files(job)
+
+
+    def _pipe_output(self, output_conf):
+        """
+        with scratch='memory', the text output of a point file based operation is a named pipe instead of a file
+        """
+        if self.scratch == 'memory' and hasattr(os, 'mkfifo'):
+            os.mkfifo(output_conf['output_file_name'])
+            self.temp_files.add(output_conf['output_file_name'])
+
+
+    def _add_point_columns(self, gdf, geodf_points_wgs84, cols_ordered):
+        try:
+            for col in cols_ordered:
+                # the chunked paths that don't add lon and lat to the points take them from the geometry
+                if col in ['lon', 'lat'] and not col in geodf_points_wgs84.columns:
+                    gdf[col] = geodf_points_wgs84['geometry'].x.values if col == 'lon' else geodf_points_wgs84['geometry'].y.values
+                else:
                     gdf[col] = geodf_points_wgs84[col].values
-            except Exception:
-                pass
-            return gdf
+        except Exception:
+            pass
+        return gdf
+
+
+    def _remove_tmp_files(self, job):
+        """
+        removes the temporary files of the job, and the files matching its tmp_globs that dggrid named on its own
+        """
+        for pattern in job.get('tmp_globs', []):
+            self.temp_files.remove(*Path(pattern).parent.glob(Path(pattern).name))
+
+        self.temp_files.remove(*job['tmp_files'])
+
+
+    @contextmanager
+    def _cleanup(self, jobs):
+        """
+        removes the temporary files of a job, or of a list of jobs that may still be filled in the with block, after the
+        with block, also when it fails
+        """
+        try:
+            yield
+        finally:
+            self._remove_jobs_tmp_files(jobs)
+
+
+    def _remove_jobs_tmp_files(self, jobs):
+        for job in ([jobs] if isinstance(jobs, dict) else jobs):
+            self._remove_tmp_files(job)
 
 
 #############################################################
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+
+from pathlib import Path
+import os
+import threading
+import functools
+import math
+import uuid
+import numpy as np
+import pandas as pd
+
+
+# WGS84_AUTHALIC_SPHERE radius that dggrid uses for the statistics (km, param.cpp, it prints it with 7 decimals only)
+earth_radius_km = 6371.007180918475
+
+# dggrid accepts resolutions 0 to 35, the cell counts must also fit into 64 bit integers
+max_dggs_res = 35
+
+stats_columns = ['Resolution', 'Cells', 'Area (km^2)', 'CLS (km)']
+
+
+# the preset grids that aren't named after their aperture: SUPERFUND is the FULLER43H grid with 2 aperture 4 resolutions,
+# of which it numbers only these ones as its resolutions 0 to 9 (DgSuperfund.cpp), PLANETRISK the ISEA hexagon grid with
+# the aperture sequence of its dggrid 7 preset
+superfund_res = [1, 2, 4, 6, 8, 10, 12, 14, 16, 17]
+planetrisk_aperture_sequence = '43334777777777777777'
+
+
+"""
+the precomputed statistics follow the closed form of dggrid's OUTPUT_STATS: 10 * aperture^res (20 * 4^res for triangles)
+faces of equal area (hexagon grids have 2 more cells, the 12 pentagons), and the characteristic length scale (CLS) is the
+diameter of a spherical cap of the average cell area. The intercell spacing (of dggrid 6) starts with the icosahedron edge
+arc for hexagon and diamond grids (edge / sqrt(3) for triangle grids) and shrinks by sqrt(aperture) per resolution. The
+mixed aperture grids and PLANETRISK multiply the apertures of their resolutions. Returns None for grids that are not
+predefined or resolutions beyond max_dggs_res (9 for SUPERFUND, 20 for PLANETRISK).
+"""
+@functools.lru_cache(maxsize=256)
+def _predefined_res_arrays(dggs_type, resolution, mixed_aperture_level):
+
+    max_res = max_dggs_res
+    if dggs_type == 'SUPERFUND':
+        grid = '43H'
+        mixed_aperture_level = 2
+        max_res = len(superfund_res) - 1
+    elif dggs_type == 'PLANETRISK':
+        grid = 'PLANETRISK'
+        max_res = len(planetrisk_aperture_sequence)
+    elif dggs_type.startswith('ISEA'):
+        grid = dggs_type[4:]
+    elif dggs_type.startswith('FULLER'):
+        grid = dggs_type[6:]
+    else:
+        return None
+
+    if not grid in ['3H', '4H', '4T', '4D', '43H', '7H', 'PLANETRISK']:
+        return None
+
+    # None: up to the finest resolution with a cell count that fits into 64 bit integers
+    clip_to_int64 = resolution is None
+    if clip_to_int64:
+        resolution = max_res
+
+    if resolution < 0 or resolution > max_res:
+        return None
+
+    # number of aperture 4 resolutions before the aperture 3 resolutions (dggrid default 0)
+    aperture_4_res = 0 if mixed_aperture_level is None else mixed_aperture_level
+    grid_res = superfund_res[:resolution + 1] if dggs_type == 'SUPERFUND' else range(resolution + 1)
+
+    faces = []
+    for res in grid_res:
+        if grid == '43H':
+            n4 = min(res, aperture_4_res)
+            faces.append(10 * 4**n4 * 3**(res - n4))
+        elif grid == 'PLANETRISK':
+            faces.append(10 * math.prod(int(aperture) for aperture in planetrisk_aperture_sequence[:res]))
+        elif grid == '4T':
+            faces.append(20 * 4**res)
+        else:
+            faces.append(10 * int(grid[:-1])**res)
+
+    cells = [ n if grid[-1] in ['T', 'D'] else n + 2 for n in faces ]
+    if clip_to_int64:
+        cells = [ n for n in cells if n <= np.iinfo(np.int64).max ]
+        faces = faces[:len(cells)]
+    elif cells[-1] > np.iinfo(np.int64).max:
+        return None
+
+    faces = np.array(faces, dtype=np.float64)
+    area = 4 * np.pi * earth_radius_km**2 / faces
+    cls = 2 * earth_radius_km * np.arccos(1 - area / (2 * np.pi * earth_radius_km**2))
+
+    # the cell count ratio between resolutions is the aperture
+    icosahedron_edge = earth_radius_km * np.arctan(2.0)
+    spacing = icosahedron_edge * np.sqrt((20 if grid == '4T' else 10) / faces)
+    if grid[-1] == 'T':
+        spacing = spacing / np.sqrt(3)
+
+    return np.array(cells, dtype=np.int64), area, spacing, cls
+
+
+def predefined_res_table(dggs_type, resolution=None, mixed_aperture_level=None):
+    """
+    statistics of the predefined dggs_types from resolution 0 to resolution (None: the finest supported resolution),
+    including the intercell spacing
+    """
+    arrays = _predefined_res_arrays(dggs_type, None if resolution is None else int(resolution), None if mixed_aperture_level is None else int(mixed_aperture_level))
+    if arrays is None:
+        return None
+
+    cells, area, spacing, cls = arrays
+
+    # dggrid prints the statistics with 7 decimals
+    return pd.DataFrame({
+        'Resolution': np.arange(len(cells), dtype=int),
+        'Cells': cells,
+        'Area (km^2)': np.round(area, 7),
+        'Spacing (km)': np.round(spacing, 7),
+        'CLS (km)': np.round(cls, 7)
+        })
+
+
+def predefined_stats_table(dggs_type, resolution, mixed_aperture_level=None):
+    """
+    precomputed grid_stats_table of the predefined dggs_types, None if dggrid has to generate it
+    """
+    df = predefined_res_table(dggs_type, resolution, mixed_aperture_level)
+    if df is None:
+        return None
+
+    return df[stats_columns]
+
+
+_stats_memo = {}
+_stats_memo_lock = threading.Lock()
+
+
+def _stats_key(dggs_type, resolution, mixed_aperture_level):
+    return (dggs_type, int(resolution), None if mixed_aperture_level is None else int(mixed_aperture_level))
+
+
+def _stats_file(cache_dir, key):
+    mixed = 'none' if key[2] is None else key[2]
+    return Path(cache_dir) / 'dggrid4py_stats' / f"{key[0]}_{key[1]}_{mixed}.csv"
+
+
+"""
+looks up the statistics table of a DGGS in the per process memo, the cache_dir (if given) and the precomputed tables,
+returns None if it is not known yet and has to be generated with dggrid
+"""
+def lookup_stats_table(dggs_type, resolution, mixed_aperture_level=None, cache_dir=None):
+
+    key = _stats_key(dggs_type, resolution, mixed_aperture_level)
+
+    with _stats_memo_lock:
+        df = _stats_memo.get(key)
+
+    if df is None and not cache_dir is None and _stats_file(cache_dir, key).exists():
+        df = pd.read_csv(_stats_file(cache_dir, key))
+
+    if df is None:
+        df = predefined_stats_table(dggs_type, resolution, mixed_aperture_level)
+
+    if df is None:
+        return None
+
+    with _stats_memo_lock:
+        _stats_memo[key] = df
+
+    # callers may modify the returned table
+    return df.copy()
+
+
+"""
+memoizes a statistics table generated with dggrid in this process and, if cache_dir is given, on disk
+"""
+def store_stats_table(df, dggs_type, resolution, mixed_aperture_level=None, cache_dir=None):
+
+    key = _stats_key(dggs_type, resolution, mixed_aperture_level)
+
+    with _stats_memo_lock:
+        _stats_memo[key] = df.copy()
+
+    if not cache_dir is None:
+        stats_file = _stats_file(cache_dir, key)
+        stats_file.parent.mkdir(parents=True, exist_ok=True)
+        # write and rename, so that concurrent readers never see a partial file
+        tmp_file = stats_file.parent / f"{stats_file.name}.{uuid.uuid4()}"
+        df.to_csv(tmp_file, index=False)
+        os.replace(tmp_file, stats_file)
+
+
+"""
+vectorized search of the resolution whose statistic (area, spacing or cls, decreasing with the resolution) is closest to
+the given value(s), with the resround semantics of dggridR:
+    'nearest': the resolution with the smallest absolute difference
+    'up': the finest resolution whose value is still larger than or equal to the given value (the next larger cells)
+    'down': the coarsest resolution whose value is smaller than or equal to the given value (the next smaller cells)
+values beyond the table are clipped to resolution 0 or the finest resolution of the table.
+"""
+def closest_res(res_values, values, resround='nearest'):
+
+    if not resround in ['nearest', 'up', 'down']:
+        raise ValueError("resround must be one of 'nearest', 'up' or 'down'")
+
+    # searchsorted needs ascending values, i.e. the finest resolution first
+    ascending = np.asarray(res_values, dtype=np.float64)[::-1]
+    max_res = len(ascending) - 1
+    values = np.asarray(values, dtype=np.float64)
+
+    if resround == 'up':
+        # a value equal to a table entry is that resolution, for 'up' and 'down'
+        pos = np.searchsorted(ascending, values, side='left')
+    elif resround == 'down':
+        pos = np.searchsorted(ascending, values, side='right') - 1
+    else:
+        right = np.clip(np.searchsorted(ascending, values), 0, max_res)
+        left = np.clip(right - 1, 0, max_res)
+        pos = np.where(np.abs(ascending[left] - values) <= np.abs(ascending[right] - values), left, right)
+
+    return max_res - np.clip(pos, 0, max_res)
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+
+from pathlib import Path
+from itertools import chain
+import threading
+
+import numpy as np
+
+
+"""
+the related cells (children, parents, neighbours) of many cells as compressed rows, the CSR layout of sparse matrices:
+the cells related to cell_id_list[k] are values[offsets[k]:offsets[k + 1]], offsets has one entry more than cells
+"""
+
+
+"""
+compressed rows of the (rows, k) cells array, without the cells masked out by valid and without repeated cells in a row,
+in the order of their first occurrence
+"""
+def rows_to_csr(cells, valid=None):
+
+    cells = np.asarray(cells, dtype=np.int64)
+    keep = np.ones(cells.shape, dtype=bool) if valid is None else np.array(valid, dtype=bool)
+
+    for k in range(1, cells.shape[1]):
+        repeated = ((cells[:, k:k + 1] == cells[:, :k]) & keep[:, :k]).any(axis=1)
+        keep[:, k] &= ~repeated
+
+    offsets = np.zeros(len(cells) + 1, dtype=np.int64)
+    np.cumsum(keep.sum(axis=1), out=offsets[1:])
+
+    return offsets, cells[keep]
+
+
+"""
+the rows of a CSR (offsets, values) in the order of rows, as new CSR
+"""
+def csr_take(offsets, values, rows):
+
+    rows = np.asarray(rows, dtype=np.int64)
+    starts = offsets[rows]
+    counts = offsets[rows + 1] - starts
+
+    new_offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(counts, out=new_offsets[1:])
+
+    # position of every value within its row, added to the start of the row in the old values
+    within = np.arange(new_offsets[-1], dtype=np.int64) - np.repeat(new_offsets[:-1], counts)
+
+    return new_offsets, values[np.repeat(starts, counts) + within]
+
+
+"""
+the values of every row of a CSR in ascending order
+"""
+def csr_sort_rows(offsets, values):
+
+    rows = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+
+    return offsets, values[np.lexsort((values, rows))]
+
+
+"""
+the inverse relation of a CSR: for every cell of cells the rows of cell_id_list whose values contain it, as CSR in
+ascending order
+"""
+def csr_invert(offsets, values, cell_id_list, cells):
+
+    cell_id_list = np.asarray(cell_id_list, dtype=np.int64)
+    cells = np.asarray(cells, dtype=np.int64)
+    rows = np.repeat(cell_id_list, np.diff(offsets))
+
+    # (value, row cell) pairs of the requested cells, sorted by value
+    pairs = np.unique(np.column_stack([values, rows]), axis=0)
+    pairs = pairs[np.isin(pairs[:, 0], cells)]
+
+    unique_cells = np.unique(cells)
+    unique_offsets = np.zeros(len(unique_cells) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(np.searchsorted(unique_cells, pairs[:, 0]), minlength=len(unique_cells)), out=unique_offsets[1:])
+
+    return csr_take(unique_offsets, pairs[:, 1], np.searchsorted(unique_cells, cells))
+
+
+"""
+reads a dggrid children or neighbours output: one line per cell, the cell id followed by the ids of its related cells.
+Returns the CSR of the cells of cell_id_list, cells missing in the output have no related cells
+"""
+def read_relation_file(path, cell_id_list):
+
+    with open(path, 'r', encoding='utf-8') as src:
+        lines = [ line.replace(',', ' ').split() for line in src.read().splitlines() ]
+    lines = [ line for line in lines if len(line) > 0 and not line[0] == 'END' ]
+
+    counts = np.array([ len(line) - 1 for line in lines ], dtype=np.int64)
+    line_cells = np.array([ line[0] for line in lines ], dtype=np.int64)
+    line_values = np.array(list(chain.from_iterable(line[1:] for line in lines)), dtype=np.int64)
+
+    line_offsets = np.zeros(len(lines) + 1, dtype=np.int64)
+    np.cumsum(counts, out=line_offsets[1:])
+
+    order = np.argsort(line_cells, kind='stable')
+    line_offsets, line_values = csr_take(line_offsets, line_values, order)
+    line_cells = line_cells[order]
+
+    # an extra empty row for the cells dggrid didn't write, e.g. the ones out of range
+    line_offsets = np.append(line_offsets, line_offsets[-1])
+
+    cell_id_list = np.asarray(cell_id_list, dtype=np.int64)
+    rows = np.searchsorted(line_cells, cell_id_list)
+    found = rows < len(line_cells)
+    found[found] = line_cells[rows[found]] == cell_id_list[found]
+
+    return csr_take(line_offsets, line_values, np.where(found, rows, len(line_cells)))
+
+
+"""
+the file dggrid wrote for the output file name without its extension, e.g. the .nbr or .chd file of a TEXT output
+"""
+def find_output_file(file_name):
+
+    path = Path(file_name)
+    if path.exists():
+        return path
+
+    candidates = sorted(path.parent.glob(f"{path.name}.*"))
+    if len(candidates) == 0:
+        raise ValueError(f"dggrid wrote no output file {file_name}")
+
+    return candidates[0]
+
+
+rollup_aggs = ('sum', 'mean', 'count', 'min', 'max')
+
+
+_parent_memo = {}
+_parent_memo_lock = threading.Lock()
+
+
+def _parent_key(dggs_type, resolution, mixed_aperture_level):
+    return (dggs_type, int(resolution), None if mixed_aperture_level is None else int(mixed_aperture_level))
+
+
+"""
+looks up the roll-up parents of the unique and sorted seqnums in the per process memo, 0 for the seqnums whose parent
+is not known yet
+"""
+def lookup_rollup_parents(seqnums, dggs_type, resolution, mixed_aperture_level=None):
+
+    with _parent_memo_lock:
+        memo = _parent_memo.get(_parent_key(dggs_type, resolution, mixed_aperture_level))
+
+    parents = np.zeros(len(seqnums), dtype=np.int64)
+    if memo is None:
+        return parents
+
+    known, known_parents = memo
+    rows = np.minimum(np.searchsorted(known, seqnums), len(known) - 1)
+    found = known[rows] == seqnums
+    parents[found] = known_parents[rows[found]]
+
+    return parents
+
+
+"""
+memoizes the roll-up parents of the seqnums in this process, together with the ones already memoized
+"""
+def store_rollup_parents(seqnums, parents, dggs_type, resolution, mixed_aperture_level=None):
+
+    key = _parent_key(dggs_type, resolution, mixed_aperture_level)
+
+    with _parent_memo_lock:
+        memo = _parent_memo.get(key)
+        if not memo is None:
+            seqnums = np.concatenate([memo[0], seqnums])
+            parents = np.concatenate([memo[1], parents])
+        seqnums, first = np.unique(seqnums, return_index=True)
+        _parent_memo[key] = (seqnums, parents[first])
+
+
+"""
+the roll-up state of the cell values: the partial aggregates that the next coarser resolution is aggregated from
+"""
+def rollup_state(values, agg):
+
+    if not agg in rollup_aggs:
+        raise ValueError(f"agg must be one of {rollup_aggs}, not {agg}")
+
+    values = np.asarray(values)
+    state = { 'count': np.ones(len(values), dtype=np.int64) }
+    if agg in ['sum', 'mean']:
+        state['sum'] = values
+    elif agg in ['min', 'max']:
+        state[agg] = values
+
+    return state
+
+
+"""
+aggregates the roll-up state of the cells into their parents, returns the unique parents (ascending) and their state
+"""
+def rollup_step(parents, state):
+
+    if len(parents) == 0:
+        return parents, state
+
+    order = np.argsort(parents, kind='stable')
+    parents = parents[order]
+    starts = np.flatnonzero(np.concatenate([[True], parents[1:] != parents[:-1]]))
+
+    reducers = { 'count': np.add, 'sum': np.add, 'min': np.minimum, 'max': np.maximum, 'wsum': np.add, 'wcount': np.add }
+    state = { key: reducers[key].reduceat(values[order], starts) for key, values in state.items() }
+
+    return parents[starts], state
+
+
+def rollup_values(state, agg):
+
+    if agg == 'mean':
+        return state['sum'] / state['count']
+
+    return state[agg]
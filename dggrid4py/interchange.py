@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+
+from pathlib import Path
+import io
+import os
+import warnings
+import numpy as np
+import pandas as pd
+
+import fiona
+import geopandas as gpd
+
+try:
+    import pyogrio
+    has_pyogrio = True
+except ImportError:
+    has_pyogrio = False
+
+try:
+    import pyarrow
+    has_pyarrow = True
+except ImportError:
+    has_pyarrow = False
+
+
+# GDAL vector formats that dggrid can write its cell polygons to and that we can read back, fastest first
+geo_interchange_formats = {
+    'FlatGeobuf': { "driver": "FlatGeobuf", "ext": "fgb"},
+    'GPKG': { "driver": "GPKG", "ext": "gpkg"},
+    'GeoJSON': { "driver": "GeoJSON", "ext": "geojson"},
+}
+
+
+"""
+returns the driver and file extension of the temporary geo files for geo_format, one of geo_interchange_formats
+or 'auto' for the fastest format that can be written here
+"""
+def geo_interchange_format(geo_format='auto'):
+
+    if geo_format == 'auto':
+        for name, geo_out in geo_interchange_formats.items():
+            if geo_out['driver'] in fiona.supported_drivers.keys() and "w" in fiona.supported_drivers[geo_out['driver']]:
+                return dict(geo_out)
+        return dict(geo_interchange_formats['GeoJSON'])
+
+    if not geo_format in geo_interchange_formats.keys():
+        raise ValueError(f"unknown geo_format {geo_format}, use one of {list(geo_interchange_formats.keys())} or 'auto'")
+
+    return dict(geo_interchange_formats[geo_format])
+
+
+"""
+reads a geo file written by dggrid into a GeoDataFrame, through pyogrio (with Arrow if pyarrow is there) when installed
+"""
+def read_geo_file(path, driver):
+
+    if has_pyogrio:
+        return pyogrio.read_dataframe(str(path), use_arrow=has_pyarrow)
+
+    return gpd.read_file(path, driver=driver)
+
+
+"""
+the size of a dggrid text output, a file path or the BytesIO of an output read from a pipe
+"""
+def file_size(path):
+
+    if isinstance(path, io.BytesIO):
+        return path.getbuffer().nbytes
+
+    return os.path.getsize(path)
+
+
+"""
+the last size bytes of a dggrid text output, a file path or a BytesIO
+"""
+def file_tail(path, size):
+
+    if isinstance(path, io.BytesIO):
+        return path.getvalue()[-size:]
+
+    with open(path, 'rb') as src:
+        src.seek(max(os.path.getsize(path) - size, 0))
+        return src.read()
+
+
+"""
+reads the cell ids out of a dggrid text output (a path or a BytesIO): the first column of comma separated lines, dggrid's
+END marker line of point outputs is skipped. Returns the ids as int64 numpy array, or all columns as DataFrame if ids_only is False
+"""
+def read_id_file(path, ids_only=True):
+
+    tail = file_tail(path, 16)
+
+    if len(tail.strip()) == 0:
+        return np.zeros(0, dtype=np.int64) if ids_only else pd.DataFrame()
+
+    # the numbers never contain an E, so the END line can be dropped as a comment by the fast C parser
+    comment = 'E' if tail.strip().endswith(b'END') else None
+
+    df = pd.read_csv(path, header=None, usecols=[0] if ids_only else None, comment=comment, engine='c')
+
+    if ids_only:
+        return df[0].values.astype(np.int64)
+
+    return df.dropna()
+
+
+"""
+reads a seqnums file as written for the SEQNUMS clipping, one seqnum per line (the first column is used), with the
+C parser of numpy. Returns the seqnums as int64 numpy array
+"""
+def read_seqnum_file(path):
+
+    with warnings.catch_warnings():
+        # an empty file is an empty array, not a warning
+        warnings.simplefilter('ignore', UserWarning)
+        return np.loadtxt(path, dtype=np.int64, usecols=0, ndmin=1)
+
+
+"""
+writes the points of a binning input file in compact form: lon lat (value) separated by spaces, the coordinates rounded
+to 9 decimals (about 0.1 mm) and the values in their shortest exact representation
+"""
+def write_bin_input_file(path, lon, lat, values=None):
+
+    columns = { 'lon': np.round(np.asarray(lon, dtype=np.float64), 9), 'lat': np.round(np.asarray(lat, dtype=np.float64), 9) }
+    if not values is None:
+        columns['value'] = values
+
+    pd.DataFrame(columns).to_csv(path, header=False, index=False, sep=' ')
+
+
+"""
+reads the SEQNUM output of BIN_POINT_VALS with output_count TRUE, lines of seqnum,count,mean value. Returns the seqnums,
+counts and means as numpy arrays
+"""
+def read_bin_vals_file(path):
+
+    if file_size(path) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+
+    df = pd.read_csv(path, header=None, engine='c')
+    if len(df.columns) < 3:
+        raise ValueError("the BIN_POINT_VALS output has no point counts, output_count needs DGGRID 7")
+    df.columns = ['seqnum', 'count', 'value']
+
+    return df['seqnum'].values.astype(np.int64), df['count'].values.astype(np.int64), df['value'].values.astype(np.float64)
+
+
+"""
+reads the SEQNUM output of BIN_POINT_PRESENCE, lines of seqnum,(count,)presence vector with one 0 or 1 per class.
+Returns the seqnums and the (cells, classes) boolean presence array
+"""
+def read_bin_presence_file(path, num_classes):
+
+    if file_size(path) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros((0, num_classes), dtype=bool)
+
+    # the presence vector is the last column, dggrid writes the count of the classes before it by default
+    df = pd.read_csv(path, header=None, dtype=str, engine='c')
+
+    presence = np.frombuffer(''.join(df[df.columns[-1]].values).encode('ascii'), dtype=np.uint8).reshape(len(df), num_classes) == ord('1')
+
+    return df[0].values.astype(np.int64), presence
+
+
+"""
+reads the given columns of a Parquet (.parquet, .pq, with pyarrow) or CSV file in chunks of chunk_size rows, yields
+pandas DataFrames
+"""
+def iter_table_chunks(path, columns, chunk_size):
+
+    if Path(path).suffix.lower() in ['.parquet', '.pq']:
+        if not has_pyarrow:
+            raise ValueError("reading Parquet files needs pyarrow")
+
+        import pyarrow.parquet
+        for batch in pyarrow.parquet.ParquetFile(str(path)).iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas()
+    else:
+        for chunk in pd.read_csv(path, usecols=columns, chunksize=chunk_size):
+            yield chunk
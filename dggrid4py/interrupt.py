@@ -6,9 +6,10 @@
 # file for details.
 #
 # Splits every cell from an input DGG crossing the 180º meridian in two. Meant
-# to facilitate the display of a DGG in a cartesian GIS such as QGIS. Presently,
-# this is achieved by testing every single cell in a DGGS. Future versions might
-# use heuristics to restric the number of cells tested.
+# to facilitate the display of a DGG in a cartesian GIS such as QGIS. The cells
+# crossing the meridian (a vertex more than 180º away from the first one) are
+# found and split all at once with shapely 2 array operations. The splitting is also
+# available as library function: from dggrid4py.interrupt import interrupt_cells
 #
 # Both the input and output of this programme are shapefiles. While not optimal,
 # this format roots on the outputs of the DGGRID library.
@@ -18,11 +19,10 @@
 #
 
 import sys
+import numpy as np
 import geopandas as gpd
+import shapely
 from shapely.geometry import Polygon
-from shapely.ops import split
-from shapely.wkt import loads
-from shapely.affinity import translate
 
 intersectWest = Polygon([(180.005,-90),(180.005,90),(360,90),(360,-90),(180.005,-90)])
 intersectEast = Polygon([(0,-90),(0,90),(179.995,90),(179.995,-90),(0,-90)])
@@ -51,71 +51,118 @@ def processArguments(args):
 
     return (inputFile, outputFile)
 
-def get_geom_coords(geometry):
 
-    wkt = geometry.wkt
-    wkt = wkt.replace("POLYGON ((","")
-    wkt = wkt.replace("POLYGON ))","")
-    wkt = wkt.split(", ")
+def crosses_interruption(geometries):
 
-    return wkt
+    """
+    boolean array, True for the geometries with a vertex more than 180º of longitude away from their first vertex (the
+    test of the former per-cell loop)
+    """
+    geometries = np.asarray(geometries)
+    coords, index = shapely.get_coordinates(geometries, return_index=True)
+    first = np.searchsorted(index, np.arange(len(geometries)))
 
+    far = np.abs(coords[:, 0] - coords[first[index], 0]) > 180
+    return np.bincount(index[far], minlength=len(geometries)) > 0
 
-def crosses_interruption(coords):
 
-    lat_0 = float(coords[0].split(" ")[0])
+def shift_lon(coords, xoff):
 
-    for i in range(1, len(coords)):
-        lat_1 = float(coords[i].split(" ")[0])
-        if (abs(lat_0 - lat_1) > 180):
-            return True
+    coords = coords.copy()
+    coords[:, 0] += xoff
+    return coords
 
-    return False
 
+def to_east(coords):
 
-def interrupt_cell(coords):
+    # translate longitudes to east of 180º
+    coords = coords.copy()
+    coords[coords[:, 0] < 0, 0] += 360
+    return coords
 
-    result = []
-    
-    # Translate latitudes to east of 180ª 
-    for i in range(len(coords)):
-        lat = float(coords[i].split(" ")[0])
-        if lat < 0:
-            coords[i] = str(lat + 360) + " " + coords[i].split(" ")[1]
 
-    coords = "POLYGON((%s))" % str(coords).replace("'","").replace("[","").replace("]","")
-    poly = loads(coords)
-    
-    result.append(intersectEast.intersection(poly))
-    result.append(translate(intersectWest.intersection(poly), xoff=-360))
+def interrupt_cell(geometries):
 
-    return result
+    """
+    splits the geometries at the 180º meridian, returns the eastern and the western parts as arrays
+    """
+    shifted = shapely.transform(np.asarray(geometries), to_east)
+
+    east = shapely.intersection(shifted, intersectEast)
+    west = shapely.transform(shapely.intersection(shifted, intersectWest), lambda coords: shift_lon(coords, -360))
+
+    return east, west
+
+
+def polygonal_part(geometry):
+
+    polygons = [ part for part in shapely.get_parts(geometry) if shapely.get_type_id(part) in [3, 6] ]
+    return shapely.union_all(polygons)
+
+
+def interrupt_cells(cells, crosses=None):
+
+    """
+    returns a copy of the GeoDataFrame cells where every cell crossing the 180º meridian is replaced by its eastern and
+    western part, both with the attributes of the original cell, in the original order of the cells. crosses selects
+    the cells to split (default: crosses_interruption)
+    """
+    geometries = cells.geometry.values
+    if crosses is None:
+        crosses = crosses_interruption(geometries)
+
+    if not crosses.any():
+        return cells.copy()
+
+    east, west = interrupt_cell(geometries[crosses])
+
+    # every crossing cell becomes two rows: its eastern part, then its western part
+    positions = np.arange(len(cells))
+    rows = np.repeat(positions, np.where(crosses, 2, 1))
+    new_geometries = np.array(geometries, dtype=object)[rows]
+
+    first_rows = np.searchsorted(rows, positions[crosses])
+    new_geometries[first_rows] = east
+    new_geometries[first_rows + 1] = west
+
+    cellsNew = cells.iloc[rows].copy()
+    cellsNew = cellsNew.set_geometry(gpd.GeoSeries(new_geometries, index=cellsNew.index, crs=cells.crs))
+
+    # parts that only touch the clip limits are empty or lines
+    cellsNew = cellsNew.loc[shapely.area(cellsNew.geometry.values) > 0]
+    collections = shapely.get_type_id(cellsNew.geometry.values) == 7
+    if collections.any():
+        cellsNew.loc[collections, cellsNew.geometry.name] = [ polygonal_part(geom) for geom in cellsNew.geometry.values[collections] ]
+
+    return cellsNew.reset_index(drop=True)
+
+
+def shift_cells(cells, crosses=None):
+
+    """
+    returns a copy of the GeoDataFrame cells where the negative longitudes of every cell crossing the 180º meridian are
+    moved east by 360º, so that these cells are contiguous polygons reaching beyond 180º. crosses selects the cells to
+    shift (default: crosses_interruption)
+    """
+    cellsNew = cells.copy()
+    if crosses is None:
+        crosses = crosses_interruption(cells.geometry.values)
+
+    if crosses.any():
+        cellsNew.loc[crosses, cellsNew.geometry.name] = shapely.transform(cells.geometry.values[crosses], to_east)
+
+    return cellsNew
 
 
 # -------- Main -------
 def main():
-    
+
     inputFile, outputFile = processArguments(sys.argv)
-    
+
     cells = gpd.read_file(inputFile)
-    # Create resulting layer
-    cellsNew = cells.iloc[:0].copy()
-
-    #Clean output line
-    print("\n")
-
-    for index, row in cells.iterrows():
-    
-        print("\033[AProcessing cell %s of %s" % (index, len(cells)))
-
-        poly = row.geometry
-        coords = get_geom_coords(poly)
-        if crosses_interruption(coords):
-            geoms = interrupt_cell(coords)
-            for geom in geoms:
-                cellsNew.loc[len(cellsNew)] = [row["name"], geom]
-        else:
-            cellsNew.loc[len(cellsNew)] = row
+
+    print("Processing %s cells" % len(cells))
+    cellsNew = interrupt_cells(cells)
 
     cellsNew.to_file(outputFile)
     print("All done!")
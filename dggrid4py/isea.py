@@ -0,0 +1,1243 @@
+# -*- coding: utf-8 -*-
+
+import functools
+import numpy as np
+import shapely
+
+from .grid_stats import _predefined_res_arrays
+from .hierarchy import rows_to_csr, csr_sort_rows
+
+
+"""
+in-process port of the dggrid (6.x) point quantization for the predefined ISEA grids: the forward ISEA projection onto the
+icosahedron triangles (DgProjISEA), the quad (Q2DD) coordinates (DgIDGG) and the quantization into the hexagon, triangle
+and diamond grids (DgHexC1Grid2D, DgHexC2Grid2D, DgTriGrid2D, DgDmdD4Grid2D).
+
+dggrid computes in long double. The points are first quantized in double precision. The points that are so close to a
+triangle or cell boundary that the rounding errors of double precision could matter are computed again in long double
+(numpy.longdouble), keeping dggrid's order of operations and its double precision constants, so that the cells agree
+with dggrid's TRANSFORM_POINTS output.
+"""
+
+LD = np.longdouble
+
+# DgConstants.h (long double)
+M_ZERO = LD(0)
+M_HALF = LD('0.5')
+M_PI_180 = LD('0.0174532925199432957692369076848861271111')
+M_SQRT3 = LD('1.7320508075688772935274463415058723669428')
+M_SIN60 = LD('0.8660254037844386467637231707529361834714')
+PRECISION = LD('0.0000000000005')
+
+# M_PI of math.h is a double
+C_PI = np.pi
+
+# vertices of the 20 icosahedron triangles (DgProjTriRF.cpp)
+ico_tri_verts = np.array([
+    [ 0,  1,  2], [ 0,  2,  3], [ 0,  3,  4], [ 0,  4,  5], [ 0,  5,  1],
+    [ 6,  2,  1], [ 7,  3,  2], [ 8,  4,  3], [ 9,  5,  4], [10,  1,  5],
+    [ 2,  6,  7], [ 3,  7,  8], [ 4,  8,  9], [ 5,  9, 10], [ 1, 10,  6],
+    [11,  7,  6], [11,  8,  7], [11,  9,  8], [11, 10,  9], [11,  6, 10]
+    ])
+
+# quad and rotation (multiples of 60º) of every triangle on the quads, the 240º ones are also shifted (DgVertex2DDRF::triTable_)
+tri_quad = np.array([1, 2, 3, 4, 5, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 6, 7, 8, 9, 10])
+tri_rot60 = np.array([1, 1, 1, 1, 1, 4, 4, 4, 4, 4, 1, 1, 1, 1, 1, 4, 4, 4, 4, 4])
+tri_shifted = tri_rot60 == 4
+
+# (isType0, loneVert, upQuad, rightQuad) of the quads (DgIDGG::edgeTable_)
+quad_edges = np.array([
+    [1,  0, 0,  0],
+    [1,  0, 2,  6],
+    [1,  0, 3,  7],
+    [1,  0, 4,  8],
+    [1,  0, 5,  9],
+    [1,  0, 1, 10],
+    [0, 11, 2,  7],
+    [0, 11, 3,  8],
+    [0, 11, 4,  9],
+    [0, 11, 5, 10],
+    [0, 11, 1,  6],
+    [0, 11, 0,  0]
+    ])
+
+# (triangle, translation x, translation y in multiples of sin(60º), rotation in multiples of 60º) of the 6 sub triangles
+# around the vertex of every quad, triangle -1 where no triangle is kept (DgVertex2DDRF::vertTable_)
+vert_table = np.array([
+    [[ 1, -0.5, -1,  3], [ 0, -1.0,  0,  2], [ 4, -0.5,  1,  1], [-1, -0.5,  1,  1], [ 3,  1.0,  0, -1], [ 2,  0.5, -1, -2]],
+    [[ 0,  0.0,  0,  1], [ 5, -0.5, -1,  4], [14, -0.5,  1,  1], [-1, -0.5,  1,  1], [ 9,  0.0,  0,  3], [ 4,  1.0,  0,  0]],
+    [[ 1,  0.0,  0,  1], [ 6, -0.5, -1,  4], [10, -0.5,  1,  1], [-1, -0.5,  1,  1], [ 5,  0.0,  0,  3], [ 0,  1.0,  0,  0]],
+    [[ 2,  0.0,  0,  1], [ 7, -0.5, -1,  4], [11, -0.5,  1,  1], [-1, -0.5,  1,  1], [ 6,  0.0,  0,  3], [ 1,  1.0,  0,  0]],
+    [[ 3,  0.0,  0,  1], [ 8, -0.5, -1,  4], [12, -0.5,  1,  1], [-1, -0.5,  1,  1], [ 7,  0.0,  0,  3], [ 2,  1.0,  0,  0]],
+    [[ 4,  0.0,  0,  1], [ 9, -0.5, -1,  4], [13, -0.5,  1,  1], [-1, -0.5,  1,  1], [ 8,  0.0,  0,  3], [ 3,  1.0,  0,  0]],
+    [[10,  0.0,  0,  1], [15, -0.5, -1,  4], [19,  0.0,  0, -1], [14, -0.5,  1,  2], [-1, -0.5,  1,  1], [ 5,  0.5, -1,  4]],
+    [[11,  0.0,  0,  1], [16, -0.5, -1,  4], [15,  0.0,  0, -1], [10, -0.5,  1,  2], [-1, -0.5,  1,  1], [ 6,  0.5, -1,  4]],
+    [[12,  0.0,  0,  1], [17, -0.5, -1,  4], [16,  0.0,  0, -1], [11, -0.5,  1,  2], [-1, -0.5,  1,  1], [ 7,  0.5, -1,  4]],
+    [[13,  0.0,  0,  1], [18, -0.5, -1,  4], [17,  0.0,  0, -1], [12, -0.5,  1,  2], [-1, -0.5,  1,  1], [ 8,  0.5, -1,  4]],
+    [[14,  0.0,  0,  1], [19, -0.5, -1,  4], [18,  0.0,  0, -1], [13, -0.5,  1,  2], [-1, -0.5,  1,  1], [ 9,  0.5, -1,  4]],
+    [[17, -0.5, -1,  3], [18, -1.0,  0,  2], [19, -0.5,  1,  1], [15,  0.5,  1,  0], [-1,  0.0,  0,  0], [16,  0.5, -1, -2]]
+    ])
+vert_tri = vert_table[:, :, 0].astype(np.int64)
+vert_rot60 = vert_table[:, :, 3].astype(np.int64)
+
+# the ISEA grids that the native engine quantizes, the aperture 7 grids need dggrid (see check_native_dggs_type): their
+# port is open until it can be checked against dggrid 7, which introduced them
+native_dggs_types = ('ISEA3H', 'ISEA4H', 'ISEA4T', 'ISEA4D')
+
+# points per block, bounds the memory of the temporary arrays
+block_size = 65536
+
+# double precision results closer than this to a triangle edge plane are recomputed in long double
+tri_tolerance = 1e-12
+
+# cell vertices closer than this (degrees) to a pole are on the pole, edges between longitudes this close to 180º apart
+# run over the pole
+pole_tolerance = 1e-6
+
+
+"""
+the constants of the projection and the quantization in dtype (numpy.longdouble or numpy.float64)
+"""
+@functools.lru_cache(maxsize=4)
+def constants(dtype):
+
+    # DgProjISEA.cpp
+    R1 = LD('0.9103832815')
+    DH = LD('37.37736814') * M_PI_180
+    GH = LD(36.0) * M_PI_180
+    originXOff = LD('0.6022955029')
+
+    values = {
+        'M_ZERO': M_ZERO,
+        'M_HALF': M_HALF,
+        'M_PI_180': M_PI_180,
+        'M_SQRT3': M_SQRT3,
+        'M_SIN60': M_SIN60,
+        'two_pi': LD(2.0 * C_PI),
+        'deg120': LD(120.0) * M_PI_180,
+        'deg180': LD(180.0) * M_PI_180,
+        'deg240': LD(240.0) * M_PI_180,
+        'R1': R1,
+        'R1S': R1 * R1,
+        'GH': GH,
+        'cot30': LD(1) / np.tan(LD(30.0) * M_PI_180),
+        'tanDH': np.tan(DH),
+        'cosDH': np.cos(DH),
+        'sinGH': np.sin(GH),
+        'cosGH': np.cos(GH),
+        'originXOff': originXOff,
+        'originYOff': LD('0.3477354707'),
+        'icosaEdge': LD(2) * originXOff,
+        'llxyz_epsilon': LD('0.000000000000001'),
+        'PRECISION': PRECISION,
+        'M_PI_2': LD(C_PI / 2),
+        'M_180_PI': LD('57.29577951308232087679815481410517033240547'),
+        'geo_tolerance': LD('0.0000000005'),
+        'nudge': LD('0.0000001'),
+        # double constants of the grids (sqrt(3.0) in dggrid)
+        'sqrt3_d': LD(np.sqrt(3.0)),
+        'r_hex': LD(1.0 / np.sqrt(3.0)),
+        'two_thirds_d': LD(2.0 / 3.0),
+        'skew_fac': LD(np.sqrt(3.0) / 3.0),
+        'y_off2': LD(np.sqrt(3.0) / 4.0) * 2.0,
+        'one_third': LD(1.0) / LD(3.0),
+        'two_thirds': LD(2.0) / LD(3.0)
+        }
+
+    # DgDVec2D::rotate, for the rotations that occur
+    for degrees in [30, 60, 240, 330]:
+        rot_ang = LD(degrees) * M_PI_180
+        values[f"cos{degrees}"] = np.cos(rot_ang)
+        values[f"sin{degrees}"] = np.sin(rot_ang)
+
+    return { name: dtype(value) for name, value in values.items() }
+
+
+def llxyz(lon, lat, c):
+
+    x = np.cos(lat) * np.cos(lon)
+    y = np.cos(lat) * np.sin(lon)
+    z = np.sin(lat)
+
+    x = np.where(np.abs(x) < c['llxyz_epsilon'], c['M_ZERO'], x)
+    y = np.where(np.abs(y) < c['llxyz_epsilon'], c['M_ZERO'], y)
+    z = np.where(np.abs(z) < c['llxyz_epsilon'], c['M_ZERO'], z)
+
+    return x, y, z
+
+
+def coordtrans(newnp_lon, newnp_lat, pt_lon, pt_lat, lon0):
+
+    coslat = np.sin(newnp_lat) * np.sin(pt_lat) + np.cos(newnp_lat) * np.cos(pt_lat) * np.cos(newnp_lon - pt_lon)
+    coslat = min(max(coslat, LD(-1)), LD(1))
+    lat = np.arccos(coslat)
+
+    if abs(lat - M_ZERO) < PRECISION * 100000 or abs(lat - LD(C_PI)) < PRECISION * 100000:
+        lon = M_ZERO
+    else:
+        coslon = (np.sin(pt_lat) * np.cos(newnp_lat) - np.cos(pt_lat) * np.sin(newnp_lat) * np.cos(newnp_lon - pt_lon)) / np.sin(lat)
+        coslon = min(max(coslon, LD(-1)), LD(1))
+        lon = np.arccos(coslon)
+        if (pt_lon - newnp_lon) >= 0 and (pt_lon - newnp_lon) < LD(C_PI):
+            lon = -lon + lon0
+        else:
+            lon = lon + lon0
+        if lon > LD(C_PI):
+            lon -= LD(2 * C_PI)
+        if lon < -LD(C_PI):
+            lon += LD(2 * C_PI)
+
+    return lon, LD(C_PI / 2) - lat
+
+
+"""
+the spherical icosahedron of dggrid's default orientation (DgSphIcosa::ico12verts): the vertices, the triangle centers,
+the azimuth of their first vertex and the point in triangle constants, in radians and long double
+"""
+@functools.lru_cache(maxsize=8)
+def icosahedron(vert0_lon=11.25, vert0_lat=58.28252559, azimuth_deg=0.0):
+
+    pt_lon = LD(str(vert0_lon)) * M_PI_180
+    pt_lat = LD(str(vert0_lat)) * M_PI_180
+    azimuth = LD(str(azimuth_deg)) * LD(C_PI) / LD(180)
+
+    verts_new = np.zeros((12, 2), dtype=LD)
+    for i in range(1, 6):
+        verts_new[i] = (-azimuth + LD(72 * (i - 1) * C_PI / 180.0), LD(26.565051177 * C_PI / 180.0))
+        verts_new[i + 5] = (-azimuth + LD((36.0 + 72.0 * (i - 1)) * C_PI / 180.0), LD(-26.565051177 * C_PI / 180))
+        for v in [i, i + 5]:
+            if verts_new[v, 0] > LD(C_PI) - PRECISION:
+                verts_new[v, 0] -= LD(2 * C_PI)
+            if verts_new[v, 0] < -(LD(C_PI) + PRECISION):
+                verts_new[v, 0] += LD(2 * C_PI)
+    verts_new[11] = (LD(0.0 * C_PI / 180.0), LD(-90.0 * C_PI / 180.0))
+
+    verts = np.zeros((12, 2), dtype=LD)
+    verts[0] = (pt_lon, pt_lat)
+    for i in range(1, 12):
+        verts[i] = coordtrans(M_ZERO, pt_lat, verts_new[i, 0], verts_new[i, 1], pt_lon)
+
+    tri_lon = verts[ico_tri_verts, 0]
+    tri_lat = verts[ico_tri_verts, 1]
+    px, py, pz = llxyz(tri_lon, tri_lat, constants(LD))
+
+    # triangle centers (sphTricenpoint)
+    cx = (px[:, 0] + px[:, 1] + px[:, 2]) / 3
+    cy = (py[:, 0] + py[:, 1] + py[:, 2]) / 3
+    cz = (pz[:, 0] + pz[:, 1] + pz[:, 2]) / 3
+    norm = np.sqrt(cx * cx + cy * cy + cz * cz)
+    cz = np.clip(cz / norm, LD(-1), LD(1))
+    cen_lat = np.arcsin(cz)
+    cen_lon = np.where(np.abs(cen_lat) == LD(C_PI / 2), M_ZERO, np.arctan2(cy / norm, cx / norm))
+
+    cen_sin_lat = np.sin(cen_lat)
+    cen_cos_lat = np.cos(cen_lat)
+    dazh = np.arctan2(np.cos(tri_lat[:, 0]) * np.sin(tri_lon[:, 0] - cen_lon),
+                      cen_cos_lat * np.sin(tri_lat[:, 0]) - cen_sin_lat * np.cos(tri_lat[:, 0]) * np.cos(tri_lon[:, 0] - cen_lon))
+
+    # point in triangle constants (x, y, z, t) of the three edges of every triangle
+    ptin = np.zeros((4, 20, 3), dtype=LD)
+    for edge, (a, b, c) in enumerate([(1, 2, 0), (0, 2, 1), (0, 1, 2)]):
+        ptin[0, :, edge] = py[:, a] * pz[:, b] - py[:, b] * pz[:, a]
+        ptin[1, :, edge] = px[:, a] * pz[:, b] - px[:, b] * pz[:, a]
+        ptin[2, :, edge] = px[:, a] * py[:, b] - px[:, b] * py[:, a]
+        ptin[3, :, edge] = px[:, c] * ptin[0, :, edge] - py[:, c] * ptin[1, :, edge] + pz[:, c] * ptin[2, :, edge]
+
+    return {
+        'verts': verts,
+        'cen_lon': cen_lon,
+        'cen_sin_lat': cen_sin_lat,
+        'cen_cos_lat': cen_cos_lat,
+        'dazh': dazh,
+        'ptin': ptin,
+        'cen_xyz': np.stack([cen_cos_lat * np.cos(cen_lon), cen_cos_lat * np.sin(cen_lon), cen_sin_lat], axis=1)
+        }
+
+
+@functools.lru_cache(maxsize=4)
+def icosahedron_as(dtype):
+    return { name: values.astype(dtype) for name, values in icosahedron().items() }
+
+
+"""
+the first icosahedron triangle that contains the points (DgSphIcosa::whichIcosaTri), -1 for none
+"""
+def which_icosa_tri(x, y, z, ico):
+
+    ptin = ico['ptin']
+    p0 = x[:, None, None] * ptin[0] - y[:, None, None] * ptin[1] + z[:, None, None] * ptin[2]
+    inside = ~(p0 * ptin[3] < 0.0).any(axis=2)
+
+    return np.where(inside.any(axis=1), inside.argmax(axis=1), -1)
+
+
+"""
+the icosahedron triangle with the closest center, -1 if the point in triangle test rejects it, and the smallest
+distance measure of the points to the planes of its edges. Away from the edges, this is the triangle of whichIcosaTri
+"""
+def closest_icosa_tri(x, y, z, ico):
+
+    tri = (np.stack([x, y, z], axis=1) @ ico['cen_xyz'].T).argmax(axis=1)
+
+    ptin = ico['ptin'][:, tri]
+    p0 = x[:, None] * ptin[0] - y[:, None] * ptin[1] + z[:, None] * ptin[2]
+    inside = ~(p0 * ptin[3] < 0.0).any(axis=1)
+
+    return np.where(inside, tri, -1), np.abs(p0).min(axis=1)
+
+
+"""
+forward ISEA projection (snyderFwd/sllxy) of lon/lat (radians) in triangle tri, returns the x/y coordinates within the
+triangles and the angular distances to the triangle centers
+"""
+def isea_forward(lon, lat, tri, ico, c):
+
+    cen_lon = ico['cen_lon'][tri]
+    cen_sin_lat = ico['cen_sin_lat'][tri]
+    cen_cos_lat = ico['cen_cos_lat'][tri]
+
+    cos_lat = np.cos(lat)
+    sin_lat = np.sin(lat)
+
+    z = np.arccos(cen_sin_lat * sin_lat + cen_cos_lat * cos_lat * np.cos(lon - cen_lon))
+
+    azh = np.arctan2(cos_lat * np.sin(lon - cen_lon), cen_cos_lat * sin_lat - cen_sin_lat * cos_lat * np.cos(lon - cen_lon)) - ico['dazh'][tri]
+    azh = np.where(azh < 0.0, azh + c['two_pi'], azh)
+    azh0 = azh
+
+    azh = np.where((azh >= c['deg120']) & (azh <= c['deg240']), azh - c['deg120'], azh)
+    azh = np.where(azh > c['deg240'], azh - c['deg240'], azh)
+
+    cos_azh = np.cos(azh)
+    sin_azh = np.sin(azh)
+    dz = np.arctan2(c['tanDH'], cos_azh + c['cot30'] * sin_azh)
+
+    h = np.arccos(sin_azh * c['sinGH'] * c['cosDH'] - cos_azh * c['cosGH'])
+    ag = azh + c['GH'] + h - c['deg180']
+    azh1 = np.arctan2(2.0 * ag, c['R1S'] * c['tanDH'] * c['tanDH'] - 2.0 * ag * c['cot30'])
+    fh = c['tanDH'] / (2.0 * (np.cos(azh1) + c['cot30'] * np.sin(azh1)) * np.sin(dz / 2.0))
+    ph = 2.0 * c['R1'] * fh * np.sin(z / 2.0)
+
+    azh1 = np.where((azh0 >= c['deg120']) & (azh0 < c['deg240']), azh1 + c['deg120'], azh1)
+    azh1 = np.where(azh0 >= c['deg240'], azh1 + c['deg240'], azh1)
+
+    tri_x = (ph * np.sin(azh1) + c['originXOff']) / c['icosaEdge']
+    tri_y = (ph * np.cos(azh1) + c['originYOff']) / c['icosaEdge']
+
+    return tri_x, tri_y, z
+
+
+def rotate(x, y, degrees, c):
+
+    # DgDVec2D::rotate, counter-clockwise
+    cos_ang = c[f"cos{degrees}"]
+    sin_ang = c[f"sin{degrees}"]
+    return x * cos_ang - y * sin_ang, x * sin_ang + y * cos_ang
+
+
+"""
+triangle coordinates to the quad numbers and the quad coordinates (Q2DD) of dggrid, quad edges have length 1
+"""
+def tri_to_q2dd(tri, tri_x, tri_y, c):
+
+    x60, y60 = rotate(tri_x, tri_y, 60, c)
+    x240, y240 = rotate(tri_x, tri_y, 240, c)
+
+    shifted = tri_shifted[tri]
+    x = np.where(shifted, x240 + c['M_HALF'], x60)
+    y = np.where(shifted, y240 + c['M_SIN60'], y60)
+
+    return tri_quad[tri], x, y
+
+
+"""
+lon/lat (degrees) to the quad numbers and the quad coordinates (Q2DD) in double precision, the points on an edge
+go to the triangle with the closest center
+"""
+def geo_to_q2dd(lon, lat):
+
+    c = constants(np.float64)
+    ico = icosahedron_as(np.float64)
+
+    lon_rad = np.asarray(lon, dtype=np.float64) * c['M_PI_180']
+    lat_rad = np.asarray(lat, dtype=np.float64) * c['M_PI_180']
+
+    x, y, z = llxyz(lon_rad, lat_rad, c)
+    tri = (np.stack([x, y, z], axis=1) @ ico['cen_xyz'].T).argmax(axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tri_x, tri_y, _ = isea_forward(lon_rad, lat_rad, tri, ico, c)
+
+    return tri_to_q2dd(tri, tri_x, tri_y, c)
+
+
+"""
+raises a ValueError for the grids the native engine doesn't support: the aperture 7 grids (ISEA7H, FULLER7H,
+PLANETRISK), the FULLER grids and the mixed aperture grids are left to dggrid
+"""
+def check_native_dggs_type(dggs_type):
+
+    if not dggs_type in native_dggs_types:
+        raise ValueError(f"the native engine supports only the dggs_types {', '.join(native_dggs_types)}, not {dggs_type}: "
+                         "the aperture 7 grids (ISEA7H, FULLER7H, PLANETRISK) and the other grids need engine='dggrid'")
+
+
+"""
+the dggrid quantization parameters of a predefined ISEA grid resolution
+"""
+@functools.lru_cache(maxsize=256)
+def grid_params(dggs_type, resolution):
+
+    check_native_dggs_type(dggs_type)
+    if _predefined_res_arrays(dggs_type, int(resolution), None) is None:
+        raise ValueError(f"resolution {resolution} is not supported for {dggs_type}")
+
+    res = int(resolution)
+    topology = {'H': 'HEXAGON', 'T': 'TRIANGLE', 'D': 'DIAMOND'}[dggs_type[-1]]
+    aperture = int(dggs_type[-2])
+
+    class_i = True
+    trans_x = trans_y = M_ZERO
+    if topology == 'HEXAGON':
+        if aperture == 4:
+            max_d = 2**res - 1
+        else:
+            class_i = res % 2 == 0
+            adj_res = res if class_i else res + 1
+            max_d = 3**(adj_res // 2) - 1
+
+        # DgHexGrid2DS: the scale of resolution res, multiplied up like dggrid does
+        fac = LD(1)
+        frequency = np.sqrt(LD(aperture))
+        for i in range(res):
+            fac *= frequency
+    elif topology == 'TRIANGLE':
+        max_d = 2**res - 1
+        fac = LD(np.sqrt(3.0))
+        for i in range(res):
+            fac *= 2
+        trans_x = LD(-np.sqrt(3.0) / 2.0)
+        trans_y = LD(-0.5)
+    else:
+        max_d = 2**res - 1
+        fac = LD(1)
+        for i in range(res):
+            fac *= 2
+        trans_x = -1.0 * LD(0.25)
+        trans_y = -1.0 * LD(np.sqrt(3.0) / 4.0)
+
+    mag = max_d + 1
+    max_i = max_d
+    max_j = 2 * mag - 1 if topology == 'TRIANGLE' else max_d
+
+    if topology == 'TRIANGLE':
+        offset_per_quad = mag * (max_j + 1)
+    elif topology == 'HEXAGON' and not class_i:
+        offset_per_quad = (mag // 3) * mag
+    else:
+        offset_per_quad = mag * mag
+
+    return {
+        'topology': topology,
+        'aperture': aperture,
+        'class_i': class_i,
+        'fac': fac,
+        'trans_x': trans_x,
+        'trans_y': trans_y,
+        'max_i': max_i,
+        'max_j': max_j,
+        'offset_per_quad': offset_per_quad,
+        'quad_0': topology == 'HEXAGON',
+        'num_cells': 10 * offset_per_quad + (2 if topology == 'HEXAGON' else 0)
+        }
+
+
+def quantify_hex_c1(x, y, c):
+
+    # DgHexC1Grid2D::quantify
+    a1 = np.abs(x)
+    a2 = np.abs(y)
+
+    x2 = a2 / c['M_SIN60']
+    x1 = a1 + x2 / 2.0
+
+    m1 = x1.astype(np.int64)
+    m2 = x2.astype(np.int64)
+
+    r1 = x1 - m1
+    r2 = x2 - m2
+
+    # r1 < 1/3 (a1), < 1/2 (a2), < 2/3 (b1) or above (b2)
+    lower = r1 < 0.5
+    middle = (r1 >= c['one_third']) & (r1 < c['two_thirds'])
+
+    j_limit = np.where(middle, 1.0 - r1, np.where(lower, (1.0 + r1) / 2.0, r1 / 2.0))
+    j = m2 + (r2 >= j_limit)
+
+    i_a2 = ((1.0 - r1) <= r2) & (r2 < (2.0 * r1))
+    i_b1 = ~(((2.0 * r1 - 1.0) < r2) & (r2 < (1.0 - r1)))
+    i = m1 + np.where(middle, np.where(lower, i_a2, i_b1), ~lower)
+
+    # fold across the axes, dggrid's i - 2 * (i - j / 2) and i - (2 * (i - (j + 1) / 2) + 1) are both j - i
+    i = np.where(x < 0.0, j - i, i)
+
+    south = y < 0.0
+    return np.where(south, i - j, i), np.where(south, -j, j)
+
+
+def quantify_hex_c2(x, y, c):
+
+    # DgHexC2Grid2D::quantify, through the 30º rotated surrogate and the aperture 3 finer substrate grid
+    sx, sy = rotate(x, y, 30, c)
+    si, sj = quantify_hex_c1(sx, sy, c)
+
+    cx = (si - 0.5 * sj).astype(x.dtype)
+    cy = (sj * 1.5) * c['r_hex']
+
+    bx, by = rotate(cx, cy, 330, c)
+    return quantify_hex_c1(bx * c['M_SQRT3'], by * c['M_SQRT3'], c)
+
+
+def quantify_tri(x, y, c):
+
+    # DgTriGrid2D::quantify
+    e = c['M_SQRT3']
+    px = x + e / 2.0
+    py = y + 0.5
+
+    i = np.floor((px + py / c['sqrt3_d']) / e).astype(np.int64)
+    j_tmp = np.floor(c['two_thirds_d'] * py).astype(np.int64)
+    k = np.floor((px - py / c['sqrt3_d']) / e).astype(np.int64)
+
+    j = j_tmp * 2
+    odd = (j_tmp % 2) != 0
+    ijk_odd = ((i + j + k) % 2) != 0
+    j = np.where(odd != ijk_odd, j + 1, j)
+
+    return i, j
+
+
+def quantify_dmd(x, y, c):
+
+    # DgDmdD4Grid2D::quantify
+    return np.rint(x + c['skew_fac'] * y).astype(np.int64), np.rint(y / c['y_off2']).astype(np.int64)
+
+
+def to_grid(x, y, params):
+
+    # the affine conversion of the quad coordinates to the frame of the resolution
+    fac = x.dtype.type(params['fac'])
+    return x * fac + x.dtype.type(params['trans_x']), y * fac + x.dtype.type(params['trans_y'])
+
+
+def quantify(gx, gy, params, c):
+
+    if params['topology'] == 'HEXAGON':
+        return quantify_hex_c1(gx, gy, c) if params['class_i'] else quantify_hex_c2(gx, gy, c)
+    elif params['topology'] == 'TRIANGLE':
+        return quantify_tri(gx, gy, c)
+    return quantify_dmd(gx, gy, c)
+
+
+def out_of_quad(i, j, params):
+    return (i < 0) | (j < 0) | (i > params['max_i'] + 1) | (j > params['max_j'] + 1)
+
+
+"""
+quantizes quad coordinates (Q2DD) into the quad cell coordinates like DgQ2DDtoIConverter, including its round-off nudges
+"""
+def q2dd_to_ij(x, y, params, c):
+
+    i, j = quantify(*to_grid(x, y, params), params, c)
+
+    fix = (i < 0) | (j < 0)
+    if fix.any():
+        i[fix], j[fix] = quantify(*to_grid(x[fix] + c['nudge'], y[fix] + c['nudge'], params), params, c)
+
+    fix = (i > params['max_i'] + 1) | (j > params['max_j'] + 1)
+    if fix.any():
+        i[fix], j[fix] = quantify(*to_grid(x[fix] - c['nudge'], y[fix] - c['nudge'], params), params, c)
+
+    if out_of_quad(i, j, params).any():
+        raise ValueError("quad coordinates out of range")
+
+    return i, j
+
+
+"""
+moves the cells on the upper and right quad edges to the neighbour quads (or the pentagons on the lone vertices), returns
+the Q2DI addresses
+"""
+def quad_edge_cells(quad, i, j, params):
+
+    edge_i = params['max_i'] + 1
+    edge_j = params['max_j'] + 1
+
+    i_edge = i == edge_i
+    j_edge = j == edge_j
+    if not (i_edge | j_edge).any():
+        return quad, i, j
+
+    type_0, lone_vert, up_quad, right_quad = [ quad_edges[quad, n] for n in range(4) ]
+    type_0 = type_0 == 1
+
+    # type 0 quads (north): the upper edge belongs to the up quad, its first cell to the lone vertex
+    lone_0 = type_0 & j_edge & (i == 0)
+    up_0 = type_0 & j_edge & (i != 0)
+    right_0 = type_0 & ~j_edge & i_edge
+    # type 1 quads (south): the right edge belongs to the right quad, its first cell to the lone vertex
+    lone_1 = ~type_0 & i_edge & (j == 0)
+    right_1 = ~type_0 & i_edge & (j != 0)
+    up_1 = ~type_0 & ~i_edge & j_edge
+
+    new_quad = np.select([lone_0 | lone_1, up_0 | up_1, right_0 | right_1], [lone_vert, up_quad, right_quad], quad)
+    new_i = np.select([lone_0 | lone_1, up_0, right_0, right_1], [0, 0, 0, edge_j - j], i)
+    new_j = np.select([lone_0 | lone_1, up_0, up_1 | right_1], [0, edge_i - i, 0], j)
+
+    return new_quad, new_i, new_j
+
+
+def geo_to_q2di_exact(lon, lat, params):
+
+    # everything in long double, the way dggrid computes it
+    c = constants(LD)
+    ico = icosahedron()
+
+    lon = lon * c['M_PI_180']
+    lat = lat * c['M_PI_180']
+
+    tri = which_icosa_tri(*llxyz(lon, lat, c), ico)
+    if (tri < 0).any():
+        raise ValueError("points outside of every icosahedron triangle, check the coordinates for NaNs")
+
+    tri_x, tri_y, _ = isea_forward(lon, lat, tri, ico, c)
+    quad, x, y = tri_to_q2dd(tri, tri_x, tri_y, c)
+    i, j = q2dd_to_ij(x, y, params, c)
+
+    return quad_edge_cells(quad, i, j, params)
+
+
+def geo_to_q2di_block(lon, lat, params):
+
+    c = constants(np.float64)
+    ico = icosahedron_as(np.float64)
+
+    lon_rad = lon * c['M_PI_180']
+    lat_rad = lat * c['M_PI_180']
+
+    tri, tri_dist = closest_icosa_tri(*llxyz(lon_rad, lat_rad, c), ico)
+    exact = (tri < 0) | (tri_dist < tri_tolerance)
+    tri = np.where(tri < 0, 0, tri)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tri_x, tri_y, z = isea_forward(lon_rad, lat_rad, tri, ico, c)
+        quad, x, y = tri_to_q2dd(tri, tri_x, tri_y, c)
+        gx, gy = to_grid(x, y, params)
+
+        # bound of the double precision error in the frame of the resolution, the distance to the triangle center comes
+        # from an arccos that loses precision close to the center
+        margin = params['fac'].astype(np.float64) * (1e-12 + 1e-14 / np.sin(z))
+        exact |= ~np.isfinite(margin) | ~np.isfinite(gx) | ~np.isfinite(gy)
+
+    gx = np.where(exact, 0.0, gx)
+    gy = np.where(exact, 0.0, gy)
+    margin = np.where(exact, 0.0, margin)
+
+    # the cells are convex: when the corners of the error box are in the same cell as the point, the long double point
+    # is in it, too. The point and the four corners are quantized together
+    box_x = np.array([0, -1, 1, -1, 1])[:, None]
+    box_y = np.array([0, -1, -1, 1, 1])[:, None]
+    ci, cj = quantify(gx + box_x * margin, gy + box_y * margin, params, c)
+
+    i, j = ci[0], cj[0]
+    exact |= out_of_quad(i, j, params) | (ci != i).any(axis=0) | (cj != j).any(axis=0)
+
+    quad, i, j = quad_edge_cells(quad, np.where(exact, 0, i), np.where(exact, 0, j), params)
+
+    if exact.any():
+        # dggrid reads the coordinates as decimal text into long double
+        lon_ld = np.array([ repr(v) for v in lon[exact].tolist() ]).astype(LD)
+        lat_ld = np.array([ repr(v) for v in lat[exact].tolist() ]).astype(LD)
+        quad[exact], i[exact], j[exact] = geo_to_q2di_exact(lon_ld, lat_ld, params)
+
+    return quad, i, j
+
+
+"""
+returns the quad numbers and the i, j cell coordinates (Q2DI) of the cells containing the points at lon/lat (degrees)
+"""
+def geo_to_q2di(lon, lat, dggs_type, resolution):
+
+    params = grid_params(dggs_type, resolution)
+
+    lon = np.atleast_1d(np.asarray(lon, dtype=np.float64))
+    lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+    if lon.shape != lat.shape:
+        raise ValueError("lon and lat must have the same length")
+
+    quad = np.zeros(len(lon), dtype=np.int64)
+    i = np.zeros(len(lon), dtype=np.int64)
+    j = np.zeros(len(lon), dtype=np.int64)
+
+    for start in range(0, len(lon), block_size):
+        block = slice(start, start + block_size)
+        quad[block], i[block], j[block] = geo_to_q2di_block(lon[block], lat[block], params)
+
+    return quad, i, j
+
+
+"""
+dggrid's sequence numbers (SEQNUM, starting at 1) of Q2DI cell addresses (DgBoundedIDGG::seqNumAddress)
+"""
+def q2di_to_seqnum(quad, i, j, dggs_type, resolution):
+
+    params = grid_params(dggs_type, resolution)
+    quad = np.asarray(quad, dtype=np.int64)
+    i = np.asarray(i, dtype=np.int64)
+    j = np.asarray(j, dtype=np.int64)
+
+    offset = np.where(quad > 0, (quad - 1) * params['offset_per_quad'] + (1 if params['quad_0'] else 0), 0)
+
+    if params['topology'] == 'HEXAGON' and not params['class_i']:
+        # only every third substrate cell is a class II cell
+        num_i = params['max_i'] + 1
+        j_offset = np.select([i % 3 == 1, i % 3 == 2], [j - 2, j - 1], j)
+        cell = i * num_i // 3 + j_offset // 3
+    else:
+        cell = i * (params['max_j'] + 1) + j
+
+    return offset + cell + 1
+
+
+"""
+returns the sequence numbers (SEQNUM) of the cells containing the points at lon/lat (degrees)
+"""
+def geo_to_seqnum(lon, lat, dggs_type, resolution):
+
+    quad, i, j = geo_to_q2di(lon, lat, dggs_type, resolution)
+    return q2di_to_seqnum(quad, i, j, dggs_type, resolution)
+
+
+"""
+the Q2DI cell addresses of dggrid's sequence numbers (DgBoundedIDGG::addFromSeqNum)
+"""
+def seqnum_to_q2di(seqnum, dggs_type, resolution):
+
+    params = grid_params(dggs_type, resolution)
+    seqnum = np.atleast_1d(np.asarray(seqnum, dtype=np.int64))
+    if ((seqnum < 1) | (seqnum > params['num_cells'])).any():
+        raise ValueError(f"seqnums out of range, {dggs_type} resolution {resolution} has seqnums 1 to {params['num_cells']}")
+
+    s = seqnum - 1
+    if params['quad_0']:
+        # the first cell is quad 0
+        s = s - 1
+
+    quad = s // params['offset_per_quad'] + 1
+    s = s - (quad - 1) * params['offset_per_quad']
+
+    if params['topology'] == 'HEXAGON' and not params['class_i']:
+        num_i = params['max_i'] + 1
+        i = (s * 3) // num_i
+        j = (s * 3) % num_i + np.select([i % 3 == 1, i % 3 == 2], [2, 1], 0)
+    else:
+        i = s // (params['max_j'] + 1)
+        j = s % (params['max_j'] + 1)
+
+    if params['quad_0']:
+        first = seqnum == 1
+        quad = np.where(first, 0, quad)
+        i = np.where(first, 0, i)
+        j = np.where(first, 0, j)
+
+    return quad, i, j
+
+
+"""
+the cell vertices of Q2DI addresses in the quad coordinates (Q2DD), from the cell centers (invQuantify) and the vertex
+offsets of the grids (setAddVertices), shape (cells, vertices per cell)
+"""
+def q2di_cell_vertices(i, j, params):
+
+    sqrt3 = np.sqrt(3.0)
+    i = np.asarray(i, dtype=np.float64)[:, None]
+    j = np.asarray(j, dtype=np.float64)[:, None]
+
+    if params['topology'] == 'HEXAGON':
+        r = 1.0 / sqrt3
+        off_x = np.array([0.0, -0.5, -0.5, 0.0, 0.5, 0.5])
+        off_y = np.array([r, r / 2.0, -r / 2.0, -r, -r / 2.0, r / 2.0])
+
+        x = i - 0.5 * j
+        y = j * 1.5 * r
+        if not params['class_i']:
+            # substrate cell center to the class II grid, the vertices are the ones of the 30º rotated surrogate grid
+            x = x / sqrt3
+            y = y / sqrt3
+            angle = np.radians(330.0)
+            off_x, off_y = off_x * np.cos(angle) - off_y * np.sin(angle), off_x * np.sin(angle) + off_y * np.cos(angle)
+
+        vx = x + off_x
+        vy = y + off_y
+    elif params['topology'] == 'TRIANGLE':
+        e = sqrt3
+        x = i * e - ((j + 1) // 2) * e / 2.0
+        y = 1.5 * (j // 2) + 0.5 * (j % 2)
+
+        up = (j % 2) == 0
+        vx = x + np.where(up, [-e / 2.0, 0.0, e / 2.0], [-e / 2.0, e / 2.0, 0.0])
+        vy = y + np.where(up, [-0.5, 1.0, -0.5], [0.5, 0.5, -1.0])
+    else:
+        y_off = sqrt3 / 4.0
+        y = j * (y_off * 2.0)
+        x = i - (sqrt3 / 3.0) * y
+
+        vx = x + np.array([-0.25, 0.75, 0.25, -0.75])
+        vy = y + np.array([-y_off, -y_off, y_off, y_off])
+
+    fac = np.float64(params['fac'])
+    return (vx - np.float64(params['trans_x'])) / fac, (vy - np.float64(params['trans_y'])) / fac
+
+
+def sub_triangle(x, y):
+
+    # DgQ2DDtoVertex2DDConverter::compute_subtriangle, the 6 sub triangles around the quad vertex, clockwise from the top
+    tol = 0.000000000000001
+    xs = np.sqrt(3.0) * x
+    xpp = xs + tol
+    xmp = -xs + tol
+    xpm = xs - tol
+    xmm = -xs - tol
+
+    return np.select([
+        (y >= xmm) & (y > xpp),
+        ((np.abs(y) <= tol) & (np.abs(x) <= tol)) | ((y <= xpp) & (y >= -tol)),
+        (y < -tol) & (y > xmp),
+        (y <= xmp) & (y < xpm),
+        (y >= xpm) & (y < -tol),
+        (y >= -tol) & (y < xmm)
+        ], range(6), -1)
+
+
+"""
+inverse ISEA projection (snyderInv) of the x/y coordinates within the triangles tri to lon/lat (radians)
+"""
+def isea_inverse(tri, tri_x, tri_y, ico, c):
+
+    cen_lon = ico['cen_lon'][tri]
+    cen_sin_lat = ico['cen_sin_lat'][tri]
+    cen_cos_lat = ico['cen_cos_lat'][tri]
+
+    px = tri_x * c['icosaEdge'] - c['originXOff']
+    py = tri_y * c['icosaEdge'] - c['originYOff']
+    at_center = (np.abs(px) < c['PRECISION']) & (np.abs(py) < c['PRECISION'])
+
+    ph = np.sqrt(px * px + py * py)
+    azh1 = np.arctan2(px, py)
+    azh1 = np.where(azh1 < 0.0, azh1 + 2.0 * C_PI, azh1)
+    azh0 = azh1
+    azh1 = np.where((azh1 > c['deg120']) & (azh1 <= c['deg240']), azh1 - c['deg120'], azh1)
+    azh1 = np.where(azh1 > c['deg240'], azh1 - c['deg240'], azh1)
+
+    active = np.abs(azh1) > c['PRECISION']
+    azh1 = np.where(active, azh1, 0.0)
+    azh = azh1
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        agh = c['R1S'] * c['tanDH'] * c['tanDH'] / (2.0 * (1.0 / np.tan(azh1) + c['cot30']))
+
+        # Newton iterations for the azimuth on the icosahedron
+        for iteration in range(100):
+            if not active.any():
+                break
+            h = np.arccos(np.sin(azh) * c['sinGH'] * c['cosDH'] - np.cos(azh) * c['cosGH'])
+            fazh = agh - azh - c['GH'] - h + C_PI
+            flazh = ((np.cos(azh) * c['sinGH'] * c['cosDH'] + np.sin(azh) * c['cosGH']) / np.sin(h)) - 1.0
+            dazh = -fazh / flazh
+            azh = np.where(active, azh + dazh, azh)
+            active &= np.abs(dazh) > c['PRECISION']
+
+    dz = np.arctan2(c['tanDH'], np.cos(azh) + c['cot30'] * np.sin(azh))
+    fh = c['tanDH'] / (2.0 * (np.cos(azh1) + c['cot30'] * np.sin(azh1)) * np.sin(dz / 2.0))
+    z = 2.0 * np.arcsin(np.clip(ph / (2.0 * c['R1'] * fh), -1.0, 1.0))
+
+    azh = np.where((azh0 >= c['deg120']) & (azh0 < c['deg240']), azh + c['deg120'], azh)
+    azh = np.where(azh0 >= c['deg240'], azh + c['deg240'], azh)
+
+    # now reposition to the actual triangle
+    azh = azh + ico['dazh'][tri]
+    azh = np.where(azh <= -C_PI, azh + 2.0 * C_PI, azh)
+    azh = np.where(azh > C_PI, azh - 2.0 * C_PI, azh)
+
+    # the point at distance z and azimuth azh from the triangle center, as vector to stay precise close to the poles
+    cos_lon = np.cos(cen_lon)
+    sin_lon = np.sin(cen_lon)
+    north = np.cos(azh) * np.sin(z)
+    east = np.sin(azh) * np.sin(z)
+    px = np.cos(z) * cen_cos_lat * cos_lon - north * cen_sin_lat * cos_lon - east * sin_lon
+    py = np.cos(z) * cen_cos_lat * sin_lon - north * cen_sin_lat * sin_lon + east * cos_lon
+    pz = np.cos(z) * cen_sin_lat + north * cen_cos_lat
+
+    lat = np.arctan2(pz, np.sqrt(px * px + py * py))
+    lon = np.arctan2(py, px)
+
+    # dggrid's long double sin(lat) rounds to 1 within 2^-32 radians of the poles, these points are on the poles
+    at_pole = (c['M_PI_2'] - np.abs(lat)) < 2.0**-32
+    lat = np.where(at_pole, np.sign(lat) * c['M_PI_2'], lat)
+    lon = np.where(at_pole, 0.0, lon)
+
+    lat = np.where(at_center, np.arcsin(cen_sin_lat), lat)
+    lon = np.where(at_center, cen_lon, lon)
+
+    return lon, lat
+
+
+"""
+quad coordinates (Q2DD) to lon/lat (degrees) through the icosahedron triangles (DgQ2DDtoVertex2DDConverter,
+DgVertex2DDtoProjTri, snyderInv), NaN for the points that fall into the gap at an icosahedron vertex
+"""
+def q2dd_to_geo(quad, x, y, keep_gap=False):
+
+    c = constants(np.float64)
+    ico = icosahedron_as(np.float64)
+
+    sub = sub_triangle(x, y)
+    if (sub < 0).any():
+        raise ValueError("quad coordinates out of range")
+
+    tri = vert_tri[quad, sub]
+    gap = tri < 0
+    if keep_gap and gap.any():
+        # points on the border of the gap, move them to the sub triangle next to it
+        side = np.degrees(np.arctan2(y, x)) - (90.0 - 60.0 * sub)
+        side = (side + 180.0) % 360.0 - 180.0
+        sub = np.where(gap, (sub + np.where(side > 0, -1, 1)) % 6, sub)
+        tri = vert_tri[quad, sub]
+        gap = tri < 0
+
+    tri_x = x + vert_table[quad, sub, 1]
+    tri_y = y + vert_table[quad, sub, 2] * c['M_SIN60']
+
+    # rotate by -60º per rot60 (DgDVec2D::rotate)
+    angle = np.radians(((-60 * vert_rot60[quad, sub]) % 360).astype(np.float64))
+    cos_angle = np.where(angle == 0.0, 1.0, np.cos(angle))
+    sin_angle = np.where(angle == 0.0, 0.0, np.sin(angle))
+    tri_x, tri_y = tri_x * cos_angle - tri_y * sin_angle, tri_x * sin_angle + tri_y * cos_angle
+
+    lon, lat = isea_inverse(np.where(gap, 0, tri), tri_x, tri_y, ico, c)
+
+    # DgGeoCoord::normalize
+    lon = lon * c['M_180_PI']
+    lat = lat * c['M_180_PI']
+    lon = np.where(np.abs(lat) >= 90.0 - c['geo_tolerance'], 0.0, lon)
+    lon = np.where(lon <= -180.0, lon + 360.0, lon)
+    lon = np.where(lon > 180.0, lon - 360.0, lon)
+
+    return np.where(gap, np.nan, lon), np.where(gap, np.nan, lat)
+
+
+"""
+the number of points to add on every cell edge (densification) so that the edges of the cells at resolution are split
+into segments of at most max_degrees, from the longest cell edge in the quads (an icosahedron edge long) stretched by
+the distortion of the projection
+"""
+def edge_densification(dggs_type, resolution, max_degrees):
+
+    if max_degrees is None or max_degrees <= 0:
+        return 0
+
+    params = grid_params(dggs_type, resolution)
+    x, y = q2di_cell_vertices(np.array([2]), np.array([2]), params)
+    edge = np.hypot(x - np.roll(x, -1, axis=1), y - np.roll(y, -1, axis=1)).max()
+
+    degrees = edge * np.degrees(np.arctan(2.0)) * 1.5
+    return max(int(np.ceil(degrees / max_degrees)) - 1, 0)
+
+
+"""
+the vertices (lon/lat degrees) of the cells with the Q2DI addresses, shape (cells, vertices per cell). The hexagons on
+the icosahedron vertices are pentagons, their missing vertex is NaN (DgIDGG::setAddVertices)
+
+densification adds that many points on every edge like dggrid's densification parameter (DgPolygon::densify): they
+are placed evenly between the vertices in the quad coordinates and go through the inverse projection, so that the
+edges follow the cell boundaries on the sphere. The points of the pentagons that fall into the gap are NaN as well
+"""
+def q2di_to_vertices(quad, i, j, dggs_type, resolution, densification=0):
+
+    params = grid_params(dggs_type, resolution)
+    quad = np.atleast_1d(np.asarray(quad, dtype=np.int64))
+    i = np.atleast_1d(np.asarray(i, dtype=np.int64))
+    j = np.atleast_1d(np.asarray(j, dtype=np.int64))
+
+    x, y = q2di_cell_vertices(i, j, params)
+    if densification > 0:
+        frac = np.arange(densification + 1, dtype=np.float64) / (densification + 1)
+        x = (x[:, :, None] + (np.roll(x, -1, axis=1) - x)[:, :, None] * frac).reshape(len(x), -1)
+        y = (y[:, :, None] + (np.roll(y, -1, axis=1) - y)[:, :, None] * frac).reshape(len(y), -1)
+    quad = np.broadcast_to(quad[:, None], x.shape)
+
+    # only the vertex cells of the hexagon grids lose a vertex into the gap
+    pentagon = (params['topology'] == 'HEXAGON') & (i == 0) & (j == 0)
+    keep_gap = np.broadcast_to(~pentagon[:, None], x.shape)
+
+    lon = np.full(x.shape, np.nan)
+    lat = np.full(x.shape, np.nan)
+    for keep in [True, False]:
+        todo = keep_gap == keep
+        if todo.any():
+            lon[todo], lat[todo] = q2dd_to_geo(quad[todo], x[todo], y[todo], keep_gap=keep)
+
+    return lon, lat
+
+
+"""
+the ring of a cell with a vertex on a pole or an edge over it: the pole becomes an edge along the pole from the longitude
+of the edge that ends in it to the one of the edge that leaves it, so that the cell is a valid polygon in lon/lat
+"""
+def pole_ring(lon, lat):
+
+    ring = []
+    n = len(lon)
+    for k in range(n):
+        k_prev, k_next = (k - 1) % n, (k + 1) % n
+        if np.abs(lat[k]) > 90.0 - pole_tolerance:
+            ring += [ (lon[k_prev], np.sign(lat[k]) * 90.0), (lon[k_next], np.sign(lat[k]) * 90.0) ]
+            continue
+
+        ring.append((lon[k], lat[k]))
+        if np.abs(lat[k_next]) <= 90.0 - pole_tolerance and np.abs(np.abs(lon[k_next] - lon[k]) - 180.0) < pole_tolerance:
+            # the great circle between opposite meridians runs over the pole on the side of the points
+            pole = np.sign(lat[k] + lat[k_next]) * 90.0
+            ring += [ (lon[k], pole), (lon[k_next], pole) ]
+
+    return np.array(ring, dtype=np.float64)
+
+
+"""
+the ring of a cell around a pole: cut at the 180º meridian and closed along the pole, from -180º to 180º
+"""
+def pole_cap_ring(lon, lat):
+
+    # start after the edge crossing the 180º meridian
+    k = np.flatnonzero(np.abs(np.diff(np.append(lon, lon[0]))) > 180.0)[0]
+    lon = np.roll(lon, -(k + 1))
+    lat = np.roll(lat, -(k + 1))
+
+    side = np.sign(lon[0]) * 180.0
+    crossing = lat[-1] + (lat[0] - lat[-1]) * (-side - lon[-1]) / (lon[0] - 2.0 * side - lon[-1])
+    pole = np.sign(lat.mean()) * 90.0
+
+    ring = [ (side, crossing) ] + list(zip(lon, lat)) + [ (-side, crossing), (-side, pole), (side, pole) ]
+    return np.array(ring, dtype=np.float64)
+
+
+"""
+the cell polygons of q2di_to_polygons that run along a pole (pole_ring, pole_cap_ring), and which of them cross the
+180º meridian. The cells around a pole (pole_cap_ring) reach from -180º to 180º and are cut at the meridian already.
+The others are drawn along the pole between the longitudes of their neighbouring vertices and cross the meridian when
+they are wider than 180º, up to the rounding of the cells running over the pole between opposite meridians
+"""
+def pole_cells(geometries):
+
+    geometries = np.asarray(geometries)
+    coords, index = shapely.get_coordinates(geometries, return_index=True)
+    on_pole = np.abs(coords[:, 1]) > 90.0 - pole_tolerance
+
+    along_pole = np.bincount(index[on_pole], minlength=len(geometries)) > 0
+    west = np.bincount(index[on_pole & (coords[:, 0] < -180.0 + pole_tolerance)], minlength=len(geometries)) > 0
+    east = np.bincount(index[on_pole & (coords[:, 0] > 180.0 - pole_tolerance)], minlength=len(geometries)) > 0
+
+    bounds = shapely.bounds(geometries)
+    with np.errstate(invalid='ignore'):
+        wide = (bounds[:, 2] - bounds[:, 0]) > 180.0 + pole_tolerance
+
+    return along_pole, along_pole & wide & ~(west & east)
+
+
+"""
+the cell polygons of the Q2DI addresses as shapely geometry array, densification see q2di_to_vertices. The cells that
+touch a pole run along the pole (pole_ring), the cells around a pole are cut at the 180º meridian (pole_cap_ring), the
+other cells crossing the 180º meridian wrap around like dggrid's
+"""
+def q2di_to_polygons(quad, i, j, dggs_type, resolution, densification=0):
+
+    lon, lat = q2di_to_vertices(quad, i, j, dggs_type, resolution, densification)
+
+    valid = ~np.isnan(lon)
+    cells = np.broadcast_to(np.arange(len(lon))[:, None], lon.shape)[valid]
+    coords = np.column_stack([lon[valid], lat[valid]])
+
+    with np.errstate(invalid='ignore'):
+        on_pole = np.abs(lat) > 90.0 - pole_tolerance
+        over_pole = np.abs(np.abs(np.roll(lon, -1, axis=1) - lon) - 180.0) < pole_tolerance
+        touch = (on_pole | over_pole).any(axis=1)
+
+        # the longitudes of the cells around a pole turn by 360º
+        turn = np.roll(lon, -1, axis=1) - lon
+        turn = (turn + 180.0) % 360.0 - 180.0
+        around = ~touch & (np.abs(np.nansum(turn, axis=1)) > 180.0)
+    polar = np.flatnonzero(touch | around)
+
+    if len(polar) > 0:
+        # only a few cells around the poles, their rings are rebuilt one by one
+        rings = [ (pole_ring if touch[k] else pole_cap_ring)(lon[k][valid[k]], lat[k][valid[k]]) for k in polar ]
+        keep = ~np.isin(cells, polar)
+        cells = np.concatenate([cells[keep]] + [ np.full(len(ring), k) for k, ring in zip(polar, rings) ])
+        coords = np.concatenate([coords[keep]] + rings)
+
+        order = np.argsort(cells, kind='stable')
+        cells, coords = cells[order], coords[order]
+
+    return shapely.polygons(shapely.linearrings(coords, indices=cells))
+
+
+"""
+the cell polygons of dggrid's sequence numbers (SEQNUM) as shapely geometry array, in the order of the seqnums,
+densification see q2di_to_vertices
+"""
+def seqnum_to_polygons(seqnum, dggs_type, resolution, densification=0):
+
+    quad, i, j = seqnum_to_q2di(seqnum, dggs_type, resolution)
+    return q2di_to_polygons(quad, i, j, dggs_type, resolution, densification)
+
+
+"""
+the seqnums of the cells at resolution containing points given in the quad coordinates (Q2DD) of another resolution of
+the same grid. The points must lie inside of the cells, not on their boundaries
+"""
+def q2dd_to_seqnum(quad, x, y, dggs_type, resolution):
+
+    params = grid_params(dggs_type, resolution)
+    c = constants(np.float64)
+
+    shape = x.shape
+    quad = np.broadcast_to(quad, shape).ravel()
+    x = x.ravel()
+    y = y.ravel()
+
+    # the points in cells away from the quad edges are quantized in their quad, the others go through the sphere, so
+    # that the points beyond the quad edges end up in the right quad
+    i, j = quantify(*to_grid(x, y, params), params, c)
+    if params['topology'] == 'HEXAGON':
+        # the hexagons on the quad edges lie in two quads, class II addresses are in the substrate grid
+        margin = 1 if params['class_i'] else 3
+        inner = (i >= margin) & (j >= margin) & (i <= params['max_i'] + 1 - margin) & (j <= params['max_j'] + 1 - margin)
+    else:
+        inner = (i >= 0) & (j >= 0) & (i <= params['max_i']) & (j <= params['max_j'])
+    inner &= (quad > 0) & (quad < 11)
+
+    seqnum = np.zeros(len(quad), dtype=np.int64)
+    seqnum[inner] = q2di_to_seqnum(quad[inner], i[inner], j[inner], dggs_type, resolution)
+
+    if not inner.all():
+        lon, lat = q2dd_to_geo(quad[~inner], x[~inner], y[~inner], keep_gap=True)
+        seqnum[~inner] = geo_to_seqnum(lon, lat, dggs_type, resolution)
+
+    return seqnum.reshape(shape)
+
+
+"""
+the points of the cells that lie in the related cells of the hexagon grids (DgIDGGS3H, DgIDGGS4H): for aperture 4
+the edge midpoints (boundary children and parents), for aperture 3 the vertices, returned with a mask of the valid points
+"""
+def hexagon_boundary_points(quad, i, j, params):
+
+    vx, vy = q2di_cell_vertices(i, j, params)
+
+    if params['aperture'] == 4:
+        # the midpoints at the gap of the pentagons fall on the same point, which the CSR removes as repeated cell
+        return (vx + np.roll(vx, -1, axis=1)) / 2.0, (vy + np.roll(vy, -1, axis=1)) / 2.0, np.ones(vx.shape, dtype=bool)
+
+    # the vertex in the gap of a pentagon is no vertex
+    pentagon = ((i == 0) & (j == 0))[:, None]
+    gap = vert_tri[np.broadcast_to(quad[:, None], vx.shape), sub_triangle(vx, vy)] < 0
+
+    return vx, vy, ~(pentagon & gap)
+
+
+"""
+the children of the seqnums at resolution + 1 as CSR (offsets, values), interior children first (the center child of
+the hexagons, all children of the triangles and diamonds), then the boundary children (DgIDGGS::setAddAllChildren)
+"""
+def seqnum_children(seqnum, dggs_type, resolution):
+
+    params = grid_params(dggs_type, resolution)
+    grid_params(dggs_type, resolution + 1)
+    quad, i, j = seqnum_to_q2di(seqnum, dggs_type, resolution)
+
+    if params['topology'] == 'TRIANGLE':
+        # DgIDGGS4T::setAddInteriorChildren, from the lower left corner of the up triangles and the upper right corner of the down triangles
+        up = ((j % 2) == 0)[:, None]
+        ci = np.where(up, 2 * i[:, None] + np.array([0, 1, 1, 1]), 2 * i[:, None] + np.array([1, 0, 0, 0]))
+        cj = np.where(up, 2 * j[:, None] + np.array([0, 0, 1, 2]), 2 * j[:, None] + 1 - np.array([0, 0, 1, 2]))
+        cells = q2di_to_seqnum(np.repeat(quad, 4), ci.ravel(), cj.ravel(), dggs_type, resolution + 1).reshape(ci.shape)
+        return rows_to_csr(cells)
+
+    if params['topology'] == 'DIAMOND':
+        # DgIDGGS4D::setAddInteriorChildren
+        ci = 2 * i[:, None] + np.array([0, 0, 1, 1])
+        cj = 2 * j[:, None] + np.array([0, 1, 0, 1])
+        cells = q2di_to_seqnum(np.repeat(quad, 4), ci.ravel(), cj.ravel(), dggs_type, resolution + 1).reshape(ci.shape)
+        return rows_to_csr(cells)
+
+    # the center child contains the cell center, the boundary children contain the edge midpoints or vertices
+    bx, by, valid = hexagon_boundary_points(quad, i, j, params)
+    cx, cy = q2di_cell_vertices(i, j, params)
+    px = np.column_stack([cx.mean(axis=1), bx])
+    py = np.column_stack([cy.mean(axis=1), by])
+    valid = np.column_stack([np.ones(len(quad), dtype=bool), valid])
+
+    cells = np.zeros(px.shape, dtype=np.int64)
+    cells[valid] = q2dd_to_seqnum(np.broadcast_to(quad[:, None], px.shape)[valid], px[valid], py[valid], dggs_type, resolution + 1)
+
+    return rows_to_csr(cells, valid)
+
+
+"""
+the parents of the seqnums at resolution - 1 as CSR (offsets, values) in ascending order (DgIDGGS::setAddParents): the
+cell containing the cell center for the triangles and diamonds, the cells containing the edge midpoints (aperture 4) or
+the vertices (aperture 3) for the hexagons. The boundary children of the hexagon grids have several parents
+"""
+def seqnum_parents(seqnum, dggs_type, resolution):
+
+    if resolution < 1:
+        raise ValueError("the cells of resolution 0 have no parents")
+
+    params = grid_params(dggs_type, resolution)
+    quad, i, j = seqnum_to_q2di(seqnum, dggs_type, resolution)
+    vx, vy = q2di_cell_vertices(i, j, params)
+
+    if params['topology'] == 'HEXAGON':
+        px, py, valid = hexagon_boundary_points(quad, i, j, params)
+    else:
+        px, py = vx.mean(axis=1)[:, None], vy.mean(axis=1)[:, None]
+        valid = np.ones(px.shape, dtype=bool)
+
+    cells = np.zeros(px.shape, dtype=np.int64)
+    cells[valid] = q2dd_to_seqnum(np.broadcast_to(quad[:, None], px.shape)[valid], px[valid], py[valid], dggs_type, resolution - 1)
+
+    return csr_sort_rows(*rows_to_csr(cells, valid))
+
+
+"""
+the neighbours of the seqnums, the cells sharing an edge with them, as CSR (offsets, values) in ascending order. The
+neighbour across an edge contains the point a quarter of the way from the edge midpoint to the neighbour's center
+"""
+def seqnum_neighbours(seqnum, dggs_type, resolution):
+
+    params = grid_params(dggs_type, resolution)
+    seqnum = np.atleast_1d(np.asarray(seqnum, dtype=np.int64))
+    quad, i, j = seqnum_to_q2di(seqnum, dggs_type, resolution)
+    vx, vy = q2di_cell_vertices(i, j, params)
+
+    cx = vx.mean(axis=1)[:, None]
+    cy = vy.mean(axis=1)[:, None]
+    mx = (vx + np.roll(vx, -1, axis=1)) / 2.0
+    my = (vy + np.roll(vy, -1, axis=1)) / 2.0
+
+    px = cx + 1.25 * (mx - cx)
+    py = cy + 1.25 * (my - cy)
+    cells = q2dd_to_seqnum(quad[:, None], px, py, dggs_type, resolution)
+
+    # across the gap of the pentagons the point can fall back into the cell
+    return csr_sort_rows(*rows_to_csr(cells, cells != seqnum[:, None]))
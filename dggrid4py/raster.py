@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+try:
+    import rasterio
+    from rasterio.windows import Window
+    from rasterio.warp import transform as warp_transform
+    has_rasterio = True
+except ImportError:
+    has_rasterio = False
+
+
+"""
+the (col_off, row_off, width, height) windows of at most block_size x block_size pixels covering the raster, row by row
+"""
+def raster_windows(raster_path, block_size):
+
+    if not has_rasterio:
+        raise ValueError("reading rasters needs rasterio")
+
+    with rasterio.open(raster_path) as src:
+        width, height = src.width, src.height
+
+    return [ (col_off, row_off, min(block_size, width - col_off), min(block_size, height - row_off))
+             for row_off in range(0, height, block_size) for col_off in range(0, width, block_size) ]
+
+
+"""
+reads a window of the band of the raster and returns the WGS84 lon lat of the pixel centres and the pixel values, without
+the nodata (masked) and NaN pixels. Every call opens the raster on its own, so that windows can be read in parallel
+"""
+def read_raster_window(raster_path, window, band=1):
+
+    col_off, row_off, width, height = window
+
+    with rasterio.open(raster_path) as src:
+        values = src.read(band, window=Window(col_off, row_off, width, height), masked=True)
+        affine = src.transform
+        crs = src.crs
+
+    valid = ~np.ma.getmaskarray(values)
+    if np.issubdtype(values.dtype, np.floating):
+        valid &= np.isfinite(values.data)
+    rows, cols = np.nonzero(valid)
+
+    # the affine transform of the pixel centres
+    c = cols + (col_off + 0.5)
+    r = rows + (row_off + 0.5)
+    x = affine.a * c + affine.b * r + affine.c
+    y = affine.d * c + affine.e * r + affine.f
+
+    if not crs is None and not crs == rasterio.crs.CRS.from_epsg(4326) and len(x) > 0:
+        x, y = warp_transform(crs, 'EPSG:4326', x, y)
+
+    return np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64), values.data[valid]
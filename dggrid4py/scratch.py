@@ -0,0 +1,343 @@
+# -*- coding: utf-8 -*-
+
+from pathlib import Path
+import contextvars
+import io
+import os
+import stat
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+
+
+"""
+the default root of scratch directories: /dev/shm (tmpfs, in memory) where it exists and is writable, else the system
+temp dir
+"""
+def default_scratch_root():
+
+    shm = Path('/dev/shm')
+    if shm.is_dir() and os.access(shm, os.W_OK):
+        return shm
+
+    return Path(tempfile.gettempdir())
+
+
+"""
+pool of pre-created worker directories that dggrid runs are started in. Every run checks out a directory, writes its
+metafile there under a fixed name and returns the directory afterwards, so that no files and directories are created and
+removed per run. The number of directories limits how many runs use the pool at the same time, the most recently
+returned directory is handed out first. A pool can be shared between instances.
+"""
+class WorkerDirPool(object):
+
+    def __init__(self, size, root=None):
+        if size < 1:
+            raise ValueError(f"a worker dir pool needs at least one directory, not {size}")
+
+        self.size = size
+        self.root = Path(tempfile.mkdtemp(prefix='dggrid_workers_', dir=default_scratch_root() if root is None else root)).resolve()
+        self._free = []
+        self._available = threading.Condition()
+
+        for k in reversed(range(size)):
+            worker_dir = self.root / f"worker_{k}"
+            worker_dir.mkdir()
+            self._free.append(worker_dir)
+
+
+    @contextmanager
+    def acquire(self, block=True):
+        """
+        checks out a worker directory for the duration of the with block, waits for one if all are in use. With
+        block=False it yields None instead of waiting
+        """
+        with self._available:
+            while len(self._free) == 0 and block:
+                self._available.wait()
+            worker_dir = self._free.pop() if len(self._free) > 0 else None
+
+        try:
+            yield worker_dir
+        finally:
+            if not worker_dir is None:
+                with self._available:
+                    self._free.append(worker_dir)
+                    self._available.notify()
+
+
+    def metafile(self, worker_dir):
+        """
+        the metafile of the runs in the worker directory, overwritten by every run
+        """
+        return worker_dir / 'metafile'
+
+
+    def close(self):
+        """
+        removes the worker directories
+        """
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+"""
+drains the named pipe at path in a thread for the duration of the with block, the dggrid run writing its text output into
+it, so that the output never touches the disk. Yields the BytesIO the output is collected into, complete after the block,
+or None if path is not a named pipe. With consume, every block read is passed to consume(block) as soon as it arrives
+instead, and nothing is collected
+"""
+@contextmanager
+def drain_fifo(path, consume=None):
+
+    if path is None or not Path(path).exists() or not stat.S_ISFIFO(os.stat(path).st_mode):
+        yield None
+        return
+
+    output = io.BytesIO() if consume is None else None
+    errors = []
+
+    def drain():
+        try:
+            with open(path, 'rb') as src:
+                while True:
+                    block = src.read(1 << 20)
+                    if len(block) == 0:
+                        break
+                    if consume is None:
+                        output.write(block)
+                    elif len(errors) == 0:
+                        try:
+                            consume(block)
+                        except Exception as e:
+                            # dggrid blocks when the pipe isn't drained, the rest of the output is discarded
+                            errors.append(e)
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=bind_context(drain), daemon=True)
+    thread.start()
+
+    try:
+        yield output
+    finally:
+        # the reader blocks in open() until a writer opens the pipe, if dggrid didn't (e.g. when it failed) this does
+        while thread.is_alive():
+            try:
+                os.close(os.open(path, os.O_WRONLY | os.O_NONBLOCK))
+            except OSError:
+                # no reader yet, the thread didn't reach open() so far
+                pass
+            thread.join(0.01)
+
+    if len(errors) > 0:
+        raise errors[0]
+
+    if not output is None:
+        output.seek(0)
+
+
+"""
+writes the byte blocks of the iterable blocks into the named pipe at path in a thread for the duration of the with block,
+the dggrid run reading its input from it, so that the blocks are produced while dggrid runs. The writer stops when dggrid
+closes the pipe early
+"""
+@contextmanager
+def feed_fifo(path, blocks):
+
+    errors = []
+
+    def feed():
+        try:
+            with open(path, 'wb') as dst:
+                for block in blocks:
+                    dst.write(block)
+        except BrokenPipeError:
+            pass
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=bind_context(feed), daemon=True)
+    thread.start()
+
+    try:
+        yield
+    finally:
+        # the writer blocks in open() until a reader opens the pipe, if dggrid didn't this does, the writer then fails
+        # with a broken pipe
+        while thread.is_alive():
+            try:
+                os.close(os.open(path, os.O_RDONLY | os.O_NONBLOCK))
+            except OSError:
+                pass
+            thread.join(0.01)
+
+    if len(errors) > 0:
+        raise errors[0]
+
+
+"""
+the TempFileTracker.measure blocks the current context (thread or asyncio task) is in, innermost last
+"""
+_measures = contextvars.ContextVar('dggrid4py_temp_file_measures', default=())
+
+
+"""
+returns fn bound to the context (contextvars) of the caller: every call runs in its own copy of it, also in other
+threads. The work a call hands to thread pools and threads is counted in the TempFileTracker.measure blocks of the call
+"""
+def bind_context(fn):
+
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+
+    return run
+
+
+"""
+accounting of the temporary files of an instance: the files that are created (inputs written by Python, metafiles, and
+the outputs dggrid writes), the bytes written into the inputs and metafiles, the bytes read from the outputs and the files
+still alive, i.e. not removed yet. Only files that exist are counted: the outputs of dggrid are counted when they are
+found or removed, paths that were never created are ignored. A file that can't be removed stays alive, so leaks show up
+in stats().
+
+measure() counts the files of a call in a child tracker of its own, that also rolls up into its parent
+"""
+class TempFileTracker(object):
+
+    def __init__(self, parent=None):
+        self._lock = threading.Lock()
+        self._alive = set()
+        self._counters = { 'files_created': 0, 'files_removed': 0, 'bytes_written': 0, 'bytes_read': 0 }
+        self._parent = parent
+
+
+    def _trackers(self):
+        # this tracker and the children of the measure blocks of the current context
+        return [self] + [ child for child in _measures.get() if child._parent is self ]
+
+
+    def _count(self, counter, value):
+        for tracker in self._trackers():
+            with tracker._lock:
+                tracker._counters[counter] += value
+
+
+    def add(self, *paths):
+        """
+        tracks files that were created
+        """
+        for tracker in self._trackers():
+            with tracker._lock:
+                for path in paths:
+                    if not str(path) in tracker._alive:
+                        tracker._alive.add(str(path))
+                        tracker._counters['files_created'] += 1
+
+
+    def written(self, path=None, size=None):
+        """
+        counts the bytes written into a file (its size) or size bytes written e.g. into a pipe
+        """
+        self._count('bytes_written', _size(path) if size is None else size)
+
+
+    def read(self, path=None, size=None):
+        """
+        counts the bytes read from a file or BytesIO (its size) or size bytes read e.g. from a pipe. A file that isn't
+        tracked yet, an output of dggrid, is counted as created
+        """
+        if not path is None and not isinstance(path, io.BytesIO) and os.path.lexists(str(path)):
+            self.add(path)
+
+        self._count('bytes_read', _size(path) if size is None else size)
+
+
+    def remove(self, *paths):
+        """
+        removes the files, existing files that weren't tracked yet (e.g. written by dggrid, or partially written by a
+        failed write) are counted as created first. Tracked files that are already gone count as removed, untracked
+        missing files are ignored
+        """
+        for path in paths:
+            if os.path.lexists(str(path)):
+                self.add(path)
+
+            try:
+                os.remove(str(path))
+            except FileNotFoundError:
+                pass
+            except OSError:
+                # still there, stays alive
+                continue
+
+            for tracker in self._trackers():
+                with tracker._lock:
+                    if str(path) in tracker._alive:
+                        tracker._alive.discard(str(path))
+                        tracker._counters['files_removed'] += 1
+
+
+    def stats(self):
+        """
+        the counters: files_created, files_removed, files_alive, bytes_written and bytes_read
+        """
+        with self._lock:
+            return dict(self._counters, files_alive=len(self._alive))
+
+
+    def alive(self):
+        """
+        the paths of the files still alive
+        """
+        with self._lock:
+            return sorted(self._alive)
+
+
+    @contextmanager
+    def measure(self):
+        """
+        yields a dict that holds the counters of the with block after it, e.g. the I/O of a call. The block counts in a
+        child tracker that only sees the current context and the work handed on from it (bind_context), so calls running
+        at the same time in other threads or tasks are not included. Nested blocks count in every enclosing block
+        """
+        counts = {}
+        child = self.child()
+        try:
+            with child.counting():
+                yield counts
+        finally:
+            counts.update(child.stats())
+
+
+    def child(self):
+        """
+        a new child tracker of this tracker, it counts while it is counting() in the current context
+        """
+        return TempFileTracker(parent=self)
+
+
+    @contextmanager
+    def counting(self):
+        """
+        counts the files of the parent in this child tracker, in the current context for the duration of the with block.
+        A generator enters it around every step it takes
+        """
+        token = _measures.set(_measures.get() + (self,))
+        try:
+            yield self
+        finally:
+            _measures.reset(token)
+
+
+def _size(path):
+
+    if isinstance(path, io.BytesIO):
+        return path.getbuffer().nbytes
+
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+import shapely
+from shapely.geometry import box, MultiPolygon, Polygon
+
+from .isea import geo_to_q2dd, q2dd_to_geo
+
+
+"""
+fraction of the earth surface that a WGS84 lon/lat geometry covers, measured in the
+Lambert cylindrical equal-area projection (exact for lon/lat rectangles)
+"""
+def earth_area_fraction(geom):
+
+    def to_equal_area(coords):
+        return np.column_stack([ np.radians(coords[:, 0]), np.sin(np.radians(coords[:, 1])) ])
+
+    return shapely.transform(geom, to_equal_area).area / (4 * np.pi)
+
+
+"""
+helper function to keep only the polygonal parts of an intersection result
+"""
+def polygonal_part(geom):
+    parts = [ part for part in shapely.get_parts(geom) if part.geom_type in ['Polygon', 'MultiPolygon'] and part.area > 0 ]
+    polygons = []
+    for part in parts:
+        polygons.extend(shapely.get_parts(part))
+
+    if len(polygons) == 0:
+        return None
+    if len(polygons) == 1:
+        return polygons[0]
+    return MultiPolygon(polygons)
+
+
+"""
+unit vectors of lon/lat (degrees) and back
+"""
+def lonlat_to_xyz(lon, lat):
+
+    lon = np.radians(lon)
+    lat = np.radians(lat)
+    return np.stack([ np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat) ], axis=-1)
+
+
+def xyz_to_lonlat(xyz):
+
+    return np.degrees(np.arctan2(xyz[..., 1], xyz[..., 0])), np.degrees(np.arcsin(np.clip(xyz[..., 2], -1.0, 1.0)))
+
+
+"""
+points at the fractions t of the great circle arc between the unit vectors a and b
+"""
+def great_circle_points(a, b, t):
+
+    angle = np.arccos(np.clip(np.dot(a, b), -1.0, 1.0))
+    if angle < 1e-15:
+        return np.repeat(a[None, :], len(t), axis=0)
+
+    t = np.asarray(t, dtype=np.float64)[:, None]
+    return (np.sin((1.0 - t) * angle) * a + np.sin(t * angle) * b) / np.sin(angle)
+
+
+"""
+the fractions of the great circle arc between a and b where it leaves a quad, as pairs of fractions just before and
+just after the quad edge, found by bisection between samples at most sample degrees apart
+"""
+def quad_crossings(a, b, sample=0.5, tolerance=1e-12):
+
+    angle = np.degrees(np.arccos(np.clip(np.dot(a, b), -1.0, 1.0)))
+    t = np.linspace(0.0, 1.0, int(np.ceil(angle / sample)) + 1)
+    quad = geo_to_q2dd(*xyz_to_lonlat(great_circle_points(a, b, t)))[0]
+
+    def quad_at(fraction):
+        return geo_to_q2dd(*xyz_to_lonlat(great_circle_points(a, b, [fraction])))[0][0]
+
+    def bisect(lo, hi, quad_lo, quad_hi):
+        # the arc may pass more than one quad between two samples close to an icosahedron vertex
+        if quad_lo == quad_hi:
+            return []
+        if hi - lo <= tolerance:
+            return [(lo, hi)]
+        mid = (lo + hi) / 2.0
+        quad_mid = quad_at(mid)
+        return bisect(lo, mid, quad_lo, quad_mid) + bisect(mid, hi, quad_mid, quad_hi)
+
+    crossings = []
+    for k in np.flatnonzero(quad[1:] != quad[:-1]):
+        crossings.extend(bisect(t[k], t[k + 1], quad[k], quad[k + 1]))
+
+    return crossings
+
+
+"""
+the vertices of a clip edge from (lon0, lat0) to (lon1, lat1), without its end, along the path dggrid clips with:
+dggrid cuts the edge where its great circle leaves a quad (clipping in the gnomonic projection of the quad) and joins
+the vertices in a quad by straight lines in the quad coordinates (Q2DD). The path is densified into segments of at
+most densify degrees
+"""
+def dggrid_edge(lon0, lat0, lon1, lat1, densify):
+
+    a, b = lonlat_to_xyz(np.array([lon0, lon1]), np.array([lat0, lat1]))
+    breaks = [0.0]
+    for lo, hi in quad_crossings(a, b):
+        breaks.extend([lo, hi])
+    breaks.append(1.0)
+
+    lons = []
+    lats = []
+    for start, end in zip(breaks[0::2], breaks[1::2]):
+        # both ends of the piece are in the same quad
+        piece_lon, piece_lat = xyz_to_lonlat(great_circle_points(a, b, [start, end]))
+        quad, x, y = geo_to_q2dd(piece_lon, piece_lat)
+        angle = np.degrees(np.arccos(np.clip(np.dot(*lonlat_to_xyz(piece_lon, piece_lat)), -1.0, 1.0)))
+        steps = max(int(np.ceil(angle / densify)), 1)
+        s = np.arange(steps) / steps
+        lon, lat = q2dd_to_geo(np.full(len(s), quad[0]), x[0] + s * (x[1] - x[0]), y[0] + s * (y[1] - y[0]), keep_gap=True)
+
+        # the longitudes of the edge, not the normalized ones, e.g. for edges on the 180º meridian
+        along = lon0 + (start + s * (end - start)) * (lon1 - lon0)
+        lons.append(along + ((lon - along + 180.0) % 360.0 - 180.0))
+        lats.append(lat)
+
+    return np.concatenate(lons), np.concatenate(lats)
+
+
+"""
+densifies the edges of a lon/lat clip geometry along the paths dggrid clips with (see dggrid_edge). The straight lon/lat
+cuts of the tiling then add vertices dggrid joins the same way as the edges of the whole clip geometry
+"""
+def dggrid_clip_edges(geom, densify):
+
+    def ring(coords):
+        coords = np.asarray(coords)[:, :2]
+        parts = [ dggrid_edge(*coords[k], *coords[k + 1], densify) for k in range(len(coords) - 1) ]
+        return np.column_stack([ np.concatenate([ lon for lon, _ in parts ]), np.concatenate([ lat for _, lat in parts ]) ])
+
+    polygons = [ Polygon(ring(part.exterior.coords), [ ring(interior.coords) for interior in part.interiors ]) for part in shapely.get_parts(geom) ]
+    return polygons[0] if len(polygons) == 1 else MultiPolygon(polygons)
+
+
+"""
+Spatial tiling planner. Splits the clip_geom (or the WHOLE_EARTH if None) into tiles that are each expected to hold
+at most max_cells_per_tile cells of a grid with total_cells cells (e.g. from grid_stats_table). Tiles are found by
+recursive bisection of the lon/lat bounds, splitting the physically longer side, until the estimated cell count and
+the extent (max_tile_degrees) are small enough.
+
+The returned tiles are the intersections of the clip_geom with the (slightly overlapping by overlap degrees) tile
+boxes. dggrid joins the vertices of a clip polygon neither by lon/lat lines nor by great circles, but by straight lines
+in the quad coordinates of the ISEA projection. A cut adds vertices to the clip edges that would change how dggrid joins
+them, so the clip edges are first densified along dggrid's own path into segments of at most clip_densify degrees
+(dggrid_clip_edges). The tiles then cover the same area dggrid clips a single run with, up to the sagitta of these
+segments, and select the same cells. Only the box edges are densified to densify degrees, neighbouring tiles share
+them. Every cell of the clip area is thus selected by at least one tile, the tile results have to be deduplicated by
+seqnum. Tiles stay max_lat degrees away from the poles, because dggrid can't project clip vertices on the poles.
+"""
+def plan_tiles(total_cells, max_cells_per_tile, clip_geom=None, max_tile_degrees=30.0, overlap=1e-6, densify=1.0, max_lat=89.999, clip_densify=0.1):
+
+    if max_cells_per_tile < 1:
+        raise ValueError('max_cells_per_tile must be at least 1')
+
+    if clip_geom is None:
+        # the WHOLE_EARTH edges are meridians and parallels
+        clip_geom = shapely.segmentize(box(-180.0, -max_lat, 180.0, max_lat), densify)
+    else:
+        clip_geom = polygonal_part(clip_geom)
+        if clip_geom is None:
+            return []
+        clip_geom = dggrid_clip_edges(clip_geom, clip_densify)
+
+    clip_geom = polygonal_part(clip_geom.intersection(box(-180.0, -max_lat, 180.0, max_lat)))
+    if clip_geom is None:
+        return []
+
+    tile_boxes = []
+    candidates = [ box(*clip_geom.bounds) ]
+
+    while len(candidates) > 0:
+        tile = candidates.pop()
+        piece = polygonal_part(clip_geom.intersection(tile))
+        if piece is None:
+            continue
+
+        minx, miny, maxx, maxy = tile.bounds
+        width = maxx - minx
+        height = maxy - miny
+        estimated_cells = earth_area_fraction(piece) * total_cells
+
+        too_large = estimated_cells > max_cells_per_tile or width > max_tile_degrees or height > max_tile_degrees
+        # don't split further than any reasonable cell size
+        too_small = width < 1e-4 and height < 1e-4
+
+        if too_large and not too_small:
+            # split the physically longer side in the middle
+            if width * np.cos(np.radians((miny + maxy) / 2.0)) >= height:
+                mid = (minx + maxx) / 2.0
+                candidates.append(box(minx, miny, mid, maxy))
+                candidates.append(box(mid, miny, maxx, maxy))
+            else:
+                mid = (miny + maxy) / 2.0
+                candidates.append(box(minx, miny, maxx, mid))
+                candidates.append(box(minx, mid, maxx, maxy))
+        else:
+            tile_boxes.append(tile)
+
+    tiles = []
+    for tile in tile_boxes:
+        minx, miny, maxx, maxy = tile.bounds
+        expanded = box(max(minx - overlap, -180.0), max(miny - overlap, -max_lat), min(maxx + overlap, 180.0), min(maxy + overlap, max_lat))
+        piece = polygonal_part(clip_geom.intersection(shapely.segmentize(expanded, densify)))
+        if not piece is None:
+            tiles.append(piece)
+
+    # west to east, south to north
+    tiles.sort(key=lambda tile: (tile.bounds[0], tile.bounds[1]))
+
+    return tiles